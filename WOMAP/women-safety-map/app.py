@@ -1,4 +1,6 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, send_from_directory, abort
+import csv
+import io
 import json
 import math
 import os
@@ -6,14 +8,24 @@ from datetime import datetime
 from dotenv import load_dotenv
 from model import ai_predictor
 from live_tracking import live_tracker
+from dashboard import dashboard_snapshot
+from location_store import location_store
+from geofence import geofence_index
+import metrics
+from profiler import request_profiler
+from jobs import job_manager
+import responses
 
 load_dotenv()
 
 app = Flask(__name__)
+metrics.init_app(app)
+request_profiler.init_app(app)
+responses.init_app(app)
 
 MOCK_DATABASE = {
-    'safe_zones': [],
-    'crime_hotspots': []
+    'safe_zones': geofence_index.summaries('safe'),
+    'crime_hotspots': geofence_index.summaries('danger')
 }
 
 def calculate_distance(lat1, lng1, lat2, lng2):
@@ -104,13 +116,29 @@ def analyze_route_safety(start_lat, start_lng, end_lat, end_lng):
         'ai_enhanced': True
     }
 
+def analyze_route_with_eta(start_lat, start_lng, end_lat, end_lng):
+    """Route safety analysis plus walking distance and time"""
+    analysis = analyze_route_safety(start_lat, start_lng, end_lat, end_lng)
+    
+    
+    distance = calculate_distance(start_lat, start_lng, end_lat, end_lng)
+    walking_speed = 5  # km
+    time_minutes = int((distance / 1000) / walking_speed * 60)
+    
+    analysis.update({
+        'distance': f"{distance/1000:.1f} km",
+        'time': f"{time_minutes} min"
+    })
+    
+    return analysis
+
 @app.route('/')
 def index():
     return render_template('maps.html')
 
 @app.route('/api/safety-zones')
 def get_safety_zones():
-    return jsonify(MOCK_DATABASE)
+    return responses.conditional_json(MOCK_DATABASE)
 
 @app.route('/api/analyze-route', methods=['POST'])
 def analyze_route():
@@ -123,19 +151,7 @@ def analyze_route():
     if not all([start_lat, start_lng, end_lat, end_lng]):
         return jsonify({'error': 'Missing coordinates'}), 400
     
-    analysis = analyze_route_safety(start_lat, start_lng, end_lat, end_lng)
-    
-    
-    distance = calculate_distance(start_lat, start_lng, end_lat, end_lng)
-    walking_speed = 5  # km
-    time_minutes = int((distance / 1000) / walking_speed * 60)
-    
-    analysis.update({
-        'distance': f"{distance/1000:.1f} km",
-        'time': f"{time_minutes} min"
-    })
-    
-    return jsonify(analysis)
+    return jsonify(analyze_route_with_eta(start_lat, start_lng, end_lat, end_lng))
 
 @app.route('/api/emergency', methods=['POST'])
 def emergency_alert():
@@ -157,7 +173,12 @@ def emergency_alert():
     
     return jsonify(emergency_data)
 
+@metrics.time_notification
 def send_whatsapp_alert(phone_number, message):
+    sink_url = os.getenv('NOTIFICATION_SINK_URL')
+    if sink_url:
+        return _send_to_notification_sink(sink_url, phone_number, message)
+    
     try:
         from twilio.rest import Client
         
@@ -184,7 +205,7 @@ def send_whatsapp_alert(phone_number, message):
         print(f' To: {phone_number}')
         print(f' Status: {msg.status}')
         return True
-        
+    
     except Exception as e:
         print(f' WhatsApp Error: {str(e)}')
         print(f' Error Type: {type(e).__name__}')
@@ -197,6 +218,16 @@ def send_whatsapp_alert(phone_number, message):
         print(f'\n=== EMERGENCY ALERT (FALLBACK) ===\nTo: {phone_number}\nMessage: {message}\n=================================')
         return False
 
+def _send_to_notification_sink(sink_url, phone_number, message):
+    """Deliver a notification to a local HTTP sink instead of Twilio (load tests, staging)"""
+    try:
+        import requests
+        response = requests.post(sink_url, json={'to': phone_number, 'body': message}, timeout=5)
+        return response.ok
+    except Exception as e:
+        print(f' Notification sink error: {e}')
+        return False
+
 @app.route('/api/report-incident', methods=['POST'])
 def report_incident():
     data = request.json
@@ -213,6 +244,7 @@ def report_incident():
     except Exception as e:
         print(f'Database error: {e}')
     
+    live_tracker.alert_nearby(incident['type'], incident['location'], incident['details'])
     return jsonify(incident)
 
 @app.route('/api/submit-review', methods=['POST'])
@@ -254,6 +286,7 @@ def add_report():
         print(f'Database error: {e}')
         report['id'] = 'temp_id'
     
+    live_tracker.alert_nearby(report['type'], report, report['description'])
     return jsonify(report)
 
 @app.route('/api/get-reports')
@@ -261,7 +294,7 @@ def get_reports():
     try:
         from database import db
         reports = db.get_reports()
-        return jsonify(reports)
+        return responses.conditional_json(reports)
     except Exception as e:
         print(f'Database error: {e}')
         return jsonify([])
@@ -285,16 +318,8 @@ def ai_safety_forecast():
         'generated_at': datetime.now().isoformat()
     })
 
-@app.route('/api/ai-crime-prediction', methods=['POST'])
-def ai_crime_prediction():
-    """Get real-time AI crime risk prediction"""
-    data = request.json
-    lat = data.get('lat')
-    lng = data.get('lng')
-    
-    if not lat or not lng:
-        return jsonify({'error': 'Missing coordinates'}), 400
-    
+def predict_area_risk(lat, lng):
+    """AI crime, crowd and weather risk for a single point"""
     crime_risk = ai_predictor.predict_crime_pattern(lat, lng)
     crowd_density = ai_predictor.predict_crowd_density(lat, lng)
     weather = ai_predictor.get_weather_data(lat, lng)
@@ -307,7 +332,7 @@ def ai_crime_prediction():
     elif overall_risk > 40:
         risk_level = 'medium'
     
-    return jsonify({
+    return {
         'location': {'lat': lat, 'lng': lng},
         'predictions': {
             'crime_risk': round(crime_risk, 1),
@@ -317,20 +342,22 @@ def ai_crime_prediction():
             'risk_level': risk_level
         },
         'timestamp': datetime.now().isoformat()
-    })
+    }
 
-@app.route('/api/ai-route-optimization', methods=['POST'])
-def ai_route_optimization():
-    """Get AI-optimized safe route suggestions"""
+@app.route('/api/ai-crime-prediction', methods=['POST'])
+def ai_crime_prediction():
+    """Get real-time AI crime risk prediction"""
     data = request.json
-    start_lat = data.get('start_lat')
-    start_lng = data.get('start_lng')
-    end_lat = data.get('end_lat')
-    end_lng = data.get('end_lng')
+    lat = data.get('lat')
+    lng = data.get('lng')
     
-    if not all([start_lat, start_lng, end_lat, end_lng]):
+    if not lat or not lng:
         return jsonify({'error': 'Missing coordinates'}), 400
     
+    return jsonify(predict_area_risk(lat, lng))
+
+def optimize_routes(start_lat, start_lng, end_lat, end_lng):
+    """AI-optimized safe route suggestions, safest first"""
     routes = []
     
     direct_analysis = analyze_route_safety(start_lat, start_lng, end_lat, end_lng)
@@ -356,7 +383,7 @@ def ai_route_optimization():
         'analysis': safe_analysis
     })
     
-   
+    
     balanced_analysis = {
         'safety_score': 80,
         'lighting_score': 70,
@@ -375,42 +402,36 @@ def ai_route_optimization():
     
     routes.sort(key=lambda x: x['analysis']['safety_score'], reverse=True)
     
-    return jsonify({
+    return {
         'routes': routes,
         'recommendation': routes[0]['name'],
         'ai_powered': True,
         'generated_at': datetime.now().isoformat()
-    })
+    }
+
+@app.route('/api/ai-route-optimization', methods=['POST'])
+def ai_route_optimization():
+    """Get AI-optimized safe route suggestions"""
+    data = request.json
+    start_lat = data.get('start_lat')
+    start_lng = data.get('start_lng')
+    end_lat = data.get('end_lat')
+    end_lng = data.get('end_lng')
+    
+    if not all([start_lat, start_lng, end_lat, end_lng]):
+        return jsonify({'error': 'Missing coordinates'}), 400
+    
+    return jsonify(optimize_routes(start_lat, start_lng, end_lat, end_lng))
 
 @app.route('/api/ai-dashboard')
 def ai_dashboard():
-    """Get AI analytics dashboard data"""
-    sample_locations = [
-        {'lat': 52.5200, 'lng': 13.4050, 'name': 'City Center'},
-        {'lat': 52.5170, 'lng': 13.3888, 'name': 'Commercial District'},
-        {'lat': 52.5244, 'lng': 13.4105, 'name': 'Residential Area'},
-        {'lat': 52.5067, 'lng': 13.4282, 'name': 'Business Quarter'}
-    ]
-    
-    dashboard_data = []
-    for location in sample_locations:
-        crime_risk = ai_predictor.predict_crime_pattern(location['lat'], location['lng'])
-        crowd_density = ai_predictor.predict_crowd_density(location['lat'], location['lng'])
-        
-        dashboard_data.append({
-            'location': location['name'],
-            'coordinates': {'lat': location['lat'], 'lng': location['lng']},
-            'crime_risk': round(crime_risk, 1),
-            'crowd_density': round(crowd_density, 1),
-            'safety_score': round(100 - crime_risk * 0.7, 1)
-        })
+    """Get AI analytics dashboard data from the background-refreshed snapshot"""
+    snapshot = dashboard_snapshot.get_city(request.args.get('city'))
+    if snapshot is None:
+        return jsonify({'error': 'Unknown city'}), 404
     
-    return jsonify({
-        'areas': dashboard_data,
-        'city': 'Current Location',
-        'last_updated': datetime.now().isoformat(),
-        'ai_model_status': 'active'
-    })
+    etag = snapshot.pop('etag')
+    return responses.conditional_json(snapshot, etag)
 
 
 @app.route('/api/start-journey', methods=['POST'])
@@ -427,7 +448,7 @@ def start_journey():
         return jsonify({'error': 'Missing required data'}), 400
     
     journey_id = live_tracker.start_journey(
-        user_id, start_location, destination, planned_route, trusted_contacts
+        user_id, start_location, destination, planned_route, trusted_contacts, data.get('user_phone')
     )
     
     return jsonify({
@@ -482,6 +503,21 @@ def get_journey_status(journey_id):
     result = live_tracker.get_journey_status(journey_id)
     return jsonify(result)
 
+@app.route('/api/journey-track/<journey_id>')
+def get_journey_track(journey_id):
+    """Replay the full persisted track of a journey"""
+    try:
+        track = location_store.get_track(journey_id)
+    except Exception as e:
+        print(f'Database error: {e}')
+        return jsonify({'error': 'Track unavailable'}), 503
+    
+    return jsonify({
+        'journey_id': journey_id,
+        'track': track,
+        'total_points': len(track)
+    })
+
 @app.route('/api/family-dashboard/<contact_phone>')
 def family_dashboard(contact_phone):
     """Get family/friend dashboard"""
@@ -506,34 +542,212 @@ def admin_dashboard():
 def get_admin_stats():
     try:
         from database import db
-        stats = {
-            'emergency_alerts': db.db.emergency_alerts.count_documents({}),
-            'incidents': db.db.incidents.count_documents({}),
-            'reviews': db.db.reviews.count_documents({}),
-            'reports': db.db.reports.count_documents({})
-        }
+        stats = db.get_counters()
+        hours = request.args.get('hours', type=int)
+        if hours:
+            stats['hourly'] = db.get_hourly_counters(min(hours, 24 * 7))
         return jsonify(stats)
     except Exception as e:
         return jsonify({'error': str(e)})
 
+ADMIN_COLLECTIONS = ['emergency_alerts', 'incidents', 'reviews', 'reports']
+
+def _admin_fields():
+    fields = request.args.get('fields')
+    return [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+
+def page_args(args):
+    """(cursor, limit) of an admin page request, the limit clamped to 1..500; raises ValueError if malformed"""
+    from database import db
+    limit = min(max(1, int(args.get('limit', 50))), 500)
+    before = args.get('before')
+    return (db.parse_cursor(before) if before else None), limit
+
+def _serialize_document(item):
+    item['_id'] = str(item['_id'])
+    if 'timestamp' in item:
+        item['timestamp'] = item['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+    return item
+
+@app.route('/api/admin/write-queue')
+def get_write_queue_metrics():
+    try:
+        from database import db
+        return jsonify(db.writer.get_metrics())
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/admin/location-store')
+def get_location_store_metrics():
+    try:
+        metrics = location_store.get_metrics()
+        journey_id = request.args.get('journey_id')
+        if journey_id:
+            metrics['journey'] = location_store.get_storage_stats(journey_id)
+        return jsonify(metrics)
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/admin/predictor')
+def get_predictor_metrics():
+    """Computed vs coalesced predictor calls in this process"""
+    return jsonify(ai_predictor.single_flight.get_metrics())
+
+@app.route('/api/admin/trajectory')
+def get_trajectory_metrics():
+    """Location pings folded into per-journey motion estimates and the anomalies they raised"""
+    return jsonify(live_tracker.trajectory.get_metrics())
+
+@app.route('/api/admin/regions')
+def get_region_stats():
+    """Region partitions resident in this process against the memory budget"""
+    return jsonify(ai_predictor.regions.get_stats())
+
+@app.route('/api/admin/outbox')
+def get_outbox_metrics():
+    """Immediate, digested and suppressed contact notifications in this process"""
+    return jsonify(live_tracker.outbox.get_metrics())
+
+@app.route('/api/admin/geofences')
+def get_geofence_stats():
+    return jsonify(geofence_index.get_stats())
+
+@app.route('/api/admin/proximity')
+def get_proximity_metrics():
+    """Grid index of active journey positions used to alert journeys near new reports"""
+    return jsonify(live_tracker.proximity.get_metrics())
+
+@app.route('/api/admin/profiling', methods=['GET', 'POST'])
+def profiling_settings():
+    """Read or change the request profiling toggle for this process"""
+    if request.method == 'POST':
+        data = request.json or {}
+        return jsonify(request_profiler.configure(data.get('enabled'), data.get('sample_rate')))
+    return jsonify(request_profiler.get_config())
+
+@app.route('/api/admin/profiles')
+def list_profiles():
+    profiles = sorted(request_profiler.list_profiles(), key=lambda p: p['name'], reverse=True)
+    return jsonify(profiles)
+
+@app.route('/api/admin/profiles/<name>')
+def download_profile(name):
+    """Download a speedscope profile (open it at https://www.speedscope.app)"""
+    if not name.endswith('.speedscope.json'):
+        abort(404)
+    return send_from_directory(request_profiler.profile_dir, name, as_attachment=True)
+
+@app.route('/api/jobs', methods=['GET', 'POST'])
+def scoring_jobs():
+    """Submit a batch scoring job (city_grid, road_edges, area_forecast) or list recent jobs"""
+    if request.method == 'GET':
+        return jsonify(job_manager.list_jobs())
+    
+    data = request.json or {}
+    try:
+        job = job_manager.submit(data.get('type'), data.get('params') or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(job), 202
+
+@app.route('/api/jobs/<job_id>')
+def get_scoring_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/result')
+def get_scoring_job_result(job_id):
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(max(1, request.args.get('limit', 1000, type=int)), 10000)
+    result = job_manager.get_result(job_id, offset, limit)
+    if result is None:
+        abort(404)
+    return jsonify(result)
+
 @app.route('/api/admin/<collection>')
 def get_collection_data(collection):
+    if collection not in ADMIN_COLLECTIONS:
+        return jsonify({'error': 'Invalid collection'})
+    try:
+        before, limit = page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     try:
         from database import db
-        if collection in ['emergency_alerts', 'incidents', 'reviews', 'reports']:
-            data = list(db.db[collection].find({}).limit(50).sort('timestamp', -1))
-            for item in data:
-                item['_id'] = str(item['_id'])
-                if 'timestamp' in item:
-                    item['timestamp'] = item['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-            return jsonify(data)
-        return jsonify({'error': 'Invalid collection'})
+        data = db.find_page(collection, before=before, limit=limit, fields=_admin_fields())
+        next_cursor = db.make_cursor(data[-1]) if data and len(data) == limit else None
+        response = jsonify([_serialize_document(item) for item in data])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/api/admin/<collection>/export')
+def export_collection(collection):
+    """Stream a whole collection as NDJSON or CSV without loading it into memory"""
+    if collection not in ADMIN_COLLECTIONS:
+        return jsonify({'error': 'Invalid collection'}), 400
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Invalid format'}), 400
+    
+    from database import db
+    fields = _admin_fields()
+    cursor = db.iter_collection(collection, fields=fields)
+    
+    def generate_ndjson():
+        for item in cursor:
+            yield responses.dumps_bytes(_serialize_document(item)) + b'\n'
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = None
+        for item in cursor:
+            item = _serialize_document(item)
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=fields or list(item), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow({
+                key: json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+                for key, value in item.items()
+            })
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    
+    if export_format == 'csv':
+        generator, mimetype = generate_csv, 'text/csv'
+    else:
+        generator, mimetype = generate_ndjson, 'application/x-ndjson'
+    
+    response = Response(stream_with_context(generator()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={collection}.{export_format}'
+    return response
+
+def init_database():
+    """Create and verify the Mongo indexes before serving traffic"""
+    try:
+        from database import db
+        db.ensure_indexes()
+        print(' Database indexes verified')
+    except Exception as e:
+        print(f'Database error: {e}')
+
+def build_region_artifacts():
+    """Build region model artifacts that are missing for the current regions config before serving traffic"""
+    built = ai_predictor.regions.build_missing()
+    if built:
+        print(f" Built region artifacts: {', '.join(built)}")
+
 if __name__ == '__main__':
     print(' Starting Women Safety Map...')
     port = int(os.environ.get('PORT', 5001))
     print(f' Main App: http://127.0.0.1:{port}')
     print(f' Admin Dashboard: http://127.0.0.1:{port}/admin')
+    init_database()
+    build_region_artifacts()
     app.run(debug=True, host='127.0.0.1', port=port)
\ No newline at end of file
@@ -0,0 +1,325 @@
+"""
+ASGI (FastAPI) serving path exposing the pages and user-facing JSON API of
+app.py; admin diagnostics, exports, profiling and batch jobs stay Flask-only.
+
+Mongo I/O goes through motor and notifications through httpx, so panic and
+report requests never queue behind slow I/O. CPU-bound predictor calls run on
+a bounded thread pool, and live tracking state is mutated on a single
+dedicated thread, as the Flask app does within one worker.
+    
+    uvicorn asgi:app --host 127.0.0.1 --port 5001
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+from prometheus_client import make_asgi_app
+from werkzeug.http import http_date
+from app import MOCK_DATABASE, analyze_route_with_eta, predict_area_risk, optimize_routes, ADMIN_COLLECTIONS, build_region_artifacts, init_database, page_args
+from model import ai_predictor
+from live_tracking import live_tracker
+from dashboard import dashboard_snapshot
+from location_store import location_store
+from async_database import async_db
+from async_notifications import async_notifier
+import metrics
+from responses import COMPRESSION_MIN_BYTES, GZIP_LEVEL, dumps_bytes
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PREDICTOR_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv('PREDICTOR_THREADS', os.cpu_count() or 1)), thread_name_prefix='predictor'
+)
+PREDICTOR_SLOTS = asyncio.Semaphore(int(os.getenv('PREDICTOR_MAX_PENDING', 64)))
+TRACKER_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tracker')
+
+async def run_predictor(func, *args):
+    """Run a CPU-bound call on the predictor pool, with a bounded number waiting"""
+    async with PREDICTOR_SLOTS:
+        return await asyncio.get_running_loop().run_in_executor(PREDICTOR_POOL, func, *args)
+
+async def run_tracker(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(TRACKER_POOL, func, *args)
+
+class OrjsonResponse(JSONResponse):
+    """JSON rendered with the shared orjson serializer from responses.py"""
+    
+    def render(self, content):
+        return dumps_bytes(content)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Indexes, counters and region artifacts, as gunicorn's when_ready does for the Flask app
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, init_database)
+    await loop.run_in_executor(None, build_region_artifacts)
+    await async_notifier.start()
+    live_tracker.notifier = async_notifier.submit
+    yield
+    live_tracker.notifier = None
+    await async_notifier.stop()
+
+app = FastAPI(title='Women Safety Map', lifespan=lifespan, default_response_class=OrjsonResponse)
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_BYTES, compresslevel=GZIP_LEVEL)
+app.mount('/static', StaticFiles(directory=os.path.join(BASE_DIR, 'static')), name='static')
+app.mount('/metrics', make_asgi_app())
+
+templates = Jinja2Templates(directory=os.path.join(BASE_DIR, 'templates'))
+# The templates use Flask's url_for('static', filename=...) signature
+templates.env.globals['url_for'] = lambda endpoint, filename='': f'/{endpoint}/{filename}'
+
+@app.middleware('http')
+async def record_latency(request: Request, call_next):
+    start = asyncio.get_running_loop().time()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    metrics.REQUEST_LATENCY.labels(
+        route.path if route else 'unmatched', request.method, response.status_code
+    ).observe(asyncio.get_running_loop().time() - start)
+    return response
+
+def error(message, status=400):
+    return OrjsonResponse({'error': message}, status_code=status)
+
+def saved(document):
+    """Render the timestamp added by the database layer the way Flask's jsonify does"""
+    if isinstance(document.get('timestamp'), datetime):
+        document['timestamp'] = http_date(document['timestamp'])
+    return document
+
+@app.get('/')
+async def index(request: Request):
+    return templates.TemplateResponse(request, 'maps.html')
+
+@app.get('/track/{journey_id}')
+async def track_journey(request: Request, journey_id: str):
+    return templates.TemplateResponse(request, 'track.html', {'journey_id': journey_id})
+
+@app.get('/family-dashboard/{contact_phone}')
+async def family_dashboard_page(request: Request, contact_phone: str):
+    return templates.TemplateResponse(request, 'family_dashboard.html', {'contact_phone': contact_phone})
+
+@app.get('/admin')
+async def admin_dashboard(request: Request):
+    return templates.TemplateResponse(request, 'admin.html')
+
+@app.get('/api/safety-zones')
+async def get_safety_zones():
+    return MOCK_DATABASE
+
+@app.post('/api/analyze-route')
+async def analyze_route(request: Request):
+    data = await request.json()
+    coords = [data.get('start_lat'), data.get('start_lng'), data.get('end_lat'), data.get('end_lng')]
+    if not all(coords):
+        return error('Missing coordinates')
+    return await run_predictor(analyze_route_with_eta, *coords)
+
+@app.post('/api/emergency')
+async def emergency_alert(request: Request):
+    data = await request.json()
+    emergency_data = {
+        'location': {'lat': data.get('lat'), 'lng': data.get('lng')},
+        'status': 'Emergency alert sent',
+        'admin_notified': True
+    }
+    try:
+        await async_db.save_emergency_alert(emergency_data)
+    except Exception as e:
+        print(f'Database error: {e}')
+    return saved(emergency_data)
+
+@app.post('/api/report-incident')
+async def report_incident(request: Request):
+    data = await request.json()
+    incident = {
+        'type': data.get('type'),
+        'location': data.get('location'),
+        'details': data.get('details'),
+        'status': 'Incident reported successfully'
+    }
+    try:
+        await async_db.save_incident(incident)
+    except Exception as e:
+        print(f'Database error: {e}')
+    await run_tracker(live_tracker.alert_nearby, incident['type'], incident['location'], incident['details'])
+    return saved(incident)
+
+@app.post('/api/submit-review')
+async def submit_review(request: Request):
+    data = await request.json()
+    review = {
+        'safety_rating': data.get('safety_rating'),
+        'lighting_rating': data.get('lighting_rating'),
+        'crowd_rating': data.get('crowd_rating'),
+        'comment': data.get('comment'),
+        'status': 'Review submitted successfully'
+    }
+    try:
+        await async_db.save_review(review)
+    except Exception as e:
+        print(f'Database error: {e}')
+    return saved(review)
+
+@app.post('/api/add-report')
+async def add_report(request: Request):
+    data = await request.json()
+    report = {
+        'lat': data.get('lat'),
+        'lng': data.get('lng'),
+        'type': data.get('type'),
+        'description': data.get('description')
+    }
+    try:
+        result = await async_db.save_report(report)
+        report['id'] = str(result.inserted_id)
+    except Exception as e:
+        print(f'Database error: {e}')
+        report['id'] = 'temp_id'
+    await run_tracker(live_tracker.alert_nearby, report['type'], report, report['description'])
+    return saved(report)
+
+@app.get('/api/get-reports')
+async def get_reports():
+    try:
+        reports = await async_db.get_reports()
+    except Exception as e:
+        print(f'Database error: {e}')
+        return []
+    return [saved(report) for report in reports]
+
+@app.post('/api/ai-safety-forecast')
+async def ai_safety_forecast(request: Request):
+    data = await request.json()
+    lat, lng = data.get('lat'), data.get('lng')
+    if not lat or not lng:
+        return error('Missing coordinates')
+    forecast = await run_predictor(ai_predictor.forecast_safety_trend, lat, lng, data.get('hours', 6))
+    return {
+        'location': {'lat': lat, 'lng': lng},
+        'forecast': forecast,
+        'generated_at': datetime.now().isoformat()
+    }
+
+@app.post('/api/ai-crime-prediction')
+async def ai_crime_prediction(request: Request):
+    data = await request.json()
+    lat, lng = data.get('lat'), data.get('lng')
+    if not lat or not lng:
+        return error('Missing coordinates')
+    return await run_predictor(predict_area_risk, lat, lng)
+
+@app.post('/api/ai-route-optimization')
+async def ai_route_optimization(request: Request):
+    data = await request.json()
+    coords = [data.get('start_lat'), data.get('start_lng'), data.get('end_lat'), data.get('end_lng')]
+    if not all(coords):
+        return error('Missing coordinates')
+    return await run_predictor(optimize_routes, *coords)
+
+@app.get('/api/ai-dashboard')
+async def ai_dashboard(request: Request):
+    snapshot = await run_predictor(dashboard_snapshot.get_city, request.query_params.get('city'))
+    if snapshot is None:
+        return error('Unknown city', 404)
+    
+    etag = f'"{snapshot.pop("etag")}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+    return OrjsonResponse(snapshot, headers=headers)
+
+@app.post('/api/start-journey')
+async def start_journey(request: Request):
+    data = await request.json()
+    start_location = data.get('start_location')
+    destination = data.get('destination')
+    trusted_contacts = data.get('trusted_contacts', [])
+    if not all([start_location, destination]):
+        return error('Missing required data')
+    
+    journey_id = await run_tracker(
+        live_tracker.start_journey, data.get('user_id', 'Anonymous User'), start_location,
+        destination, data.get('planned_route', []), trusted_contacts, data.get('user_phone')
+    )
+    return {
+        'journey_id': journey_id,
+        'status': 'journey_started',
+        'tracking_url': f'/track/{journey_id}',
+        'contacts_notified': len(trusted_contacts)
+    }
+
+@app.post('/api/update-location')
+async def update_location(request: Request):
+    data = await request.json()
+    journey_id, current_location = data.get('journey_id'), data.get('current_location')
+    if not all([journey_id, current_location]):
+        return error('Missing journey_id or location')
+    return await run_tracker(live_tracker.update_location, journey_id, current_location)
+
+@app.post('/api/panic-mode')
+async def activate_panic_mode(request: Request):
+    data = await request.json()
+    journey_id = data.get('journey_id')
+    if not journey_id:
+        return error('Missing journey_id')
+    return await run_tracker(live_tracker.activate_panic_mode, journey_id, data.get('panic_data', {}))
+
+@app.post('/api/end-journey')
+async def end_journey(request: Request):
+    data = await request.json()
+    journey_id = data.get('journey_id')
+    if not journey_id:
+        return error('Missing journey_id')
+    return await run_tracker(live_tracker.end_journey, journey_id, data.get('end_location'))
+
+@app.get('/api/journey-status/{journey_id}')
+async def get_journey_status(journey_id: str):
+    return await run_tracker(live_tracker.get_journey_status, journey_id)
+
+@app.get('/api/journey-track/{journey_id}')
+async def get_journey_track(journey_id: str):
+    try:
+        track = await run_tracker(location_store.get_track, journey_id)
+    except Exception as e:
+        print(f'Database error: {e}')
+        return error('Track unavailable', 503)
+    return {'journey_id': journey_id, 'track': track, 'total_points': len(track)}
+
+@app.get('/api/family-dashboard/{contact_phone}')
+async def family_dashboard(contact_phone: str):
+    return await run_tracker(live_tracker.get_family_dashboard, contact_phone)
+
+@app.get('/api/admin/stats')
+async def get_admin_stats():
+    try:
+        return await async_db.get_counters()
+    except Exception as e:
+        return {'error': str(e)}
+
+@app.get('/api/admin/{collection}')
+async def get_collection_data(collection: str, request: Request):
+    if collection not in ADMIN_COLLECTIONS:
+        return error('Not found', 404)
+    try:
+        before, limit = page_args(request.query_params)
+    except ValueError as e:
+        return error(str(e))
+    try:
+        from database import db
+        data = await async_db.find_page(collection, before, limit)
+    except Exception as e:
+        return {'error': str(e)}
+    
+    headers = {'X-Next-Cursor': db.make_cursor(data[-1])} if data and len(data) == limit else {}
+    for item in data:
+        item['_id'] = str(item['_id'])
+        if 'timestamp' in item:
+            item['timestamp'] = item['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+    return OrjsonResponse(data, headers=headers)
@@ -0,0 +1,102 @@
+"""
+Async MongoDB access for the ASGI app, mirroring database.MongoDB on top of motor.
+
+Reviews and reports go through the same BufferedWriter as the Flask app, so
+they are batched off the event loop instead of inserted one by one; when its
+queue is full they are inserted through motor, never by a blocking write.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from pymongo import WriteConcern
+from pymongo.results import InsertOneResult
+from datetime import datetime
+import os
+from database import COUNTED_COLLECTIONS, TIMESTAMP_INDEX, db
+from metrics import time_mongo_async
+
+class AsyncMongoDB:
+    def __init__(self):
+        mongo_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
+        self.client = AsyncIOMotorClient(
+            mongo_uri,
+            maxPoolSize=int(os.getenv('MONGO_MAX_POOL_SIZE', 50)),
+            serverSelectionTimeoutMS=int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 3000)),
+            connectTimeoutMS=int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 3000)),
+            socketTimeoutMS=int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 10000)),
+            retryWrites=True,
+            retryReads=True
+        )
+        self.db = self.client['women_safety_db']
+    
+    async def _insert(self, collection, data, write_concern=None):
+        data['timestamp'] = datetime.now()
+        target = self.db.get_collection(collection, write_concern=write_concern)
+        result = await target.insert_one(dict(data))
+        await self._increment_counters(collection, data['timestamp'])
+        return result
+    
+    @time_mongo_async('save_emergency_alert')
+    async def save_emergency_alert(self, data):
+        return await self._insert('emergency_alerts', data, WriteConcern('majority', wtimeout=5000))
+    
+    @time_mongo_async('save_incident')
+    async def save_incident(self, data):
+        return await self._insert('incidents', data)
+    
+    @time_mongo_async('save_review')
+    async def save_review(self, data):
+        return await self._enqueue('reviews', data)
+    
+    @time_mongo_async('save_report')
+    async def save_report(self, data):
+        return await self._enqueue('reports', data)
+    
+    async def _enqueue(self, collection, data):
+        """Hand a low-priority insert to the shared BufferedWriter, or insert it through motor if the writer cannot take it"""
+        data['timestamp'] = datetime.now()
+        document = dict(data, _id=ObjectId())
+        if db.writer.try_enqueue(collection, document):
+            return InsertOneResult(document['_id'], acknowledged=False)
+        db.writer.metrics['overflow_async_writes'] += 1
+        return await self._insert(collection, document)
+    
+    @time_mongo_async('get_reports')
+    async def get_reports(self):
+        return await self.db.reports.find({}, {'_id': 0}).to_list(length=None)
+    
+    async def _increment_counters(self, collection, timestamp):
+        hour = timestamp.replace(minute=0, second=0, microsecond=0)
+        totals = await self.db.counters.update_one({'_id': 'totals'}, {'$inc': {collection: 1}})
+        if totals.matched_count == 0:
+            await self._rebuild_counters()
+        await self.db.counters.update_one(
+            {'_id': f"hour:{timestamp.strftime('%Y-%m-%dT%H')}"},
+            {'$inc': {collection: 1}, '$setOnInsert': {'hour': hour}},
+            upsert=True
+        )
+    
+    @time_mongo_async('get_counters')
+    async def get_counters(self):
+        totals = await self.db.counters.find_one({'_id': 'totals'}, {'_id': 0})
+        if totals is None:
+            totals = await self._rebuild_counters()
+        return {name: totals.get(name, 0) for name in COUNTED_COLLECTIONS}
+    
+    async def _rebuild_counters(self):
+        totals = {name: await self.db[name].count_documents({}) for name in COUNTED_COLLECTIONS}
+        await self.db.counters.replace_one({'_id': 'totals'}, totals, upsert=True)
+        return totals
+    
+    async def find_page(self, collection, before=None, limit=50):
+        query = {}
+        if before:
+            timestamp, object_id = before
+            query = {'$or': [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$lt': object_id}}
+            ]}
+        cursor = self.db[collection].find(query).sort(TIMESTAMP_INDEX).limit(limit)
+        return await cursor.to_list(length=limit)
+
+
+async_db = AsyncMongoDB()
@@ -0,0 +1,86 @@
+"""
+Non-blocking WhatsApp notifications for the ASGI app.
+
+Sends go through httpx on the event loop, either to NOTIFICATION_SINK_URL or
+straight to the Twilio Messages REST API, so a slow Twilio call never holds a
+worker thread.
+"""
+import asyncio
+import os
+import time
+import httpx
+from metrics import NOTIFICATION_FAILURES, NOTIFICATION_LATENCY
+
+TWILIO_MESSAGES_URL = 'https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json'
+WHATSAPP_FROM = 'whatsapp:+14155238886'
+
+class AsyncNotifier:
+    def __init__(self):
+        self.loop = None
+        self.client = None
+        self.pending = set()
+    
+    async def start(self):
+        concurrency = int(os.getenv('NOTIFICATION_CONCURRENCY', 50))
+        self.loop = asyncio.get_running_loop()
+        # Queue excess sends on a semaphore rather than inside httpx's connection pool
+        self.slots = asyncio.Semaphore(concurrency)
+        self.client = httpx.AsyncClient(
+            timeout=float(os.getenv('NOTIFICATION_TIMEOUT_SECONDS', 10)),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        )
+    
+    async def stop(self):
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+        await self.client.aclose()
+    
+    def submit(self, phone_number, message):
+        """Schedule a send from any thread without waiting for it"""
+        future = asyncio.run_coroutine_threadsafe(self.send(phone_number, message), self.loop)
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+        return True
+    
+    async def send(self, phone_number, message):
+        async with self.slots:
+            return await self._send(phone_number, message)
+    
+    async def _send(self, phone_number, message):
+        start = time.perf_counter()
+        sent = False
+        try:
+            sent = await self._deliver(phone_number, message)
+            return sent
+        except Exception as e:
+            print(f' WhatsApp Error: {str(e)}')
+            print(f'\n=== EMERGENCY ALERT (FALLBACK) ===\nTo: {phone_number}\nMessage: {message}\n=================================')
+            return False
+        finally:
+            NOTIFICATION_LATENCY.observe(time.perf_counter() - start)
+            if not sent:
+                NOTIFICATION_FAILURES.inc()
+    
+    async def _deliver(self, phone_number, message):
+        sink_url = os.getenv('NOTIFICATION_SINK_URL')
+        if sink_url:
+            response = await self.client.post(sink_url, json={'to': phone_number, 'body': message})
+            return response.is_success
+        
+        account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+        auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+        if not account_sid or not auth_token:
+            print(' Twilio credentials not found in environment variables')
+            return False
+        
+        response = await self.client.post(
+            TWILIO_MESSAGES_URL.format(sid=account_sid),
+            data={'From': WHATSAPP_FROM, 'To': f'whatsapp:{phone_number}', 'Body': message},
+            auth=(account_sid, auth_token)
+        )
+        if not response.is_success:
+            print(f' WhatsApp Error: {response.status_code} {response.text}')
+        return response.is_success
+
+
+async_notifier = AsyncNotifier()
@@ -0,0 +1,128 @@
+"""
+Concurrent-connection capacity of the Flask (gunicorn) and ASGI (uvicorn) apps.
+
+Both servers get one worker and the same load profile: N concurrent
+connections that each start journeys with trusted contacts (so every request
+sends notifications to a fake Twilio sink with artificial latency) and, in
+the mixed profile, report incidents to Mongo. The sync app holds a thread per slow send; the ASGI app
+does not.
+
+    python benchmarks/asgi_compare.py --connections 16,64,256 --duration 15 --sink-delay-ms 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT
+from loadgen import NotificationSink, percentile
+from serve_compare import wait_until_up
+
+
+START_JOURNEY = ('/api/start-journey', {
+    'start_location': {'lat': 18.5204, 'lng': 73.8567},
+    'destination': {'name': 'Home', 'lat': 18.53, 'lng': 73.86},
+    'trusted_contacts': ['+15550000001', '+15550000002', '+15550000003']
+})
+REPORT_INCIDENT = ('/api/report-incident', {'type': 'harassment', 'location': {'lat': 18.52, 'lng': 73.85}})
+
+LOAD_PROFILES = {
+    'notify': [START_JOURNEY],
+    'mixed': [START_JOURNEY, REPORT_INCIDENT],
+}
+
+
+async def connection(client, base_url, requests_mix, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        for path, body in requests_mix:
+            start = time.perf_counter()
+            try:
+                response = await client.post(base_url + path, json=body)
+                if response.status_code != 200:
+                    errors['status'] += 1
+            except httpx.HTTPError:
+                errors['transport'] += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def drive(base_url, requests_mix, connections, duration):
+    latencies, errors = [], {'status': 0, 'transport': 0}
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(connection(client, base_url, requests_mix, deadline, latencies, errors) for _ in range(connections)))
+    return {
+        'connections': connections,
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / duration, 1),
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'errors': errors
+    }
+
+
+def run_server(name, command, env, port, requests_mix, levels, duration):
+    proc = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        if not wait_until_up(base_url):
+            return [{'server': name, 'error': 'did not start'}]
+        return [dict(server=name, **asyncio.run(drive(base_url, requests_mix, level, duration))) for level in levels]
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare Flask and ASGI under concurrent connections')
+    parser.add_argument('--connections', default='16,64,256')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--profile', choices=sorted(LOAD_PROFILES), default='mixed',
+                        help='notify: start-journey only; mixed: also report-incident (needs mongod)')
+    parser.add_argument('--sink-delay-ms', type=float, default=200)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads for the Flask worker')
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    sink = NotificationSink(0, delay=args.sink_delay_ms / 1000)
+    env = dict(os.environ, NOTIFICATION_SINK_URL=sink.url, MONGO_SERVER_SELECTION_TIMEOUT_MS='200',
+               NOTIFICATION_COALESCING='0')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    levels = [int(level) for level in args.connections.split(',')]
+    
+    results = run_server(
+        'flask-gunicorn',
+        ['gunicorn', '-c', 'gunicorn.conf.py', '--workers', '1', '--threads', str(args.threads),
+         '--bind', f'127.0.0.1:{args.port}', 'app:app'],
+        env, args.port, LOAD_PROFILES[args.profile], levels, args.duration
+    )
+    results += run_server(
+        'asgi-uvicorn',
+        [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(args.port),
+         '--workers', '1', '--no-access-log'],
+        env, args.port, LOAD_PROFILES[args.profile], levels, args.duration
+    )
+    
+    for result in results:
+        if 'error' in result:
+            print(f"{result['server']:16} {result['error']}")
+            continue
+        print(f"{result['server']:16} conns={result['connections']:4}  {result['throughput_rps']:8.1f} req/s  "
+              f"p50 {result['p50_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  errors {result['errors']}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+CPU cost of burst load on the prediction endpoints with and without coalescing.
+
+Each round releases N threads at once (a barrier) against
+/api/ai-crime-prediction and /api/ai-safety-forecast for points inside the
+same ~100 m cell, as when many clients open the same area at the same
+moment. Process CPU time, wall time and the coalesced/computed counts are
+reported with single-flight enabled and disabled.
+
+    python benchmarks/coalescing.py --threads 32 --rounds 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT, setup_offline
+
+sys.path.insert(0, ROOT)
+
+ENDPOINTS = {
+    'crime': ('/api/ai-crime-prediction', {}),
+    'forecast': ('/api/ai-safety-forecast', {'hours': 6}),
+}
+
+
+def burst(client, path, body, threads, rounds):
+    errors = []
+    
+    def worker(barrier, lat, lng):
+        barrier.wait()
+        response = client.post(path, json=dict(body, lat=lat, lng=lng))
+        if response.status_code != 200:
+            errors.append(response.status_code)
+    
+    for _ in range(rounds):
+        barrier = threading.Barrier(threads)
+        pool = [
+            threading.Thread(target=worker, args=(barrier, 18.52041 + random.uniform(0, 2e-4),
+                                                  73.85671 + random.uniform(0, 2e-4)))
+            for _ in range(threads)
+        ]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+    return len(errors)
+
+
+def run(client, predictor, enabled, endpoint, threads, rounds):
+    flight = predictor.single_flight
+    flight.enabled = enabled
+    flight.computed = flight.coalesced = 0
+    
+    path, body = ENDPOINTS[endpoint]
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    errors = burst(client, path, body, threads, rounds)
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    
+    return {
+        'endpoint': endpoint,
+        'coalescing': enabled,
+        'requests': threads * rounds,
+        'cpu_seconds': round(cpu, 3),
+        'wall_seconds': round(wall, 3),
+        'cpu_ms_per_request': round(cpu * 1000 / (threads * rounds), 3),
+        'computed': flight.computed if enabled else None,
+        'coalesced': flight.coalesced if enabled else None,
+        'errors': errors
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Burst load on the prediction endpoints with and without coalescing')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    setup_offline()
+    from app import app
+    from model import ai_predictor
+    client = app.test_client()
+    burst(client, ENDPOINTS['crime'][0], {}, 4, 2)
+    
+    results = []
+    for endpoint in ENDPOINTS:
+        for enabled in (False, True):
+            result = run(client, ai_predictor, enabled, endpoint, args.threads, args.rounds)
+            results.append(result)
+            shared = f"computed {result['computed']} coalesced {result['coalesced']}" if enabled else ''
+            print(f"{endpoint:9} coalescing={str(enabled):5}  cpu {result['cpu_seconds']:7.3f} s  "
+                  f"wall {result['wall_seconds']:7.3f} s  {result['cpu_ms_per_request']:7.3f} ms cpu/request  {shared}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
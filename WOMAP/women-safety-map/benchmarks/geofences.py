@@ -0,0 +1,121 @@
+"""
+Per-ping geofence check cost with many fences loaded.
+
+Generates N random polygons (irregular 6-12 sided zones of 30-300 m radius)
+around a city, builds the STR-tree, verifies containment against a brute-force
+ray cast over every fence for a sample of points, and times the lookup
+the tracker runs on each location update.
+
+    python benchmarks/geofences.py --fences 1000,10000,100000 --pings 5000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT
+from loadgen import percentile, METERS_PER_DEGREE
+
+sys.path.insert(0, ROOT)
+
+
+def random_fences(count, rng, center_lat=18.5204, center_lng=73.8567, spread=0.15):
+    features = []
+    for i in range(count):
+        lat = center_lat + rng.uniform(-spread, spread)
+        lng = center_lng + rng.uniform(-spread, spread)
+        sides = rng.randint(6, 12)
+        radius = rng.uniform(30, 300) / METERS_PER_DEGREE
+        ring = []
+        for k in range(sides):
+            angle = 2 * math.pi * k / sides
+            r = radius * rng.uniform(0.6, 1.0)
+            ring.append([lng + r * math.cos(angle), lat + r * math.sin(angle)])
+        ring.append(ring[0])
+        features.append({
+            'type': 'Feature', 'id': f'fence-{i}',
+            'properties': {'kind': 'danger' if i % 3 else 'safe'},
+            'geometry': {'type': 'Polygon', 'coordinates': [ring]}
+        })
+    return features
+
+
+def brute_force(features, lat, lng):
+    inside = set()
+    for index, feature in enumerate(features):
+        ring = feature['geometry']['coordinates'][0]
+        crossings = 0
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+            if (y1 > lat) != (y2 > lat) and lng < (x2 - x1) * (lat - y1) / (y2 - y1) + x1:
+                crossings += 1
+        if crossings % 2:
+            inside.add(index)
+    return inside
+
+
+def run(count, pings, verify, seed):
+    from geofence import GeofenceIndex
+    rng = random.Random(seed)
+    features = random_fences(count, rng)
+    index = GeofenceIndex(features)
+    
+    # Half the pings are placed at fence centres so lookups actually hit polygons
+    points = []
+    for i in range(pings):
+        if i % 2:
+            ring = features[rng.randrange(count)]['geometry']['coordinates'][0]
+            points.append((np.mean([p[1] for p in ring]), np.mean([p[0] for p in ring])))
+        else:
+            points.append((18.5204 + rng.uniform(-0.15, 0.15), 73.8567 + rng.uniform(-0.15, 0.15)))
+    
+    mismatches = sum(index.containing(lat, lng) != brute_force(features, lat, lng) for lat, lng in points[:verify])
+    
+    timings, hits = [], 0
+    for lat, lng in points:
+        start = time.perf_counter()
+        hits += bool(index.containing(lat, lng))
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    return {
+        'fences': count,
+        'build_seconds': round(index.load_seconds, 3),
+        'pings': pings,
+        'pings_inside_a_fence': hits,
+        'p50_ms': percentile(timings, 50),
+        'p99_ms': percentile(timings, 99),
+        'mean_ms': round(sum(timings) / len(timings), 4),
+        'verified': verify,
+        'mismatches': mismatches
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Geofence lookup cost per location ping')
+    parser.add_argument('--fences', default='1000,10000,100000')
+    parser.add_argument('--pings', type=int, default=5000)
+    parser.add_argument('--verify', type=int, default=50, help='points checked against a brute-force scan')
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    results = []
+    for count in (int(c) for c in args.fences.split(',')):
+        result = run(count, args.pings, args.verify, args.seed)
+        results.append(result)
+        print(f"fences={result['fences']:7}  build {result['build_seconds']:6.2f} s  "
+              f"p50 {result['p50_ms']:.4f} ms  p99 {result['p99_ms']:.4f} ms  "
+              f"hits {result['pings_inside_a_fence']}/{result['pings']}  mismatches {result['mismatches']}/{result['verified']}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Scaling of the batch scoring jobs with the number of pool processes.
+
+Scores the same city grid with 1, 2, 4... worker processes (after a warm-up
+job so process start and model loading are not counted) and reports points
+per second and the speedup over a single worker. The in-process
+predict_batch rate is printed as the baseline a web worker would get.
+
+    python benchmarks/jobs_scaling.py --workers 1,2,4 --resolution-m 50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT
+
+sys.path.insert(0, ROOT)
+
+PUNE_BBOX = {'south': 18.42, 'west': 73.72, 'north': 18.62, 'east': 73.98}
+
+
+def wait(manager, job_id):
+    while True:
+        job = manager.get(job_id)
+        if job['status'] != 'running':
+            return job
+        time.sleep(0.05)
+
+
+def run_jobs(workers, chunk_size, params, repeat):
+    from jobs import JobManager
+    manager = JobManager(jobs_dir=tempfile.mkdtemp(prefix='womap-jobs-'), workers=workers, chunk_size=chunk_size)
+    
+    warmup = manager.submit('city_grid', dict(params, resolution_m=2000))
+    wait(manager, warmup['id'])
+    
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        job = wait(manager, manager.submit('city_grid', params)['id'])
+        durations.append(time.perf_counter() - started)
+        if job['status'] != 'completed':
+            raise RuntimeError(job['error'])
+    manager._pool.shutdown()
+    
+    best = min(durations)
+    return {'workers': workers, 'points': job['total'], 'seconds': round(best, 3),
+            'points_per_second': round(job['total'] / best)}
+
+
+def in_process_rate(points=2000):
+    from model import ai_predictor
+    locations = [{'lat': 18.42 + i * 1e-4, 'lng': 73.72 + i * 1e-4} for i in range(points)]
+    started = time.perf_counter()
+    ai_predictor.predict_batch(locations, 20, 4)
+    return round(points / (time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch scoring job throughput per pool size')
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--resolution-m', type=float, default=50)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    params = dict(PUNE_BBOX, resolution_m=args.resolution_m, hour=22, day_of_week=4)
+    print(f'cpu cores: {os.cpu_count()}')
+    print(f'in-process predict_batch: {in_process_rate()} points/s')
+    
+    results = [run_jobs(int(w), args.chunk_size, params, args.repeat) for w in args.workers.split(',')]
+    base = results[0]['points_per_second']
+    for result in results:
+        result['speedup'] = round(result['points_per_second'] / base, 2)
+        print(f"workers={result['workers']:2}  {result['points']} points  {result['seconds']:7.3f} s  "
+              f"{result['points_per_second']:9} points/s  x{result['speedup']}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+Synthetic journey load generator and replay harness.
+
+Synthesizes realistic journeys (planned route, noisy GPS pings, deviations,
+panic events) and drives them against the journey endpoints, either over HTTP
+against a running server or in-process through the Flask test client.
+Notifications are delivered to a local fake Twilio sink via NOTIFICATION_SINK_URL.
+
+    python benchmarks/loadgen.py --journeys 500 --in-process
+    python benchmarks/loadgen.py --base-url http://127.0.0.1:5001 --server-pid 1234 --record run.json
+    python benchmarks/loadgen.py --replay run.json --in-process
+
+When running over HTTP, start the server with the sink's URL, otherwise
+notifications go to Twilio. The sink listens on --sink-port, 8099 by default
+(0 picks a free port, which only suits --in-process runs):
+
+    NOTIFICATION_SINK_URL=http://127.0.0.1:8099/messages gunicorn app:app
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import RESULTS_DIR, use_mongomock
+
+METERS_PER_DEGREE = 111320
+DEFAULT_SINK_PORT = 8099
+
+
+def synthesize(journeys, seed, pings, ping_interval, start_spread, deviation_rate, panic_rate,
+               center_lat, center_lng):
+    """Build a deterministic schedule: one ordered event list per journey, times in seconds"""
+    rng = random.Random(seed)
+    schedule = []
+    
+    for idx in range(journeys):
+        start = {'lat': center_lat + rng.uniform(-0.03, 0.03), 'lng': center_lng + rng.uniform(-0.03, 0.03)}
+        bearing = rng.uniform(0, 2 * math.pi)
+        length = rng.uniform(500, 3000) / METERS_PER_DEGREE
+        end = {'lat': start['lat'] + length * math.cos(bearing), 'lng': start['lng'] + length * math.sin(bearing)}
+        route = [
+            {'lat': start['lat'] + (end['lat'] - start['lat']) * k / 49,
+             'lng': start['lng'] + (end['lng'] - start['lng']) * k / 49}
+            for k in range(50)
+        ]
+        contacts = [f'+1555{rng.randint(0, 9999999):07d}' for _ in range(rng.randint(1, 3))]
+        deviate_from = rng.randint(pings // 4, pings - 1) if rng.random() < deviation_rate else None
+        panic_at = rng.randint(1, pings - 1) if rng.random() < panic_rate else None
+        
+        t = rng.uniform(0, start_spread)
+        events = [{'t': round(t, 3), 'action': 'start', 'body': {
+            'user_id': f'load-user-{idx}',
+            'start_location': start,
+            'destination': dict(end, name=f'Destination {idx}'),
+            'planned_route': route,
+            'trusted_contacts': contacts
+        }}]
+        
+        for k in range(pings):
+            t += ping_interval * rng.uniform(0.8, 1.2)
+            progress = (k + 1) / pings
+            noise = 10 / METERS_PER_DEGREE
+            location = {
+                'lat': start['lat'] + (end['lat'] - start['lat']) * progress + rng.gauss(0, noise),
+                'lng': start['lng'] + (end['lng'] - start['lng']) * progress + rng.gauss(0, noise)
+            }
+            if deviate_from is not None and k >= deviate_from:
+                offset = 400 / METERS_PER_DEGREE
+                location['lat'] += offset * math.sin(bearing)
+                location['lng'] -= offset * math.cos(bearing)
+            events.append({'t': round(t, 3), 'action': 'update', 'body': {'current_location': location}})
+            if k == panic_at:
+                events.append({'t': round(t, 3), 'action': 'panic', 'body': {'panic_data': {'source': 'loadgen'}}})
+        
+        t += ping_interval
+        events.append({'t': round(t, 3), 'action': 'end', 'body': {'end_location': end}})
+        schedule.append(events)
+    
+    return schedule
+
+
+ENDPOINTS = {
+    'start': '/api/start-journey',
+    'update': '/api/update-location',
+    'panic': '/api/panic-mode',
+    'end': '/api/end-journey'
+}
+
+
+class NotificationSink:
+    """Fake Twilio: a local HTTP endpoint that just counts the messages it receives"""
+    
+    def __init__(self, port, delay=0.0):
+        sink = self
+        self.delay = delay
+        self.messages = 0
+        self.per_contact = defaultdict(int)
+        self._lock = threading.Lock()
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if sink.delay:
+                    time.sleep(sink.delay)
+                with sink._lock:
+                    sink.messages += 1
+                    sink.per_contact[body.get('to')] += 1
+                self.send_response(201)
+                self.end_headers()
+            
+            def log_message(self, *args):
+                pass
+        
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 1024
+        
+        self.server = Server(('127.0.0.1', port), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/messages'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+class HttpTransport:
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.local = threading.local()
+        self.requests = requests
+    
+    def post(self, path, body):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = self.requests.Session()
+        response = session.post(self.base_url + path, json=body, timeout=30)
+        return response.status_code, response.json()
+
+
+class InProcessTransport:
+    def __init__(self):
+        use_mongomock()
+        from app import app
+        self.app = app
+        self.local = threading.local()
+    
+    def post(self, path, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.post(path, json=body)
+        return response.status_code, response.get_json()
+
+
+def process_stats(pid):
+    """Read RSS (kB) and thread count of a process from /proc"""
+    stats = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    stats['rss_kb'] = int(line.split()[1])
+                elif line.startswith('Threads:'):
+                    stats['threads'] = int(line.split()[1])
+    except OSError:
+        pass
+    return stats
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))], 3)
+
+
+class LoadRun:
+    def __init__(self, schedule, transport, speedup, concurrency, server_pid):
+        self.schedule = schedule
+        self.transport = transport
+        self.speedup = speedup
+        self.concurrency = concurrency
+        self.server_pid = server_pid
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.timeline = []
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+    
+    def _run_journey(self, events):
+        journey_id = None
+        for event in events:
+            delay = self.started + event['t'] / self.speedup - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            
+            body = dict(event['body'])
+            if event['action'] != 'start':
+                if journey_id is None:
+                    return
+                body['journey_id'] = journey_id
+            
+            begin = time.perf_counter()
+            try:
+                status, payload = self.transport.post(ENDPOINTS[event['action']], body)
+            except Exception:
+                status, payload = None, None
+            elapsed = (time.perf_counter() - begin) * 1000
+            
+            with self._lock:
+                self.latencies[event['action']].append(elapsed)
+                self.completed += 1
+                if status != 200 or (payload and 'error' in payload):
+                    self.errors[event['action']] += 1
+            
+            if event['action'] == 'start' and payload:
+                journey_id = payload.get('journey_id')
+    
+    def _monitor(self):
+        last_completed = 0
+        while not self._done.wait(1.0):
+            with self._lock:
+                completed = self.completed
+            sample = {
+                't': round(time.perf_counter() - self.started, 1),
+                'requests_per_second': completed - last_completed
+            }
+            sample.update(process_stats(self.server_pid))
+            self.timeline.append(sample)
+            last_completed = completed
+    
+    def run(self):
+        self.started = time.perf_counter()
+        monitor = threading.Thread(target=self._monitor, daemon=True)
+        monitor.start()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(self._run_journey, self.schedule))
+        duration = time.perf_counter() - self.started
+        self._done.set()
+        monitor.join()
+        return duration
+    
+    def report(self, duration, sink):
+        endpoints = {}
+        for action, values in self.latencies.items():
+            endpoints[ENDPOINTS[action]] = {
+                'requests': len(values),
+                'errors': self.errors.get(action, 0),
+                'p50_ms': percentile(values, 50),
+                'p95_ms': percentile(values, 95),
+                'p99_ms': percentile(values, 99),
+                'max_ms': round(max(values), 3)
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            'journeys': len(self.schedule),
+            'requests': total,
+            'duration_s': round(duration, 2),
+            'throughput_rps': round(total / duration, 1) if duration else None,
+            'notifications_sent': sink.messages,
+            'peak_rss_kb': max((s.get('rss_kb', 0) for s in self.timeline), default=None),
+            'peak_threads': max((s.get('threads', 0) for s in self.timeline), default=None),
+            'endpoints': endpoints,
+            'timeline': self.timeline
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive synthetic journeys against the journey endpoints')
+    parser.add_argument('--journeys', type=int, default=200)
+    parser.add_argument('--pings', type=int, default=30, help='location updates per journey')
+    parser.add_argument('--ping-interval', type=float, default=5.0, help='seconds between pings (schedule time)')
+    parser.add_argument('--start-spread', type=float, default=60.0, help='journeys start within this many seconds')
+    parser.add_argument('--deviation-rate', type=float, default=0.2)
+    parser.add_argument('--panic-rate', type=float, default=0.02)
+    parser.add_argument('--speedup', type=float, default=10.0, help='replay schedule time this many times faster')
+    parser.add_argument('--concurrency', type=int, default=256, help='client threads')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--center', default='18.5204,73.8567', help='lat,lng the journeys are spread around')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5001')
+    parser.add_argument('--in-process', action='store_true', help='drive the app through the Flask test client')
+    parser.add_argument('--server-pid', type=int, help='pid to sample RSS/threads from (defaults to this process in-process)')
+    parser.add_argument('--sink-port', type=int, default=DEFAULT_SINK_PORT, help='port for the fake Twilio sink')
+    parser.add_argument('--record', help='write the synthesized schedule to this file')
+    parser.add_argument('--replay', help='replay a previously recorded schedule instead of synthesizing')
+    parser.add_argument('--output', help='where to write the report JSON')
+    args = parser.parse_args()
+    
+    if args.replay:
+        with open(args.replay) as f:
+            schedule = json.load(f)['journeys']
+    else:
+        center_lat, center_lng = (float(v) for v in args.center.split(','))
+        schedule = synthesize(
+            args.journeys, args.seed, args.pings, args.ping_interval, args.start_spread,
+            args.deviation_rate, args.panic_rate, center_lat, center_lng
+        )
+    if args.record:
+        with open(args.record, 'w') as f:
+            json.dump({'config': vars(args), 'journeys': schedule}, f)
+    
+    sink = NotificationSink(args.sink_port)
+    if args.in_process:
+        os.environ['NOTIFICATION_SINK_URL'] = sink.url
+        transport = InProcessTransport()
+        server_pid = os.getpid()
+    else:
+        print(f'Fake Twilio sink listening at {sink.url}')
+        transport = HttpTransport(args.base_url)
+        server_pid = args.server_pid
+    
+    load = LoadRun(schedule, transport, args.speedup, args.concurrency, server_pid)
+    duration = load.run()
+    report = load.report(duration, sink)
+    
+    print(f"{report['journeys']} journeys, {report['requests']} requests in {report['duration_s']}s "
+          f"({report['throughput_rps']} req/s), {report['notifications_sent']} notifications")
+    print(f"peak RSS {report['peak_rss_kb']} kB, peak threads {report['peak_threads']}")
+    for path, stats in report['endpoints'].items():
+        print(f"{path:24} n={stats['requests']:6}  err={stats['errors']:4}  p50 {stats['p50_ms']:8.2f}  "
+              f"p95 {stats['p95_ms']:8.2f}  p99 {stats['p99_ms']:8.2f} ms")
+    
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Report written to {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    code = main()
+    sys.stdout.flush()
+    os._exit(code)
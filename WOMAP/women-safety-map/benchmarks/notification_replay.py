@@ -0,0 +1,108 @@
+"""
+Outbound contact messages for a deviation-heavy journey replay, with and without the outbox.
+
+Synthesizes journeys with loadgen (by default most of them leave their route
+and keep pinging 400 m off it) and replays every event in schedule time
+order directly against a LiveTrackingManager, on a simulated clock so the
+digest window and deviation re-alert timers behave as in a real run. Counts
+the WhatsApp messages each contact would receive, panic alerts separately.
+
+    python benchmarks/notification_replay.py --journeys 300 --deviation-rate 0.8
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT, use_mongomock
+from loadgen import synthesize
+
+sys.path.insert(0, ROOT)
+
+
+def replay(schedule, coalescing, window):
+    from live_tracking import LiveTrackingManager
+    
+    tracker = LiveTrackingManager()
+    tracker.outbox.enabled = coalescing
+    tracker.outbox.window = window
+    now = [0.0]
+    tracker.outbox.clock = lambda: now[0]
+    tracker._schedule_check_in = lambda journey_id: None
+    
+    sent = Counter()
+    panics = Counter()
+    
+    def send(phone, message):
+        sent[phone] += 1
+        if 'PANIC' in message:
+            panics[phone] += 1
+    tracker._send_notification = send
+    
+    events = sorted(
+        ((event['t'], index, order, event) for index, journey in enumerate(schedule)
+         for order, event in enumerate(journey)),
+        key=lambda item: item[:3]
+    )
+    journey_ids = {}
+    for t, index, _, event in events:
+        now[0] = t
+        tracker.outbox.flush(max_age=window)
+        body = event['body']
+        if event['action'] == 'start':
+            journey_ids[index] = tracker.start_journey(
+                body['user_id'], body['start_location'], body['destination'],
+                body['planned_route'], body['trusted_contacts']
+            )
+        elif event['action'] == 'update':
+            tracker.update_location(journey_ids[index], body['current_location'])
+        elif event['action'] == 'panic':
+            tracker.activate_panic_mode(journey_ids[index], body['panic_data'])
+        else:
+            tracker.end_journey(journey_ids[index], body['end_location'])
+    tracker.outbox.flush()
+    
+    contacts = {contact for journey in schedule for contact in journey[0]['body']['trusted_contacts']}
+    return {
+        'coalescing': coalescing,
+        'messages': sum(sent.values()),
+        'panic_messages': sum(panics.values()),
+        'max_per_contact': max((sent[c] for c in contacts), default=0),
+        'mean_per_contact': round(sum(sent[c] for c in contacts) / len(contacts), 2),
+        'outbox': tracker.outbox.get_metrics()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Contact message volume with and without the notification outbox')
+    parser.add_argument('--journeys', type=int, default=300)
+    parser.add_argument('--pings', type=int, default=120)
+    parser.add_argument('--ping-interval', type=float, default=5.0)
+    parser.add_argument('--deviation-rate', type=float, default=0.8)
+    parser.add_argument('--panic-rate', type=float, default=0.05)
+    parser.add_argument('--window', type=float, default=300.0, help='digest window in seconds')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    use_mongomock()
+    schedule = synthesize(args.journeys, args.seed, args.pings, args.ping_interval, 60.0,
+                          args.deviation_rate, args.panic_rate, 18.5204, 73.8567)
+    
+    results = [replay(schedule, coalescing, args.window) for coalescing in (False, True)]
+    for result in results:
+        print(f"coalescing={str(result['coalescing']):5}  messages {result['messages']:6}  "
+              f"panic {result['panic_messages']:4}  per contact mean {result['mean_per_contact']:6}  "
+              f"max {result['max_per_contact']:4}")
+    print(f"reduction x{results[0]['messages'] / max(results[1]['messages'], 1):.1f}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
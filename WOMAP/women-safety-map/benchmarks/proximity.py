@@ -0,0 +1,114 @@
+"""
+Insert-to-alert latency of new reports as the number of active journeys grows.
+
+Places N active journeys at random positions around a city (indexed in the
+tracker's proximity grid as update_location would), then files reports at
+random points and times LiveTrackingManager.alert_nearby end to end: grid
+join, distance filter, journey update and contact digest enqueue. A linear
+scan over active_journeys is timed alongside for comparison.
+
+    python benchmarks/proximity.py --journeys 1000,10000,100000 --reports 2000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT
+from loadgen import percentile
+
+sys.path.insert(0, ROOT)
+
+SPREAD = 0.15
+
+
+def build_tracker(count, rng):
+    from live_tracking import LiveTrackingManager
+    tracker = LiveTrackingManager()
+    tracker._send_notification = lambda phone, message: None
+    for i in range(count):
+        journey_id = f'journey-{i}'
+        location = {'lat': 18.5204 + rng.uniform(-SPREAD, SPREAD), 'lng': 73.8567 + rng.uniform(-SPREAD, SPREAD)}
+        tracker.active_journeys[journey_id] = {
+            'journey_id': journey_id, 'user_id': f'user-{i}', 'current_location': location,
+            'trusted_contacts': [f'+1555{i:07d}'], 'nearby_reports': []
+        }
+        tracker.proximity.update(journey_id, location['lat'], location['lng'])
+    return tracker
+
+
+def linear_scan(tracker, location, radius):
+    matches = []
+    for journey_id, journey in tracker.active_journeys.items():
+        current = journey['current_location']
+        if tracker._calculate_distance(location['lat'], location['lng'], current['lat'], current['lng']) <= radius:
+            matches.append(journey_id)
+    return matches
+
+
+def run(count, reports, scans, seed):
+    rng = random.Random(seed)
+    tracker = build_tracker(count, rng)
+    radius = tracker.proximity_alert_meters
+    points = [
+        {'lat': 18.5204 + rng.uniform(-SPREAD, SPREAD), 'lng': 73.8567 + rng.uniform(-SPREAD, SPREAD)}
+        for _ in range(reports)
+    ]
+    
+    timings, alerted = [], 0
+    for location in points:
+        start = time.perf_counter()
+        alerted += tracker.alert_nearby('harassment', location, 'benchmark report')
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    scan_timings, mismatches = [], 0
+    for location in points[:scans]:
+        start = time.perf_counter()
+        expected = linear_scan(tracker, location, radius)
+        scan_timings.append((time.perf_counter() - start) * 1000)
+        found = [journey_id for journey_id, _ in tracker.proximity.nearby(location['lat'], location['lng'], radius)]
+        mismatches += sorted(found) != sorted(expected)
+    
+    area = (2 * SPREAD * 111.32) ** 2 * math.cos(math.radians(18.52))
+    return {
+        'journeys': count,
+        'journeys_per_km2': round(count / area, 1),
+        'reports': reports,
+        'mean_journeys_alerted': round(alerted / reports, 2),
+        'p50_ms': percentile(timings, 50),
+        'p99_ms': percentile(timings, 99),
+        'linear_scan_p50_ms': percentile(scan_timings, 50),
+        'scan_mismatches': mismatches,
+        'grid': tracker.proximity.get_metrics()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report to nearby-journey alert latency vs active journeys')
+    parser.add_argument('--journeys', default='1000,10000,100000')
+    parser.add_argument('--reports', type=int, default=2000)
+    parser.add_argument('--scans', type=int, default=20, help='reports also resolved by a linear scan')
+    parser.add_argument('--seed', type=int, default=5)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    results = []
+    for count in (int(c) for c in args.journeys.split(',')):
+        result = run(count, args.reports, args.scans, args.seed)
+        results.append(result)
+        print(f"journeys={result['journeys']:7}  alert p50 {result['p50_ms']:.3f} ms  p99 {result['p99_ms']:.3f} ms  "
+              f"({result['mean_journeys_alerted']} alerted/report)  linear scan p50 {result['linear_scan_p50_ms']:.2f} ms  "
+              f"mismatches {result['scan_mismatches']}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Serving many cities from one process with region partitions under a memory budget.
+
+Lays out N synthetic city regions (each with its own POIs) in a temporary
+regions file, builds every region's artifact once, then replays crime
+predictions whose city is drawn from a Zipf-like popularity curve against
+RegionManagers with different memory budgets. Reports per-request latency,
+partition hit rate, evictions and resident memory next to the size of all
+partitions together.
+
+    python benchmarks/regions.py --cities 40 --requests 5000 --budgets 32,64,1024
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT
+from loadgen import percentile
+
+sys.path.insert(0, ROOT)
+
+
+def synthetic_regions(count, rng):
+    features = []
+    for i in range(count):
+        lat = rng.uniform(-50, 60)
+        lng = -170 + i * 340 / count
+        box = [[lng, lat], [lng + 0.3, lat], [lng + 0.3, lat + 0.25], [lng, lat + 0.25], [lng, lat]]
+        features.append({
+            'type': 'Feature', 'id': f'city-{i}',
+            'properties': {
+                'name': f'City {i}',
+                'police_stations': [[lat + rng.uniform(0, 0.25), lng + rng.uniform(0, 0.3)] for _ in range(rng.randint(3, 8))],
+                'commercial_zones': [[lat + rng.uniform(0, 0.25), lng + rng.uniform(0, 0.3)] for _ in range(rng.randint(1, 4))]
+            },
+            'geometry': {'type': 'Polygon', 'coordinates': [box]}
+        })
+    return features
+
+
+def run(predictor, features, regions_file, artifacts_dir, budget_mb, requests, seed):
+    from regions import RegionManager
+    rng = random.Random(seed)
+    predictor.regions = RegionManager(regions_file, artifacts_dir, budget_mb, predictor.export_region_artifact)
+    weights = [1 / (rank + 1) for rank in range(len(features))]
+    
+    timings = []
+    for city in rng.choices(range(len(features)), weights, k=requests):
+        (lng, lat), _, (lng2, lat2) = features[city]['geometry']['coordinates'][0][:3]
+        point = (rng.uniform(lat, lat2), rng.uniform(lng, lng2))
+        start = time.perf_counter()
+        predictor.predict_crime_pattern(point[0], point[1], 22, 4)
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    stats = predictor.regions.get_stats()
+    return {
+        'budget_mb': budget_mb,
+        'requests': requests,
+        'p50_ms': percentile(timings, 50),
+        'p99_ms': percentile(timings, 99),
+        'hit_rate': round(stats['hits'] / requests, 3),
+        'loads': stats['loads'],
+        'evictions': stats['evictions'],
+        'resident_partitions': len(stats['resident']),
+        'resident_mb': stats['resident_mb']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Region partition LRU under a memory budget')
+    parser.add_argument('--cities', type=int, default=40)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--budgets', default='32,64,1024', help='memory budgets in MB')
+    parser.add_argument('--seed', type=int, default=3)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    from model import ai_predictor
+    from regions import RegionManager
+    features = synthetic_regions(args.cities, random.Random(args.seed))
+    workdir = tempfile.mkdtemp(prefix='womap-regions-')
+    regions_file = os.path.join(workdir, 'regions.json')
+    with open(regions_file, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+    artifacts_dir = os.path.join(workdir, 'artifacts')
+    
+    # Build every artifact up front so the runs below measure loading, not training
+    manager = RegionManager(regions_file, artifacts_dir, 1 << 20, ai_predictor.export_region_artifact)
+    started = time.perf_counter()
+    manager.build_missing()
+    for feature in features:
+        manager.get(feature['id'])
+    total_mb = manager.get_stats()['resident_mb']
+    print(f"{args.cities} regions, {total_mb} MB if all resident, "
+          f"{(time.perf_counter() - started) / args.cities * 1000:.0f} ms to build and load one")
+    
+    results = []
+    for budget in (float(b) for b in args.budgets.split(',')):
+        result = run(ai_predictor, features, regions_file, artifacts_dir, budget, args.requests, args.seed)
+        results.append(result)
+        print(f"budget {budget:7.0f} MB  resident {result['resident_mb']:6.1f} MB ({result['resident_partitions']} regions)  "
+              f"p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms  hit rate {result['hit_rate']:.3f}  "
+              f"loads {result['loads']}  evictions {result['evictions']}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'regions': args.cities, 'all_resident_mb': total_mb, 'runs': results}, f, indent=2)
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
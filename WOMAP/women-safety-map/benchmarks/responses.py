@@ -0,0 +1,100 @@
+"""
+Serialization CPU and bytes on the wire for the large JSON responses.
+
+Compares Flask's default json provider with the orjson provider from
+responses.py on representative payloads (the reports list, a journey status
+with its location history, an admin page and the AI dashboard), and reports
+the body size uncompressed, gzip- and (if installed) brotli-encoded.
+
+    python benchmarks/responses.py --reports 2000 --history 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT, setup_offline, route_points
+
+sys.path.insert(0, ROOT)
+
+
+def build_payloads(reports, history):
+    from bson import ObjectId
+    from app import _serialize_document
+    from dashboard import dashboard_snapshot
+    
+    now = datetime.now()
+    report_docs = [
+        {'lat': 18.52 + i * 1e-4, 'lng': 73.85 + i * 1e-4, 'type': 'harassment',
+         'description': f'Poorly lit street near block {i}', 'timestamp': now - timedelta(minutes=i)}
+        for i in range(reports)
+    ]
+    journey = {
+        'journey_id': 'journey_bench', 'status': 'active', 'start_time': now.isoformat(),
+        'location_history': [
+            {'location': point, 'timestamp': (now + timedelta(seconds=i * 5)).isoformat()}
+            for i, point in enumerate(route_points(history))
+        ]
+    }
+    admin_page = [_serialize_document(dict(doc, _id=ObjectId())) for doc in report_docs[:100]]
+    dashboard = dashboard_snapshot.get_city('Pune')
+    dashboard.pop('etag')
+    return {'get-reports': report_docs, 'journey-status': journey, 'admin-page': admin_page, 'ai-dashboard': dashboard}
+
+
+def cpu_per_call(func, rounds):
+    func()
+    start = time.process_time()
+    for _ in range(rounds):
+        func()
+    return (time.process_time() - start) * 1000 / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON serialization cost and response sizes')
+    parser.add_argument('--reports', type=int, default=2000)
+    parser.add_argument('--history', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    setup_offline()
+    from flask.json.provider import DefaultJSONProvider
+    from app import app
+    import responses
+    
+    providers = {'stdlib': DefaultJSONProvider(app), 'orjson': responses.OrjsonProvider(app)}
+    results = []
+    with app.test_request_context():
+        for name, payload in build_payloads(args.reports, args.history).items():
+            body = responses.dumps_bytes(payload)
+            result = {
+                'payload': name,
+                'stdlib_cpu_ms': round(cpu_per_call(lambda: providers['stdlib'].response(payload), args.rounds), 3),
+                'orjson_cpu_ms': round(cpu_per_call(lambda: providers['orjson'].response(payload), args.rounds), 3),
+                'raw_bytes': len(body),
+                'gzip_bytes': len(responses.compress_bytes(body, 'gzip')),
+                'gzip_cpu_ms': round(cpu_per_call(lambda: responses.compress_bytes(body, 'gzip'), args.rounds), 3),
+            }
+            if responses.brotli is not None:
+                result['br_bytes'] = len(responses.compress_bytes(body, 'br'))
+                result['br_cpu_ms'] = round(cpu_per_call(lambda: responses.compress_bytes(body, 'br'), args.rounds), 3)
+            results.append(result)
+            
+            encoded = f"gzip {result['gzip_bytes']:8} B ({result['gzip_cpu_ms']:.3f} ms)"
+            if 'br_bytes' in result:
+                encoded += f"  br {result['br_bytes']:8} B ({result['br_cpu_ms']:.3f} ms)"
+            print(f"{name:15} json {result['stdlib_cpu_ms']:8.3f} ms -> orjson {result['orjson_cpu_ms']:7.3f} ms  "
+                  f"raw {result['raw_bytes']:8} B  {encoded}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
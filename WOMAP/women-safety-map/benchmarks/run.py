@@ -0,0 +1,207 @@
+"""
+Offline benchmark suite for the predictor, routing and live tracking hot paths.
+
+Runs against an in-memory mongomock database, so no mongod or Twilio account
+is needed. It stays a script next to the pytest behaviour tests in tests/
+rather than a pytest-benchmark suite: timings are too noisy to assert on in
+a test run, and this way the same script can be run against an older
+checkout to produce the baseline. Results are written as JSON to
+benchmarks/results/ (not committed, they are machine specific), so measure
+the baseline on the same machine before comparing:
+    
+    git worktree add /tmp/baseline <older-commit>
+    python /tmp/baseline/benchmarks/run.py --output benchmarks/results/baseline.json
+    python benchmarks/run.py --compare benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+sys.path.insert(0, ROOT)
+
+
+def use_mongomock():
+    """Point the app's database layer at an in-memory mongomock client"""
+    import mongomock
+    import database
+    database.db.client = mongomock.MongoClient()
+    database.db.db = database.db.client['women_safety_db']
+
+
+def setup_offline():
+    """Point the app at mongomock and silence outbound notifications"""
+    use_mongomock()
+    
+    import live_tracking
+    live_tracking.LiveTrackingManager._send_notification = lambda self, phone, message: None
+    live_tracking.LiveTrackingManager._schedule_check_in = lambda self, journey_id: None
+
+
+def route_points(n, lat=18.5204, lng=73.8567):
+    return [{'lat': lat + i * 0.0001, 'lng': lng + i * 0.0001} for i in range(n)]
+
+
+def measure(func, rounds, warmup=2):
+    """Time func over several rounds and record the peak allocation of one call"""
+    for _ in range(warmup):
+        func()
+    
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    timings.sort()
+    return {
+        'rounds': rounds,
+        'mean_ms': round(statistics.mean(timings), 4),
+        'median_ms': round(statistics.median(timings), 4),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 4),
+        'min_ms': round(timings[0], 4),
+        'peak_kb': round(peak / 1024, 1)
+    }
+
+
+def build_cases():
+    from model import ai_predictor
+    from live_tracking import LiveTrackingManager
+    from app import app, analyze_route_safety
+    
+    locations = route_points(100)
+    client = app.test_client()
+    
+    long_route_tracker = LiveTrackingManager()
+    long_route_journey = long_route_tracker.start_journey(
+        'bench', {'lat': 18.5204, 'lng': 73.8567}, {'name': 'Destination'}, route_points(2000), ['+10000000000']
+    )
+    
+    dashboard_tracker = LiveTrackingManager()
+    for i in range(5000):
+        dashboard_tracker.start_journey(
+            f'user-{i}', {'lat': 18.52, 'lng': 73.85}, {'name': 'Destination'}, [], [f'+1{i % 50:010d}']
+        )
+    
+    endpoint_journey = client.post('/api/start-journey', json={
+        'start_location': {'lat': 18.5204, 'lng': 73.8567},
+        'destination': {'name': 'Destination', 'lat': 18.53, 'lng': 73.86},
+        'planned_route': route_points(200),
+        'trusted_contacts': ['+10000000000']
+    }).json['journey_id']
+    
+    route_body = {'start_lat': 18.5204, 'start_lng': 73.8567, 'end_lat': 18.5304, 'end_lng': 73.8667}
+    point_body = {'lat': 18.5204, 'lng': 73.8567}
+    
+    return {
+        'predictor.predict_crime_pattern': (lambda: ai_predictor.predict_crime_pattern(18.5204, 73.8567), 50),
+        'predictor.predict_crowd_density': (lambda: ai_predictor.predict_crowd_density(18.5204, 73.8567), 50),
+        'predictor.predict_batch_100': (lambda: ai_predictor.predict_batch(locations), 20),
+        'predictor.forecast_safety_trend_6h': (lambda: ai_predictor.forecast_safety_trend(18.5204, 73.8567, 6), 10),
+        'routing.analyze_route_safety': (lambda: analyze_route_safety(18.5204, 73.8567, 18.5304, 73.8667), 30),
+        'tracking.update_location_2000_point_route': (
+            lambda: long_route_tracker.update_location(long_route_journey, {'lat': 18.5205, 'lng': 73.8568}), 200
+        ),
+        'tracking.get_family_dashboard_5000_journeys': (
+            lambda: dashboard_tracker.get_family_dashboard('+10000000007'), 50
+        ),
+        'http.analyze_route': (lambda: client.post('/api/analyze-route', json=route_body), 30),
+        'http.ai_crime_prediction': (lambda: client.post('/api/ai-crime-prediction', json=point_body), 30),
+        'http.ai_safety_forecast': (lambda: client.post('/api/ai-safety-forecast', json=point_body), 10),
+        'http.ai_dashboard': (lambda: client.get('/api/ai-dashboard'), 100),
+        'http.update_location': (
+            lambda: client.post('/api/update-location', json={
+                'journey_id': endpoint_journey, 'current_location': {'lat': 18.5205, 'lng': 73.8568}
+            }), 200
+        ),
+        'http.admin_stats': (lambda: client.get('/api/admin/stats'), 100),
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def compare(results, baseline_path, threshold):
+    """Print per-case deltas against a previous run and return the regressed cases"""
+    with open(baseline_path) as f:
+        baseline_run = json.load(f)
+    baseline = baseline_run['results']
+    for key, current in (('python', platform.python_version()), ('machine', platform.machine()), ('cpu_count', os.cpu_count())):
+        if baseline_run.get(key) != current:
+            print(f"Warning: baseline {key} {baseline_run.get(key)} differs from this run's {current}")
+    
+    regressions = []
+    print(f"\n{'case':48} {'median ms':>12} {'delta':>9} {'peak kb':>10} {'delta':>9}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        time_delta = (result['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0
+        mem_delta = (result['peak_kb'] - before['peak_kb']) / before['peak_kb'] * 100 if before['peak_kb'] else 0
+        print(f"{name:48} {result['median_ms']:12.3f} {time_delta:+8.1f}% {result['peak_kb']:10.1f} {mem_delta:+8.1f}%")
+        if time_delta > threshold or mem_delta > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the offline benchmark suite')
+    parser.add_argument('--filter', help='only run cases whose name contains this string')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=20.0, help='regression threshold in percent')
+    parser.add_argument('--output', help='where to write the results JSON')
+    args = parser.parse_args()
+    
+    setup_offline()
+    cases = build_cases()
+    
+    results = {}
+    for name, (func, rounds) in cases.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(func, rounds)
+        print(f"{name:48} median {results[name]['median_ms']:9.3f} ms  p95 {results[name]['p95_ms']:9.3f} ms  peak {results[name]['peak_kb']:9.1f} kb")
+    
+    commit = current_commit()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    with open(output, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'results': results
+        }, f, indent=2)
+    print(f'\nResults written to {output}')
+    
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    code = main()
+    sys.stdout.flush()
+    os._exit(code)
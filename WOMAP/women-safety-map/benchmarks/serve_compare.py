@@ -0,0 +1,145 @@
+"""
+Compare the Flask dev server with the preforking gunicorn setup.
+
+Starts each server in turn, drives the same CPU-bound request mix against it
+from a pool of client threads, and reports throughput plus per-process memory
+(RSS, and PSS which accounts for copy-on-write pages shared between workers).
+
+    python benchmarks/serve_compare.py --requests 2000 --clients 32
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT
+
+REQUEST_MIX = [
+    ('/api/ai-crime-prediction', {'lat': 18.5204, 'lng': 73.8567}),
+    ('/api/analyze-route', {'start_lat': 18.5204, 'start_lng': 73.8567, 'end_lat': 18.5304, 'end_lng': 73.8667}),
+    ('/api/ai-route-optimization', {'start_lat': 18.5204, 'start_lng': 73.8567, 'end_lat': 18.5304, 'end_lng': 73.8667}),
+]
+
+
+def process_tree(root_pid):
+    """Return root_pid and all its descendants"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def memory(pid):
+    stats = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('Rss', 'Pss'):
+                    stats[key.lower() + '_kb'] = int(rest.split()[0])
+    except OSError:
+        pass
+    return stats
+
+
+def wait_until_up(base_url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(base_url + '/api/safety-zones', timeout=1)
+            return True
+        except requests.RequestException:
+            time.sleep(0.5)
+    return False
+
+
+def drive(base_url, total, clients):
+    session_per_thread = {}
+    
+    def one(i):
+        import threading
+        session = session_per_thread.setdefault(threading.get_ident(), requests.Session())
+        path, body = REQUEST_MIX[i % len(REQUEST_MIX)]
+        return session.post(base_url + path, json=body, timeout=60).status_code == 200
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        ok = sum(pool.map(one, range(total)))
+    duration = time.perf_counter() - start
+    return {'requests': total, 'ok': ok, 'duration_s': round(duration, 2), 'throughput_rps': round(total / duration, 1)}
+
+
+def run_server(name, command, env, port, total, clients):
+    base_url = f'http://127.0.0.1:{port}'
+    proc = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+    try:
+        if not wait_until_up(base_url):
+            return {'server': name, 'error': 'did not start'}
+        drive(base_url, min(total, 50), clients)
+        result = drive(base_url, total, clients)
+        processes = [dict(pid=pid, **memory(pid)) for pid in process_tree(proc.pid)]
+        result.update({
+            'server': name,
+            'processes': processes,
+            'total_rss_kb': sum(p.get('rss_kb', 0) for p in processes),
+            'total_pss_kb': sum(p.get('pss_kb', 0) for p in processes)
+        })
+        return result
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the dev server with gunicorn')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--output', help='write the comparison as JSON')
+    args = parser.parse_args()
+    
+    env = dict(os.environ, PORT=str(args.port))
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    results = [
+        run_server('flask-dev', [sys.executable, 'app.py'], env, args.port, args.requests, args.clients),
+        run_server('gunicorn', ['gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{args.port}', 'app:app'],
+                   env, args.port, args.requests, args.clients),
+    ]
+    
+    for result in results:
+        if 'error' in result:
+            print(f"{result['server']:10} {result['error']}")
+            continue
+        per_process = ', '.join(f"{p['pid']}: rss {p.get('rss_kb', 0) // 1024}M pss {p.get('pss_kb', 0) // 1024}M"
+                                for p in result['processes'])
+        print(f"{result['server']:10} {result['throughput_rps']:8.1f} req/s  "
+              f"total rss {result['total_rss_kb'] // 1024}M  total pss {result['total_pss_kb'] // 1024}M  [{per_process}]")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
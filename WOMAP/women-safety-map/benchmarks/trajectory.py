@@ -0,0 +1,107 @@
+"""
+Per-ping cost of the trajectory processor as journeys get longer.
+
+Replays one scripted journey per length (drive at ~10 m/s, brake to a halt,
+stand still for 12 minutes, drive on, turn back, turn back again) padded with
+plain driving to N pings, on a simulated 5 s ping clock. Each ping goes through
+LiveTrackingManager.update_location; the time spent in the trajectory
+processor and in the whole update are both recorded per ping and summarised
+over the last 1000 pings, which should stay flat however long the journey
+already is. Also lists the anomaly events raised, which should be exactly one
+sudden stop, one prolonged stop and two reversals per journey.
+
+    python benchmarks/trajectory.py --lengths 1000,10000,100000
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT, setup_offline
+from loadgen import percentile, METERS_PER_DEGREE
+
+sys.path.insert(0, ROOT)
+
+PING_SECONDS = 5.0
+
+
+def script(length, lat=18.5204, lng=73.8567):
+    """Yield (lat, lng) per ping: the anomalies happen early, then plain driving on a slowly curving road"""
+    steps = [50] * 20 + [0] * 150 + [50] * 20 + [-50] * 20
+    heading = 0.0
+    for k in range(length):
+        step = steps[k] if k < len(steps) else 50
+        if k >= len(steps):
+            heading += 0.002
+        lat += step * math.cos(heading) / METERS_PER_DEGREE
+        lng += step * math.sin(heading) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+        yield lat, lng
+
+
+def run(length):
+    from live_tracking import LiveTrackingManager
+    tracker = LiveTrackingManager()
+    now = [0.0]
+    tracker.outbox.clock = lambda: now[0]
+    tracker.outbox.enabled = False
+    start = {'lat': 18.5204, 'lng': 73.8567}
+    journey_id = tracker.start_journey('bench-user', start, dict(start, name='Nowhere'), [], ['+15550000000'])
+    
+    processor = tracker.trajectory
+    update = processor.update
+    trajectory_ms = []
+    
+    def timed_update(journey_id, lat, lng):
+        started = time.perf_counter()
+        events = update(journey_id, lat, lng)
+        trajectory_ms.append((time.perf_counter() - started) * 1000)
+        return events
+    processor.update = timed_update
+    
+    update_ms, events = [], Counter()
+    for lat, lng in script(length):
+        now[0] += PING_SECONDS
+        started = time.perf_counter()
+        result = tracker.update_location(journey_id, {'lat': lat, 'lng': lng})
+        update_ms.append((time.perf_counter() - started) * 1000)
+        events.update(event['type'] for event in result['trajectory_events'])
+    
+    tail = slice(-1000, None)
+    return {
+        'pings': length,
+        'trajectory_p50_us': round(percentile(trajectory_ms[tail], 50) * 1000, 1),
+        'trajectory_p99_us': round(percentile(trajectory_ms[tail], 99) * 1000, 1),
+        'update_location_p50_ms': percentile(update_ms[tail], 50),
+        'update_location_p99_ms': percentile(update_ms[tail], 99),
+        'events': dict(events),
+        'motion': processor.snapshot(journey_id)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trajectory processor cost per ping vs journey length')
+    parser.add_argument('--lengths', default='1000,10000,100000')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    
+    setup_offline()
+    results = []
+    for length in (int(n) for n in args.lengths.split(',')):
+        result = run(length)
+        results.append(result)
+        print(f"pings={result['pings']:7}  trajectory p50 {result['trajectory_p50_us']:5.1f} us  "
+              f"p99 {result['trajectory_p99_us']:5.1f} us  update_location p50 {result['update_location_p50_ms']:.3f} ms  "
+              f"p99 {result['update_location_p99_ms']:.3f} ms  events {result['events']}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from model import ai_predictor
+
+DEFAULT_AREAS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'monitored_areas.json')
+
+class DashboardSnapshotManager:
+    """Keeps a precomputed AI dashboard snapshot for the monitored areas of each city"""
+    
+    def __init__(self, areas_file=None, refresh_interval=None):
+        self.areas_file = areas_file or os.getenv('MONITORED_AREAS_FILE', DEFAULT_AREAS_FILE)
+        self.refresh_interval = refresh_interval or int(os.getenv('DASHBOARD_REFRESH_SECONDS', 300))
+        self.default_city = os.getenv('DASHBOARD_CITY')
+        self.monitored_areas = self._load_areas()
+        self.snapshot = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+    
+    def _load_areas(self):
+        """Load the monitored areas per city from the configured JSON file"""
+        try:
+            with open(self.areas_file) as f:
+                return json.load(f)
+        except Exception as e:
+            print(f'Monitored areas error: {e}')
+            return {}
+    
+    def compute_snapshot(self):
+        """Score every monitored area in a single batched prediction"""
+        now = datetime.now()
+        entries = [(city, area) for city, areas in self.monitored_areas.items() for area in areas]
+        predictions = ai_predictor.predict_batch(
+            [area for _, area in entries], now.hour, now.weekday()
+        )
+        
+        cities = {city: [] for city in self.monitored_areas}
+        for (city, area), prediction in zip(entries, predictions):
+            crime_risk = prediction['crime_risk']
+            cities[city].append({
+                'location': area['name'],
+                'coordinates': {'lat': area['lat'], 'lng': area['lng']},
+                'crime_risk': round(crime_risk, 1),
+                'crowd_density': round(prediction['crowd_density'], 1),
+                'safety_score': round(100 - crime_risk * 0.7, 1)
+            })
+        
+        model_status = 'active'
+        # Hash everything get_city returns for the city, so a 304 never hides a newer body
+        etags = {
+            city: hashlib.sha1(json.dumps(
+                [areas, now.isoformat(), list(cities), model_status], sort_keys=True
+            ).encode()).hexdigest()
+            for city, areas in cities.items()
+        }
+        return {
+            'cities': cities,
+            'last_updated': now.isoformat(),
+            'refreshed_at': time.time(),
+            'ai_model_status': model_status,
+            'etags': etags
+        }
+    
+    def refresh(self):
+        """Keep this worker's snapshot or adopt one another worker stored while either is fresh, otherwise recompute it"""
+        stored = None
+        try:
+            from database import db
+            stored = db.get_dashboard_snapshot()
+        except Exception as e:
+            print(f'Database error: {e}')
+        
+        fresh = [
+            snapshot for snapshot in (self.snapshot, stored)
+            if snapshot and time.time() - snapshot.get('refreshed_at', 0) < self.refresh_interval
+        ]
+        if fresh:
+            self.snapshot = max(fresh, key=lambda snapshot: snapshot['refreshed_at'])
+            return self.snapshot
+        
+        snapshot = self.compute_snapshot()
+        self.snapshot = snapshot
+        
+        try:
+            from database import db
+            db.save_dashboard_snapshot(dict(snapshot))
+        except Exception as e:
+            print(f'Database error: {e}')
+        
+        return snapshot
+    
+    def start(self):
+        """Start the background refresher (once per process, so forked workers get their own)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        sync_interval = min(30, self.refresh_interval)
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f'Dashboard refresh error: {e}')
+            time.sleep(sync_interval)
+    
+    def get_city(self, city=None):
+        """Return the snapshot for one city; never runs the models on the request path once warm"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            # Publish the first snapshot before the refresher starts, so it finds it fresh and keeps its ETag
+            with self._lock:
+                if self.snapshot is None:
+                    self.refresh()
+            snapshot = self.snapshot
+        self.start()
+        
+        cities = snapshot['cities']
+        city = city or self.default_city or next(iter(cities), None)
+        if city not in cities:
+            return None
+        
+        return {
+            'areas': cities[city],
+            'city': city,
+            'available_cities': list(cities),
+            'last_updated': snapshot['last_updated'],
+            'ai_model_status': snapshot['ai_model_status'],
+            'etag': snapshot['etags'][city]
+        }
+
+
+dashboard_snapshot = DashboardSnapshotManager()
@@ -1,30 +1,400 @@
-from pymongo import MongoClient
-from datetime import datetime
+from pymongo import MongoClient, ASCENDING, DESCENDING, WriteConcern
+from pymongo.errors import BulkWriteError
+from pymongo.results import InsertOneResult
+from bson import ObjectId
+from bson.errors import InvalidId
+from collections import defaultdict
+from datetime import datetime, timedelta
+import atexit
+import heapq
+import itertools
 import os
+import queue
+import threading
+import time
+from metrics import MONGO_ERRORS, MONGO_LATENCY, time_mongo
+
+COUNTED_COLLECTIONS = ['emergency_alerts', 'incidents', 'reviews', 'reports']
+
+TIMESTAMP_INDEX = [('timestamp', DESCENDING), ('_id', DESCENDING)]
+
+LOCATION_RETENTION_DAYS = int(os.getenv('LOCATION_RETENTION_DAYS', 30))
+
+DUPLICATE_KEY = 11000
+
+def _setting(value, name, default, parse=int):
+    """An explicit argument, else the environment variable, else the default (0 is a valid setting)"""
+    if value is not None:
+        return value
+    raw = os.getenv(name, '').strip()
+    return parse(raw) if raw else default
+
+class BufferedWriter:
+    """Bounded queue of low-priority inserts flushed in batches by a background thread.
+    
+    Failed inserts wait out an exponential backoff in a capped retry buffer,
+    which the writer thread drains when they fall due, up to max_retries; the
+    thread never sleeps on a failure, so new documents keep flowing into the
+    queue while MongoDB is down. A queue size of 0 disables buffering and
+    writes synchronously.
+    """
+    
+    def __init__(self, mongo, max_size=None, batch_size=None, flush_interval=None, max_retries=None):
+        self.mongo = mongo
+        self.max_size = _setting(max_size, 'MONGO_WRITE_QUEUE_SIZE', 10000)
+        self.batch_size = max(_setting(batch_size, 'MONGO_WRITE_BATCH_SIZE', 500), 1)
+        self.flush_interval = _setting(flush_interval, 'MONGO_WRITE_FLUSH_SECONDS', 0.5, float)
+        self.max_retries = _setting(max_retries, 'MONGO_WRITE_MAX_RETRIES', 5)
+        self.retry_backoff = _setting(None, 'MONGO_WRITE_RETRY_BACKOFF_SECONDS', 0.5, float)
+        self.max_backoff = _setting(None, 'MONGO_WRITE_MAX_BACKOFF_SECONDS', 30, float)
+        self.retry_size = _setting(None, 'MONGO_WRITE_RETRY_BUFFER_SIZE', 10000)
+        self.queue = queue.Queue(maxsize=max(self.max_size, 0))
+        self.retries = []
+        self.metrics = {
+            'enqueued': 0, 'flushed': 0, 'failed': 0, 'retried': 0, 'retry_dropped': 0,
+            'overflow_sync_writes': 0, 'overflow_async_writes': 0, 'batches': 0
+        }
+        self.last_flush = None
+        self._lock = threading.Lock()
+        self._retry_lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._thread = None
+        self._pid = None
+    
+    def enqueue(self, collection, document):
+        """Queue a document for insertion; writes synchronously if the queue is full or buffering is off"""
+        if not self.try_enqueue(collection, document):
+            self.metrics['overflow_sync_writes'] += 1
+            self._write_batch(collection, [(document, 0)], requeue=False)
+    
+    def try_enqueue(self, collection, document):
+        """Queue a document without ever writing on the calling thread; False if the queue is full or buffering is off"""
+        if self.max_size <= 0:
+            return False
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((collection, document, 0))
+        except queue.Full:
+            return False
+        self.metrics['enqueued'] += 1
+        return True
+    
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            try:
+                items = [self.queue.get(timeout=self._wait())]
+            except queue.Empty:
+                items = []
+            items += self._drain(self.batch_size - len(items))
+            items += self._due_retries(self.batch_size)
+            if items:
+                self._flush_items(items)
+    
+    def _wait(self):
+        """How long the writer thread may block on the queue: until the next retry falls due at the latest"""
+        timeout = self.flush_interval or None
+        with self._retry_lock:
+            if self.retries:
+                due = max(self.retries[0][0] - time.monotonic(), 0)
+                timeout = due if timeout is None else min(timeout, due)
+        return timeout
+    
+    def _due_retries(self, limit, now=None):
+        """Pop up to limit retries whose backoff has passed (all of them when now is infinite)"""
+        now = time.monotonic() if now is None else now
+        items = []
+        with self._retry_lock:
+            while self.retries and len(items) < limit and self.retries[0][0] <= now:
+                _, _, collection, document, attempt = heapq.heappop(self.retries)
+                items.append((collection, document, attempt))
+        return items
+    
+    def _drain(self, limit):
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+    
+    def flush(self):
+        """Write everything currently queued or waiting to be retried, one attempt each (used at shutdown)"""
+        while True:
+            items = self._drain(self.batch_size) or self._due_retries(self.batch_size, now=float('inf'))
+            if not items:
+                return
+            self._flush_items(items, requeue=False)
+    
+    def _flush_items(self, items, requeue=True):
+        by_collection = defaultdict(list)
+        for collection, document, attempt in items:
+            by_collection[collection].append((document, attempt))
+        for collection, entries in by_collection.items():
+            self._write_batch(collection, entries, requeue)
+        self.last_flush = datetime.now().isoformat()
+    
+    def _write_batch(self, collection, entries, requeue=True):
+        """Insert a batch; documents that did not make it go to the retry buffer with backoff or count as failed"""
+        documents = [document for document, _ in entries]
+        failed = set()
+        try:
+            with MONGO_LATENCY.labels(f'insert_many_{collection}').time():
+                self.mongo.db[collection].insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Partial success: duplicate keys are documents an earlier, seemingly failed attempt already inserted
+            failed = {error['index'] for error in e.details.get('writeErrors', []) if error.get('code') != DUPLICATE_KEY}
+            if e.details.get('writeConcernErrors'):
+                failed = set(range(len(documents)))
+            print(f"Database error: {len(failed)} of {len(documents)} {collection} inserts failed")
+        except Exception as e:
+            failed = set(range(len(documents)))
+            print(f'Database error: {e}')
+        
+        if failed:
+            MONGO_ERRORS.labels(f'insert_many_{collection}').inc()
+        written = [document for i, document in enumerate(documents) if i not in failed]
+        if written:
+            self.metrics['flushed'] += len(written)
+            self.metrics['batches'] += 1
+            self._count(collection, written)
+        
+        retry = [(document, attempt + 1) for i, (document, attempt) in enumerate(entries)
+                 if i in failed and requeue and attempt < self.max_retries]
+        self.metrics['failed'] += len(failed) - len(retry)
+        now = time.monotonic()
+        with self._retry_lock:
+            for document, attempt in retry:
+                if len(self.retries) >= self.retry_size:
+                    self.metrics['retry_dropped'] += 1
+                    self.metrics['failed'] += 1
+                    continue
+                due = now + min(self.retry_backoff * 2 ** (attempt - 1), self.max_backoff)
+                heapq.heappush(self.retries, (due, next(self._sequence), collection, document, attempt))
+                self.metrics['retried'] += 1
+    
+    def _count(self, collection, documents):
+        if collection not in COUNTED_COLLECTIONS:
+            return
+        try:
+            per_hour = defaultdict(int)
+            for document in documents:
+                per_hour[document['timestamp'].replace(minute=0, second=0, microsecond=0)] += 1
+            for hour, count in per_hour.items():
+                self.mongo._increment_counters(collection, hour, count)
+        except Exception as e:
+            print(f'Database error: {e}')
+    
+    def get_metrics(self):
+        return {
+            **self.metrics,
+            'queue_depth': self.queue.qsize(),
+            'queue_capacity': self.max_size,
+            'retry_depth': len(self.retries),
+            'retry_capacity': self.retry_size,
+            'last_flush': self.last_flush
+        }
 
 class MongoDB:
     def __init__(self):
+        self.client = self._create_client()
+        self.db = self.client['women_safety_db']
+        self.writer = BufferedWriter(self)
+        atexit.register(self.writer.flush)
+    
+    def _create_client(self):
         mongo_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-        self.client = MongoClient(mongo_uri)
+        return MongoClient(
+            mongo_uri,
+            connect=False,
+            maxPoolSize=int(os.getenv('MONGO_MAX_POOL_SIZE', 50)),
+            minPoolSize=int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+            maxIdleTimeMS=int(os.getenv('MONGO_MAX_IDLE_MS', 60000)),
+            serverSelectionTimeoutMS=int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 3000)),
+            connectTimeoutMS=int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 3000)),
+            socketTimeoutMS=int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 10000)),
+            waitQueueTimeoutMS=int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000)),
+            retryWrites=True,
+            retryReads=True
+        )
+    
+    def reset_after_fork(self):
+        """Give a forked worker its own client, since MongoClient is not fork-safe"""
+        self.client = self._create_client()
         self.db = self.client['women_safety_db']
     
+    @time_mongo('save_emergency_alert')
     def save_emergency_alert(self, data):
         data['timestamp'] = datetime.now()
-        return self.db.emergency_alerts.insert_one(data)
+        alerts = self.db.get_collection(
+            'emergency_alerts', write_concern=WriteConcern('majority', wtimeout=5000)
+        )
+        result = alerts.insert_one(dict(data))
+        self._increment_counters('emergency_alerts', data['timestamp'])
+        return result
     
+    @time_mongo('save_incident')
     def save_incident(self, data):
         data['timestamp'] = datetime.now()
-        return self.db.incidents.insert_one(data)
+        result = self.db.incidents.insert_one(dict(data))
+        self._increment_counters('incidents', data['timestamp'])
+        return result
     
+    @time_mongo('save_review')
     def save_review(self, data):
         data['timestamp'] = datetime.now()
-        return self.db.reviews.insert_one(data)
+        return self._enqueue('reviews', data)
     
+    @time_mongo('save_report')
     def save_report(self, data):
         data['timestamp'] = datetime.now()
-        return self.db.reports.insert_one(data)
+        return self._enqueue('reports', data)
     
+    def _enqueue(self, collection, data):
+        """Queue a low-priority insert with a client-side _id so callers still get an id back"""
+        document = dict(data, _id=ObjectId())
+        self.writer.enqueue(collection, document)
+        return InsertOneResult(document['_id'], acknowledged=False)
+    
+    @time_mongo('get_reports')
     def get_reports(self):
         return list(self.db.reports.find({}, {'_id': 0}))
+    
+    def save_dashboard_snapshot(self, snapshot):
+        return self.db.dashboard_snapshots.replace_one({'_id': 'ai_dashboard'}, snapshot, upsert=True)
+    
+    def get_dashboard_snapshot(self):
+        return self.db.dashboard_snapshots.find_one({'_id': 'ai_dashboard'}, {'_id': 0})
+    
+    def ensure_indexes(self):
+        """Create the indexes the admin browser relies on and verify they exist"""
+        missing = []
+        for name in COUNTED_COLLECTIONS:
+            self.db[name].create_index(TIMESTAMP_INDEX, name='timestamp_id_desc')
+            indexes = self.db[name].index_information()
+            if not any(list(info['key']) == TIMESTAMP_INDEX for info in indexes.values()):
+                missing.append(name)
+        if missing:
+            raise RuntimeError(f"Timestamp index missing on: {', '.join(missing)}")
+        
+        self.db.location_buckets.create_index(
+            [('journey_id', ASCENDING), ('bucket_start', ASCENDING)], name='journey_bucket'
+        )
+        self.db.location_buckets.create_index('expires_at', name='retention_ttl', expireAfterSeconds=0)
+        self.ensure_counters()
+        return True
+    
+    def ensure_counters(self):
+        """Seed the running totals from the existing rows before any write can create them"""
+        if self.db.counters.find_one({'_id': 'totals'}, {'_id': 1}) is None:
+            self.rebuild_counters()
+    
+    @time_mongo('append_location_pings')
+    def append_location_pings(self, journey_id, bucket_start, pings):
+        """Append packed pings to a journey's bucket document in one upsert"""
+        return self.db.location_buckets.update_one(
+            {'_id': f"{journey_id}:{bucket_start.strftime('%Y%m%dT%H%M')}"},
+            {
+                '$push': {
+                    'lat': {'$each': [ping['lat'] for ping in pings]},
+                    'lng': {'$each': [ping['lng'] for ping in pings]},
+                    't': {'$each': [ping['t'] for ping in pings]}
+                },
+                '$inc': {'count': len(pings)},
+                '$max': {'bucket_end': pings[-1]['t']},
+                '$setOnInsert': {
+                    'journey_id': journey_id,
+                    'bucket_start': bucket_start,
+                    'expires_at': bucket_start + timedelta(days=LOCATION_RETENTION_DAYS)
+                }
+            },
+            upsert=True
+        )
+    
+    def get_location_buckets(self, journey_id):
+        return self.db.location_buckets.find({'journey_id': journey_id}).sort('bucket_start', ASCENDING)
+    
+    def find_page(self, collection, before=None, limit=50, fields=None):
+        """Return one page of a collection, newest first, starting after a (timestamp, _id) cursor"""
+        query = {}
+        if before:
+            timestamp, object_id = before
+            query = {'$or': [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$lt': object_id}}
+            ]}
+        cursor = self.db[collection].find(query, self._projection(fields))
+        return list(cursor.sort(TIMESTAMP_INDEX).limit(limit))
+    
+    def iter_collection(self, collection, fields=None, batch_size=500):
+        """Stream a whole collection, newest first, through a server-side cursor"""
+        cursor = self.db[collection].find({}, self._projection(fields))
+        return cursor.sort(TIMESTAMP_INDEX).batch_size(batch_size)
+    
+    def parse_cursor(self, value):
+        """Parse a 'timestamp,_id' keyset cursor as produced by make_cursor; raises ValueError if malformed"""
+        try:
+            timestamp, object_id = value.split(',', 1)
+            return datetime.fromisoformat(timestamp), ObjectId(object_id)
+        except InvalidId as e:
+            raise ValueError(f'Invalid cursor: {e}')
+    
+    def make_cursor(self, document):
+        return f"{document['timestamp'].isoformat()},{document['_id']}"
+    
+    def _projection(self, fields):
+        if not fields:
+            return None
+        projection = {field: 1 for field in fields}
+        projection['timestamp'] = 1
+        return projection
+    
+    def _increment_counters(self, collection, timestamp, count=1):
+        """Bump the running total and the hourly rollup for a collection"""
+        # No upsert on the totals: a $inc-created doc would start from zero and miss every pre-existing row
+        if self.db.counters.update_one({'_id': 'totals'}, {'$inc': {collection: count}}).matched_count == 0:
+            self.rebuild_counters()
+        self.db.counters.update_one(
+            {'_id': self._hour_key(timestamp)},
+            {'$inc': {collection: count}, '$setOnInsert': {'hour': timestamp.replace(minute=0, second=0, microsecond=0)}},
+            upsert=True
+        )
+    
+    def _hour_key(self, timestamp):
+        return f"hour:{timestamp.strftime('%Y-%m-%dT%H')}"
+    
+    @time_mongo('get_counters')
+    def get_counters(self):
+        """Read the per-collection totals, seeding them from a one-off count if missing"""
+        totals = self.db.counters.find_one({'_id': 'totals'}, {'_id': 0})
+        if totals is None:
+            totals = self.rebuild_counters()
+        return {name: totals.get(name, 0) for name in COUNTED_COLLECTIONS}
+    
+    def get_hourly_counters(self, hours=24):
+        """Read the hourly rollups for the last few hours, oldest first"""
+        now = datetime.now()
+        keys = [self._hour_key(now - timedelta(hours=i)) for i in range(hours - 1, -1, -1)]
+        found = {doc['_id']: doc for doc in self.db.counters.find({'_id': {'$in': keys}})}
+        return [
+            {'hour': key[len('hour:'):], **{name: found.get(key, {}).get(name, 0) for name in COUNTED_COLLECTIONS}}
+            for key in keys
+        ]
+    
+    def rebuild_counters(self):
+        """Recount every collection once and store the result as the running totals"""
+        totals = {name: self.db[name].count_documents({}) for name in COUNTED_COLLECTIONS}
+        self.db.counters.replace_one({'_id': 'totals'}, totals, upsert=True)
+        return totals
 
-db = MongoDB()
\ No newline at end of file
+db = MongoDB()
@@ -0,0 +1,190 @@
+import json
+import os
+import time
+import numpy as np
+
+DEFAULT_GEOFENCES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geofences.json')
+NODE_CAPACITY = 16
+
+def _str_order(bboxes, capacity):
+    """Sort-Tile-Recursive order: slabs by x centre, then y centre within each slab"""
+    count = len(bboxes)
+    centers_x = (bboxes[:, 0] + bboxes[:, 2]) / 2
+    centers_y = (bboxes[:, 1] + bboxes[:, 3]) / 2
+    slab_size = capacity * int(np.ceil(np.sqrt(np.ceil(count / capacity))))
+    by_x = np.argsort(centers_x, kind='stable')
+    order = [
+        slab[np.argsort(centers_y[slab], kind='stable')]
+        for slab in (by_x[i:i + slab_size] for i in range(0, count, slab_size))
+    ]
+    return np.concatenate(order) if order else by_x
+
+def _ranges(starts, ends):
+    """Concatenated aranges [starts[i], ends[i]) without a Python loop"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(ends - lengths.cumsum(), lengths)
+    return np.arange(total) + offsets
+
+class GeofenceIndex:
+    """Danger and safe zone polygons in a packed STR-tree, queried with bbox filtering and vectorized ray casting"""
+    
+    def __init__(self, features=None):
+        self.fences = []
+        self.levels = []
+        self.load_seconds = 0
+        self._build(features or [])
+    
+    @classmethod
+    def from_file(cls, path=None):
+        path = path or os.getenv('GEOFENCES_FILE', DEFAULT_GEOFENCES_FILE)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f'Geofences error: {e}')
+            data = {}
+        return cls(data.get('features', []))
+    
+    def _build(self, features):
+        started = time.perf_counter()
+        part_fence, part_bbox, edge_parts, edges = [], [], [], []
+        
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue
+            
+            properties = feature.get('properties') or {}
+            fence_index = len(self.fences)
+            kind = properties.get('kind', 'danger')
+            self.fences.append({
+                'id': str(feature.get('id', properties.get('id', fence_index))),
+                'name': properties.get('name', f'Zone {fence_index}'),
+                'kind': kind,
+                'alert_on': properties.get('alert_on', ['enter'] if kind == 'danger' else ['enter', 'exit']),
+                'coordinates': geometry['coordinates']
+            })
+            
+            for rings in polygons:
+                ring_arrays = [np.asarray(ring, dtype=float) for ring in rings if len(ring) >= 3]
+                if not ring_arrays:
+                    continue
+                part = len(part_fence)
+                part_fence.append(fence_index)
+                outer = ring_arrays[0]
+                part_bbox.append([outer[:, 0].min(), outer[:, 1].min(), outer[:, 0].max(), outer[:, 1].max()])
+                for ring in ring_arrays:
+                    edges.append(np.column_stack([ring, np.roll(ring, -1, axis=0)]))
+                    edge_parts.append(np.full(len(ring), part))
+        
+        self.part_fence = np.asarray(part_fence, dtype=np.int64)
+        bboxes = np.asarray(part_bbox, dtype=float).reshape(-1, 4)
+        
+        # Edges grouped per part (x1, y1, x2, y2 in lng/lat), so a part's edges are one contiguous slice
+        if edges:
+            edges = np.concatenate(edges)
+            edge_parts = np.concatenate(edge_parts)
+            by_part = np.argsort(edge_parts, kind='stable')
+            self.edges = edges[by_part]
+            counts = np.bincount(edge_parts, minlength=len(part_fence))
+        else:
+            self.edges = np.empty((0, 4))
+            counts = np.zeros(0, dtype=np.int64)
+        self.edge_end = np.cumsum(counts)
+        self.edge_start = self.edge_end - counts
+        
+        # Leaves are parts in STR order; each upper level groups NODE_CAPACITY consecutive entries of the one below
+        order = _str_order(bboxes, NODE_CAPACITY) if len(bboxes) else np.empty(0, dtype=np.int64)
+        self.leaf_parts = order
+        self.leaf_bbox = bboxes[order]
+        self.levels = []
+        level_bbox = self.leaf_bbox
+        while len(level_bbox) > NODE_CAPACITY:
+            starts = np.arange(0, len(level_bbox), NODE_CAPACITY)
+            ends = np.minimum(starts + NODE_CAPACITY, len(level_bbox))
+            node_bbox = np.column_stack([
+                np.minimum.reduceat(level_bbox[:, 0], starts), np.minimum.reduceat(level_bbox[:, 1], starts),
+                np.maximum.reduceat(level_bbox[:, 2], starts), np.maximum.reduceat(level_bbox[:, 3], starts)
+            ])
+            # Re-tile the nodes themselves; each keeps its child range into the level below
+            node_order = _str_order(node_bbox, NODE_CAPACITY)
+            self.levels.append((node_bbox[node_order], starts[node_order], ends[node_order]))
+            level_bbox = node_bbox[node_order]
+        self.levels.reverse()
+        self.load_seconds = time.perf_counter() - started
+    
+    def _candidate_parts(self, lng, lat):
+        if not len(self.leaf_bbox):
+            return np.empty(0, dtype=np.int64)
+        candidates = np.arange(len(self.levels[0][0]) if self.levels else len(self.leaf_bbox))
+        for bbox, starts, ends in self.levels:
+            box = bbox[candidates]
+            hit = candidates[(box[:, 0] <= lng) & (lng <= box[:, 2]) & (box[:, 1] <= lat) & (lat <= box[:, 3])]
+            candidates = _ranges(starts[hit], ends[hit])
+        
+        box = self.leaf_bbox[candidates]
+        hit = candidates[(box[:, 0] <= lng) & (lng <= box[:, 2]) & (box[:, 1] <= lat) & (lat <= box[:, 3])]
+        return self.leaf_parts[hit]
+    
+    def containing(self, lat, lng):
+        """Indices of the fences the point lies inside (even-odd rule, so holes are honoured)"""
+        parts = self._candidate_parts(lng, lat)
+        if not len(parts):
+            return set()
+        
+        edge_index = _ranges(self.edge_start[parts], self.edge_end[parts])
+        x1, y1, x2, y2 = self.edges[edge_index].T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crosses = ((y1 > lat) != (y2 > lat)) & (lng < (x2 - x1) * (lat - y1) / (y2 - y1) + x1)
+        owner = np.repeat(np.arange(len(parts)), self.edge_end[parts] - self.edge_start[parts])
+        inside = np.bincount(owner, weights=crosses, minlength=len(parts)) % 2 == 1
+        return set(self.part_fence[parts[inside]].tolist())
+    
+    def first_containing(self, lats, lngs):
+        """Lowest index of a fence containing each point, or -1 outside all; vectorized over the points for batch jobs"""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        inside = {}
+        for part, fence in enumerate(self.part_fence.tolist()):
+            edges = self.edges[self.edge_start[part]:self.edge_end[part]]
+            candidates = np.flatnonzero(
+                (lngs >= edges[:, [0, 2]].min()) & (lngs <= edges[:, [0, 2]].max()) &
+                (lats >= edges[:, [1, 3]].min()) & (lats <= edges[:, [1, 3]].max())
+            )
+            lat, lng = lats[candidates], lngs[candidates]
+            crossings = np.zeros(len(candidates), dtype=bool)
+            for x1, y1, x2, y2 in edges:
+                if y1 != y2:
+                    crossings ^= ((y1 > lat) != (y2 > lat)) & (lng < (x2 - x1) * (lat - y1) / (y2 - y1) + x1)
+            inside.setdefault(fence, np.zeros(len(lats), dtype=bool))[candidates[crossings]] = True
+        
+        result = np.full(len(lats), -1, dtype=np.int64)
+        for fence in sorted(inside, reverse=True):
+            result[inside[fence]] = fence
+        return result
+    
+    def summaries(self, kind):
+        return [
+            {'id': fence['id'], 'name': fence['name'], 'coordinates': fence['coordinates']}
+            for fence in self.fences if fence['kind'] == kind
+        ]
+    
+    def get_stats(self):
+        return {
+            'fences': len(self.fences),
+            'polygons': len(self.part_fence),
+            'edges': len(self.edges),
+            'tree_levels': len(self.levels) + 1,
+            'node_capacity': NODE_CAPACITY,
+            'build_seconds': round(self.load_seconds, 3)
+        }
+
+
+geofence_index = GeofenceIndex.from_file()
@@ -0,0 +1,49 @@
+"""
+Gunicorn configuration for production.
+
+The app (and the trained AISafetyPredictor forests) is imported once in the
+master and shared copy-on-write with the forked workers. Garbage collection
+is frozen before forking so the collector does not touch and copy those pages.
+"""
+import gc
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', 5001)}")
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+pidfile = os.getenv('PIDFILE', os.path.join(tempfile.gettempdir(), 'women-safety-map.pid'))
+accesslog = os.getenv('ACCESS_LOG')
+
+if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='womap-metrics-')
+
+# Keep the collector from running while the app is being preloaded
+gc.disable()
+
+
+def when_ready(server):
+    from app import init_database, build_region_artifacts
+    init_database()
+    build_region_artifacts()
+    gc.freeze()
+    server.log.info('Preloaded app, froze %d objects for copy-on-write sharing', gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    from database import db
+    db.reset_after_fork()
+    gc.enable()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
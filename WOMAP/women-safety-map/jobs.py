@@ -0,0 +1,312 @@
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+import numpy as np
+from model import ai_predictor
+import scoring_worker
+
+DEFAULT_JOBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs')
+METERS_PER_DEGREE = 111320
+RESULT_COLUMNS = ['crime_risk', 'crowd_density', 'safety_score']
+
+class JobManager:
+    """Runs large batch scoring jobs in chunks on a process pool.
+    
+    Points to score are written to an input .npy file and every chunk task only
+    carries its row range and the artifacts of the job's regions; pool
+    processes load each artifact once and write their scores straight into a
+    shared memory-mapped output file. Points in a region whose artifact has not
+    been built are scored with the default model and listed in the job status.
+    """
+    
+    def __init__(self, jobs_dir=None, workers=None, chunk_size=None):
+        self.jobs_dir = jobs_dir or os.getenv('JOBS_DIR', DEFAULT_JOBS_DIR)
+        self.workers = workers or int(os.getenv('JOBS_WORKERS', os.cpu_count() or 1))
+        self.chunk_size = chunk_size or int(os.getenv('JOBS_CHUNK_SIZE', 5000))
+        self.max_points = int(os.getenv('JOBS_MAX_POINTS', 2000000))
+        self.max_jobs = int(os.getenv('JOBS_MAX_KEPT', 50))
+        self.status_interval = float(os.getenv('JOBS_STATUS_SECONDS', 0.25))
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+    
+    def _get_pool(self):
+        """Start the pool lazily, once per web worker process"""
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                os.makedirs(self.jobs_dir, exist_ok=True)
+                artifact_path = os.path.join(self.jobs_dir, f'model-{os.getpid()}.joblib')
+                ai_predictor.export_artifact(artifact_path)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=scoring_worker.init_worker,
+                    initargs=(artifact_path,)
+                )
+                self._pid = os.getpid()
+            return self._pool
+    
+    def _build_city_grid(self, params):
+        """Grid points covering a bounding box at the requested resolution"""
+        south, west = float(params['south']), float(params['west'])
+        north, east = float(params['north']), float(params['east'])
+        resolution = float(params.get('resolution_m', 200))
+        if south >= north or west >= east or resolution <= 0:
+            raise ValueError('Invalid bounding box or resolution')
+        
+        lat_step = resolution / METERS_PER_DEGREE
+        lng_step = resolution / (METERS_PER_DEGREE * math.cos(math.radians((south + north) / 2)))
+        rows = int((north - south) / lat_step) + 1
+        cols = int((east - west) / lng_step) + 1
+        self._check_size(rows * cols)
+        
+        lats, lngs = np.meshgrid(
+            south + np.arange(rows) * lat_step, west + np.arange(cols) * lng_step, indexing='ij'
+        )
+        now = datetime.now()
+        hour = int(params.get('hour', now.hour))
+        day = int(params.get('day_of_week', now.weekday()))
+        return self._points(lats.ravel(), lngs.ravel(), hour, day), None
+    
+    def _build_road_edges(self, params):
+        """Midpoints of road edges given as [start_lat, start_lng, end_lat, end_lng]"""
+        edges = np.asarray(params['edges'], dtype=float)
+        if edges.ndim != 2 or edges.shape[1] != 4:
+            raise ValueError('edges must be a list of [start_lat, start_lng, end_lat, end_lng]')
+        self._check_size(len(edges))
+        
+        now = datetime.now()
+        hour = int(params.get('hour', now.hour))
+        day = int(params.get('day_of_week', now.weekday()))
+        return self._points((edges[:, 0] + edges[:, 2]) / 2, (edges[:, 1] + edges[:, 3]) / 2, hour, day), None
+    
+    def _build_area_forecast(self, params):
+        """Every area scored for each of the next hours_ahead hours"""
+        areas = params.get('areas')
+        if areas is None:
+            from dashboard import dashboard_snapshot
+            monitored = dashboard_snapshot.monitored_areas
+            city = params.get('city')
+            areas = monitored.get(city, []) if city else [a for c in monitored.values() for a in c]
+        hours_ahead = int(params.get('hours_ahead', 24))
+        if not areas or hours_ahead <= 0:
+            raise ValueError('No areas to forecast')
+        self._check_size(len(areas) * hours_ahead)
+        
+        now = datetime.now()
+        times = [now + timedelta(hours=i) for i in range(hours_ahead)]
+        lats = np.repeat([float(a['lat']) for a in areas], hours_ahead)
+        lngs = np.repeat([float(a['lng']) for a in areas], hours_ahead)
+        hours = np.tile([t.hour for t in times], len(areas))
+        days = np.tile([t.weekday() for t in times], len(areas))
+        labels = [
+            {'location': a.get('name'), 'time': t.strftime('%Y-%m-%d %H:%M')}
+            for a in areas for t in times
+        ]
+        return self._points(lats, lngs, hours, days), labels
+    
+    def _points(self, lats, lngs, hours, days):
+        points = np.empty((len(lats), 5))
+        points[:, 0] = lats
+        points[:, 1] = lngs
+        points[:, 2] = hours
+        points[:, 3] = days
+        points[:, 4] = ai_predictor.regions.assign(points[:, 0], points[:, 1])
+        return points
+    
+    def _routes(self, points):
+        """Artifact, bounds and grid per region in the job, and the regions falling back to the default model"""
+        regions = ai_predictor.regions
+        routes, missing = {}, []
+        for index in np.unique(points[:, 4]).astype(int).tolist():
+            if index < 0:
+                continue
+            region_id = regions.region_ids[index]
+            path = regions.artifact_path(region_id)
+            if os.path.exists(path):
+                routes[index] = (path, regions.regions[region_id]['bounds'], regions.grid_meters)
+            else:
+                missing.append(region_id)
+        return routes, missing
+    
+    def _check_size(self, count):
+        if count > self.max_points:
+            raise ValueError(f'Job has {count} points, the limit is {self.max_points}')
+    
+    def submit(self, job_type, params):
+        """Create a job, write its input points and queue its chunks on the pool"""
+        builders = {
+            'city_grid': self._build_city_grid,
+            'road_edges': self._build_road_edges,
+            'area_forecast': self._build_area_forecast
+        }
+        if job_type not in builders:
+            raise ValueError(f'Unknown job type: {job_type}')
+        try:
+            points, labels = builders[job_type](params)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f'Invalid job parameters: {e}')
+        
+        pool = self._get_pool()
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(job_dir)
+        input_path = os.path.join(job_dir, 'input.npy')
+        output_path = os.path.join(job_dir, 'output.npy')
+        np.save(input_path, points)
+        np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float64, shape=(len(points), 3)).flush()
+        
+        center = points[len(points) // 2]
+        weather = ai_predictor.get_weather_data(center[0], center[1])
+        routes, missing_regions = self._routes(points)
+        if missing_regions:
+            print(f"Scoring job: no artifact for {', '.join(missing_regions)}, using the default model")
+        
+        job = {
+            'id': job_id,
+            'type': job_type,
+            'status': 'running',
+            'total': len(points),
+            'completed': 0,
+            'chunks': math.ceil(len(points) / self.chunk_size),
+            'weather': weather['condition'],
+            'regions': [ai_predictor.regions.region_ids[index] for index in sorted(routes)],
+            'default_model_regions': missing_regions,
+            'created_at': datetime.now().isoformat(),
+            'started': time.time(),
+            'status_written': time.time(),
+            'finished_at': None,
+            'duration_seconds': None,
+            'error': None,
+            'labels': labels,
+            'dir': job_dir
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+            self._evict()
+        self._write_status(job)
+        
+        try:
+            for start in range(0, len(points), self.chunk_size):
+                end = min(start + self.chunk_size, len(points))
+                future = pool.submit(
+                    scoring_worker.score_chunk, (input_path, output_path, start, end, weather['score'], routes)
+                )
+                future.add_done_callback(lambda f, job=job: self._chunk_done(job, f))
+        except BrokenProcessPool as e:
+            self._fail(job, e)
+        return self.get(job_id)
+    
+    def _chunk_done(self, job, future):
+        with self._lock:
+            if job['status'] != 'running':
+                return
+            try:
+                start, end = future.result()
+                job['completed'] += end - start
+            except Exception as e:
+                error = e
+            else:
+                if job['completed'] < job['total']:
+                    # Progress for the other web workers, written at most every status_interval seconds
+                    if time.time() - job['status_written'] < self.status_interval:
+                        return
+                else:
+                    job['status'] = 'completed'
+                    self._finish(job)
+                job['status_written'] = time.time()
+                error = None
+        if error is None:
+            self._write_status(job)
+        else:
+            self._fail(job, error)
+    
+    def _fail(self, job, error):
+        """Mark a job failed; a broken pool is dropped so the next job starts a fresh one"""
+        print(f'Scoring job error: {error}')
+        with self._lock:
+            if isinstance(error, BrokenProcessPool):
+                self._pool = None
+            if job['status'] != 'running':
+                return
+            job['status'] = 'failed'
+            job['error'] = str(error) or error.__class__.__name__
+            self._finish(job)
+        self._write_status(job)
+    
+    def _finish(self, job):
+        job['finished_at'] = datetime.now().isoformat()
+        job['duration_seconds'] = round(time.time() - job['started'], 3)
+    
+    def _evict(self):
+        """Drop the oldest finished jobs and their files beyond the retention limit"""
+        finished = [j for j in self.jobs.values() if j['status'] != 'running']
+        for job in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+            del self.jobs[job['id']]
+            shutil.rmtree(job['dir'], ignore_errors=True)
+    
+    def _write_status(self, job):
+        """Persist the job status so other web workers can answer for it, replacing it whole so readers never see half a file"""
+        path = os.path.join(job['dir'], 'status.json')
+        try:
+            partial = f'{path}.{threading.get_ident()}.tmp'
+            with open(partial, 'w') as f:
+                json.dump(job, f)
+            os.replace(partial, path)
+        except Exception as e:
+            print(f'Scoring job error: {e}')
+    
+    def _load(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None and job_id.isalnum():
+            try:
+                with open(os.path.join(self.jobs_dir, job_id, 'status.json')) as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                return None
+        return job
+    
+    def get(self, job_id):
+        job = self._load(job_id)
+        if job is None:
+            return None
+        status = {k: v for k, v in job.items() if k not in ('labels', 'dir', 'started', 'status_written')}
+        status['progress'] = round(job['completed'] / job['total'], 4) if job['total'] else 1.0
+        return status
+    
+    def list_jobs(self):
+        return [self.get(job_id) for job_id in reversed(self.jobs)]
+    
+    def get_result(self, job_id, offset=0, limit=1000):
+        """A page of scored points; rows of chunks still running come back as zeros"""
+        job = self._load(job_id)
+        if job is None:
+            return None
+        points = np.load(os.path.join(job['dir'], 'input.npy'), mmap_mode='r')[offset:offset + limit]
+        scores = np.load(os.path.join(job['dir'], 'output.npy'), mmap_mode='r')[offset:offset + limit]
+        
+        results = []
+        for i, (point, score) in enumerate(zip(points, scores)):
+            row = {'lat': round(float(point[0]), 6), 'lng': round(float(point[1]), 6), 'hour': int(point[2])}
+            row.update({name: round(float(value), 1) for name, value in zip(RESULT_COLUMNS, score)})
+            if job['labels']:
+                row.update(job['labels'][offset + i])
+            results.append(row)
+        return {
+            'job': self.get(job_id),
+            'offset': offset,
+            'limit': limit,
+            'results': results
+        }
+
+job_manager = JobManager()
@@ -1,8 +1,15 @@
 import json
+import os
 import uuid
 from datetime import datetime, timedelta
 from threading import Timer
 import math
+from location_store import location_store
+from metrics import ACTIVE_JOURNEYS, LOCATION_HISTORY_POINTS, PENDING_TIMERS
+from outbox import NotificationOutbox
+from geofence import geofence_index
+from proximity import JourneyGridIndex
+from trajectory import TrajectoryProcessor
 
 class LiveTrackingManager:
     def __init__(self):
@@ -10,9 +17,22 @@ class LiveTrackingManager:
         self.trusted_contacts = {}
         self.location_history = {}
         self.route_deviations = {}
+        self.notifier = None
+        self.geofences = geofence_index
+        self.geofence_state = {}
+        self.proximity = JourneyGridIndex()
+        self.proximity_alert_meters = float(os.getenv('PROXIMITY_ALERT_METERS', 500))
+        self.proximity_realert_seconds = float(os.getenv('PROXIMITY_REALERT_SECONDS', 120))
+        self.nearby_alerted = {}
+        self.outbox = NotificationOutbox(lambda phone, message: self._send_notification(phone, message))
+        self.trajectory = TrajectoryProcessor(clock=lambda: self.outbox.clock())
+        self.urgent_trajectory_events = set(os.getenv('TRAJECTORY_URGENT_EVENTS', 'prolonged_stop').split(','))
+        self.deviation_clear_meters = float(os.getenv('DEVIATION_CLEAR_METERS', 150))
+        self.deviation_realert_meters = float(os.getenv('DEVIATION_REALERT_METERS', 300))
+        self.deviation_realert_seconds = float(os.getenv('DEVIATION_REALERT_SECONDS', 600))
     
-    def start_journey(self, user_id, start_location, destination, planned_route, trusted_contacts):
-        """Start live journey tracking"""
+    def start_journey(self, user_id, start_location, destination, planned_route, trusted_contacts, user_phone=None):
+        """Start live journey tracking; user_phone, if given, receives nearby report alerts"""
         journey_id = str(uuid.uuid4())
         
         journey_data = {
@@ -23,20 +43,32 @@ class LiveTrackingManager:
             'destination': destination,
             'planned_route': planned_route,
             'trusted_contacts': trusted_contacts,
+            'user_phone': user_phone,
             'current_location': start_location,
             'status': 'active',
             'last_update': datetime.now().isoformat(),
             'deviation_alerts': [],
+            'geofence_events': [],
+            'nearby_reports': [],
+            'trajectory_events': [],
             'panic_mode': False
         }
         
         self.active_journeys[journey_id] = journey_data
         self.location_history[journey_id] = [start_location]
+        ACTIVE_JOURNEYS.inc()
+        LOCATION_HISTORY_POINTS.inc()
+        if 'lat' in start_location and 'lng' in start_location:
+            location_store.record(journey_id, start_location)
+            # Zones the journey starts in (usually home) set the initial state without alerting
+            self.geofence_state[journey_id] = self.geofences.containing(start_location['lat'], start_location['lng'])
+            self.proximity.update(journey_id, start_location['lat'], start_location['lng'])
+            self.trajectory.start(journey_id, start_location['lat'], start_location['lng'])
         
         
         self._notify_journey_start(journey_data)
         
-         
+        
         self._schedule_check_in(journey_id)
         
         return journey_id
@@ -45,6 +77,10 @@ class LiveTrackingManager:
         """Update current location during journey"""
         if journey_id not in self.active_journeys:
             return {'error': 'Journey not found'}
+        try:
+            current_location = dict(current_location, lat=float(current_location['lat']), lng=float(current_location['lng']))
+        except (KeyError, TypeError, ValueError):
+            return {'error': 'Invalid location'}
         
         journey = self.active_journeys[journey_id]
         journey['current_location'] = current_location
@@ -55,16 +91,25 @@ class LiveTrackingManager:
             'location': current_location,
             'timestamp': datetime.now().isoformat()
         })
+        LOCATION_HISTORY_POINTS.inc()
+        location_store.record(journey_id, current_location)
+        self.proximity.update(journey_id, current_location['lat'], current_location['lng'])
         
         
         deviation = self._check_route_deviation(journey_id, current_location)
         if deviation:
             self._handle_route_deviation(journey_id, deviation)
         
+        geofence_events = self._check_geofences(journey_id, current_location)
+        trajectory_events = self._check_trajectory(journey_id, current_location)
+        
         
         self._notify_location_update(journey)
         
-        return {'status': 'updated', 'deviation': deviation}
+        return {
+            'status': 'updated', 'deviation': deviation, 'geofence_events': geofence_events,
+            'trajectory_events': trajectory_events
+        }
     
     def activate_panic_mode(self, journey_id, panic_data=None):
         """Activate panic mode with live streaming"""
@@ -103,9 +148,40 @@ class LiveTrackingManager:
         
         
         del self.active_journeys[journey_id]
+        self.route_deviations.pop(journey_id, None)
+        self.nearby_alerted.pop(journey_id, None)
+        self.geofence_state.pop(journey_id, None)
+        self.proximity.remove(journey_id)
+        self.trajectory.remove(journey_id)
+        ACTIVE_JOURNEYS.dec()
+        location_store.close_journey(journey_id)
         
         return {'status': 'journey_ended', 'contacts_notified': True}
     
+    def alert_nearby(self, report_type, location, description=None):
+        """Tell journeys currently near a new report (and their contacts) about it"""
+        try:
+            lat, lng = float(location['lat']), float(location['lng'])
+        except (KeyError, TypeError, ValueError):
+            return 0
+        
+        alerted = 0
+        for journey_id, distance in self.proximity.nearby(lat, lng, self.proximity_alert_meters):
+            journey = self.active_journeys.get(journey_id)
+            if journey is None:
+                continue
+            alert = {
+                'type': report_type,
+                'description': description,
+                'location': {'lat': lat, 'lng': lng},
+                'distance': round(distance),
+                'timestamp': datetime.now().isoformat()
+            }
+            journey.setdefault('nearby_reports', []).append(alert)
+            self._send_nearby_report_alert(journey, alert)
+            alerted += 1
+        return alerted
+    
     def get_journey_status(self, journey_id):
         """Get current journey status"""
         if journey_id not in self.active_journeys:
@@ -117,7 +193,8 @@ class LiveTrackingManager:
         return {
             'journey': journey,
             'location_history': location_history[-10:],  
-            'total_locations': len(location_history)
+            'total_locations': len(location_history),
+            'motion': self.trajectory.snapshot(journey_id)
         }
     
     def get_family_dashboard(self, contact_phone):
@@ -135,7 +212,8 @@ class LiveTrackingManager:
                     'status': journey['status'],
                     'last_update': journey['last_update'],
                     'panic_mode': journey.get('panic_mode', False),
-                    'deviation_alerts': journey.get('deviation_alerts', [])
+                    'deviation_alerts': journey.get('deviation_alerts', []),
+                    'geofence_events': journey.get('geofence_events', [])
                 }
                 active_journeys_for_contact.append(journey_info)
         
@@ -170,6 +248,9 @@ class LiveTrackingManager:
                 'timestamp': datetime.now().isoformat()
             }
         
+        # Hysteresis: only a clear return to the route re-arms the deviation alert
+        if min_distance <= self.deviation_clear_meters:
+            self.route_deviations.pop(journey_id, None)
         return None
     
     def _handle_route_deviation(self, journey_id, deviation):
@@ -183,14 +264,60 @@ class LiveTrackingManager:
         journey['deviation_alerts'].append(deviation)
         
         
-        self._send_deviation_alert(journey, deviation)
+        distance = deviation['distance_from_route']
+        now = self.outbox.clock()
+        alerted = self.route_deviations.get(journey_id)
+        if (not self.outbox.enabled or alerted is None
+                or distance >= alerted['distance'] + self.deviation_realert_meters
+                or now - alerted['at'] >= self.deviation_realert_seconds):
+            self.route_deviations[journey_id] = {'distance': distance, 'at': now}
+            self._send_deviation_alert(journey, deviation)
+        else:
+            self._digest_deviation(journey, deviation)
+    
+    def _check_geofences(self, journey_id, current_location):
+        """Compare the zones containing this ping with the journey's previous ones; only transitions fire"""
+        inside = self.geofences.containing(current_location['lat'], current_location['lng'])
+        previous = self.geofence_state.get(journey_id, set())
+        self.geofence_state[journey_id] = inside
+        if inside == previous:
+            return []
+        
+        journey = self.active_journeys[journey_id]
+        events = []
+        transitions = [(index, 'enter') for index in inside - previous] + [(index, 'exit') for index in previous - inside]
+        for index, transition in transitions:
+            fence = self.geofences.fences[index]
+            event = {
+                'fence_id': fence['id'],
+                'name': fence['name'],
+                'kind': fence['kind'],
+                'transition': transition,
+                'location': current_location,
+                'timestamp': datetime.now().isoformat()
+            }
+            events.append(event)
+            journey.setdefault('geofence_events', []).append(event)
+            if transition in fence['alert_on']:
+                self._send_geofence_alert(journey, event)
+        return events
+    
+    def _check_trajectory(self, journey_id, current_location):
+        """Update the journey's running motion estimates and alert on the anomalies they show"""
+        events = self.trajectory.update(journey_id, current_location['lat'], current_location['lng'])
+        if events:
+            journey = self.active_journeys[journey_id]
+            for event in events:
+                journey.setdefault('trajectory_events', []).append(event)
+                self._send_trajectory_alert(journey, event)
+        return events
     
     def _notify_journey_start(self, journey_data):
         """Notify trusted contacts that journey has started"""
         message = f"🚀 Journey Started\n\n{journey_data['user_id']} has started their journey to {journey_data['destination']['name']}\n\n📍 Live tracking: http://localhost:8080/track/{journey_data['journey_id']}\n\nYou'll receive updates during the journey."
         
         for contact in journey_data['trusted_contacts']:
-            self._send_notification(contact, message)
+            self.outbox.send_now(contact, message)
     
     def _notify_location_update(self, journey_data):
         """Send periodic location updates to trusted contacts"""
@@ -203,14 +330,14 @@ class LiveTrackingManager:
         message = f" Location Update\n\n{journey_data['user_id']} is currently at:\nLat: {location['lat']:.6f}\nLng: {location['lng']:.6f}\n\n🗺️ View: https://maps.google.com/?q={location['lat']},{location['lng']}"
         
         for contact in journey_data['trusted_contacts']:
-            self._send_notification(contact, message)
+            self.outbox.enqueue(contact, f"location:{journey_data['journey_id']}", message)
     
     def _notify_journey_end(self, journey_data):
         """Notify trusted contacts of safe arrival"""
         message = f" Safe Arrival\n\n{journey_data['user_id']} has safely reached their destination!\n\nJourney completed at {datetime.now().strftime('%H:%M')}"
         
         for contact in journey_data['trusted_contacts']:
-            self._send_notification(contact, message)
+            self.outbox.send_now(contact, message)
     
     def _send_panic_alerts(self, journey_data):
         """Send immediate panic alerts to all contacts"""
@@ -219,18 +346,78 @@ class LiveTrackingManager:
         
         
         for contact in journey_data['trusted_contacts']:
-            self._send_notification(contact, message)
+            self.outbox.send_now(contact, message)
         
         
         admin_message = f" PANIC MODE ACTIVATED \n\nUser: {journey_data['user_id']}\nLocation: {location['lat']:.6f}, {location['lng']:.6f}\nTime: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\nIMMEDIATE RESPONSE REQUIRED!"
-        self._send_notification('+919902480636', admin_message)
+        self.outbox.send_now('+919902480636', admin_message)
     
     def _send_deviation_alert(self, journey_data, deviation):
         """Send route deviation alert"""
         message = f" Route Deviation Alert\n\n{journey_data['user_id']} has deviated from their planned route by {deviation['distance_from_route']:.0f}m\n\n📍 Current location:\nhttps://maps.google.com/?q={deviation['current_location']['lat']},{deviation['current_location']['lng']}\n\nTime: {datetime.now().strftime('%H:%M')}"
         
         for contact in journey_data['trusted_contacts']:
-            self._send_notification(contact, message)
+            self.outbox.send_now(contact, message)
+    
+    def _digest_deviation(self, journey_data, deviation):
+        """Fold a repeat deviation of an already-alerted journey into the contacts' next digest"""
+        location = deviation['current_location']
+        message = f" Still Off Route\n\n{journey_data['user_id']} is {deviation['distance_from_route']:.0f}m from their planned route\n\n📍 Latest location:\nhttps://maps.google.com/?q={location['lat']},{location['lng']}\n\nTime: {datetime.now().strftime('%H:%M')}"
+        
+        self.outbox.suppress()
+        for contact in journey_data['trusted_contacts']:
+            self.outbox.enqueue(contact, f"deviation:{journey_data['journey_id']}", message)
+    
+    def _send_geofence_alert(self, journey_data, event):
+        """Entering a danger zone alerts contacts at once; other zone transitions go into their digest"""
+        location = event['location']
+        verb = 'entered' if event['transition'] == 'enter' else 'left'
+        title = 'Danger Zone Alert' if event['kind'] == 'danger' else 'Safe Zone Update'
+        message = f" {title}\n\n{journey_data['user_id']} has {verb} {event['name']}\n\n📍 Current location:\nhttps://maps.google.com/?q={location['lat']},{location['lng']}\n\nTime: {datetime.now().strftime('%H:%M')}"
+        
+        for contact in journey_data['trusted_contacts']:
+            if event['kind'] == 'danger' and event['transition'] == 'enter':
+                self.outbox.send_now(contact, message)
+            else:
+                self.outbox.enqueue(contact, f"geofence:{journey_data['journey_id']}:{event['fence_id']}", message)
+    
+    def _send_trajectory_alert(self, journey_data, event):
+        """Urgent motion anomalies (TRAJECTORY_URGENT_EVENTS) alert contacts at once, the rest go into their digest"""
+        location = event['location']
+        if event['type'] == 'sudden_stop':
+            detail = f"came to a sudden stop after moving at {event['from_speed'] * 3.6:.0f} km/h"
+        elif event['type'] == 'reversal':
+            detail = f"abruptly turned back ({event['turn_degrees']}° change of direction)"
+        else:
+            detail = f"has not moved for {event['dwell_seconds'] // 60} minutes"
+        message = f"⚠️ Movement Alert\n\n{journey_data['user_id']} {detail}\n\n📍 Current location:\nhttps://maps.google.com/?q={location['lat']},{location['lng']}\n\nTime: {datetime.now().strftime('%H:%M')}"
+        
+        for contact in journey_data['trusted_contacts']:
+            if event['type'] in self.urgent_trajectory_events:
+                self.outbox.send_now(contact, message)
+            else:
+                self.outbox.enqueue(contact, f"trajectory:{journey_data['journey_id']}:{event['type']}", message)
+    
+    def _send_nearby_report_alert(self, journey_data, alert):
+        """Alert the user and contacts at once; further reports within PROXIMITY_REALERT_SECONDS go into their digest"""
+        location = alert['location']
+        report = f"A {alert['type'] or 'safety'} report was filed {alert['distance']}m from"
+        details = f"📍 Report location:\nhttps://maps.google.com/?q={location['lat']},{location['lng']}\n\nTime: {datetime.now().strftime('%H:%M')}"
+        messages = [(contact, f"⚠️ Nearby Incident Reported\n\n{report} {journey_data['user_id']}\n\n{details}") for contact in journey_data['trusted_contacts']]
+        if journey_data.get('user_phone'):
+            messages.append((journey_data['user_phone'], f"⚠️ Nearby Incident Reported\n\n{report} you\n\n{details}"))
+        
+        journey_id = journey_data['journey_id']
+        now = self.outbox.clock()
+        alerted_at = self.nearby_alerted.get(journey_id)
+        if not self.outbox.enabled or alerted_at is None or now - alerted_at >= self.proximity_realert_seconds:
+            self.nearby_alerted[journey_id] = now
+            for phone, message in messages:
+                self.outbox.send_now(phone, message)
+        else:
+            self.outbox.suppress()
+            for phone, message in messages:
+                self.outbox.enqueue(phone, f"nearby:{journey_id}", message)
     
     def _start_live_streaming(self, journey_id):
         """Start live streaming simulation"""
@@ -242,7 +429,9 @@ class LiveTrackingManager:
         }
     
     def _send_notification(self, phone_number, message):
-        """Send notification via WhatsApp"""
+        """Send notification via WhatsApp (or the notifier installed by the ASGI app)"""
+        if self.notifier is not None:
+            return self.notifier(phone_number, message)
         from app import send_whatsapp_alert
         send_whatsapp_alert(phone_number, message)
     
@@ -263,6 +452,7 @@ class LiveTrackingManager:
     def _schedule_check_in(self, journey_id):
         """Schedule automatic check-in"""
         def check_in():
+            PENDING_TIMERS.dec()
             if journey_id in self.active_journeys:
                 journey = self.active_journeys[journey_id]
                 last_update = datetime.fromisoformat(journey['last_update'])
@@ -274,13 +464,14 @@ class LiveTrackingManager:
         
         timer = Timer(600.0, check_in)
         timer.start()
+        PENDING_TIMERS.inc()
     
     def _send_check_in_alert(self, journey_data):
         """Send check-in alert if no recent updates"""
         message = f" Check-in Alert\n\nNo location update from {journey_data['user_id']} for 10+ minutes.\n\nLast known location:\nhttps://maps.google.com/?q={journey_data['current_location']['lat']},{journey_data['current_location']['lng']}\n\nPlease check on them."
         
         for contact in journey_data['trusted_contacts']:
-            self._send_notification(contact, message)
+            self.outbox.send_now(contact, message)
 
 
 live_tracker = LiveTrackingManager()
\ No newline at end of file
@@ -0,0 +1,187 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+import bson
+
+class LocationHistoryStore:
+    """Persists location pings as bucketed documents: one per journey per N minutes, coordinates packed in arrays"""
+    
+    def __init__(self):
+        self.bucket_minutes = int(os.getenv('LOCATION_BUCKET_MINUTES', 60))
+        self.flush_pings = int(os.getenv('LOCATION_FLUSH_PINGS', 10))
+        self.flush_seconds = float(os.getenv('LOCATION_FLUSH_SECONDS', 30))
+        self.min_interval = float(os.getenv('LOCATION_MIN_INTERVAL_SECONDS', 1))
+        self.pending = {}
+        self.last_ping = {}
+        # Full buckets wait here for the background thread, so request threads never block on Mongo
+        self.ready = queue.Queue(maxsize=int(os.getenv('LOCATION_WRITE_QUEUE_SIZE', 10000)))
+        self.metrics = {
+            'pings_received': 0, 'pings_skipped': 0, 'pings_invalid': 0, 'pings_written': 0,
+            'write_ops': 0, 'failed': 0, 'dropped': 0
+        }
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+    
+    def _bucket_start(self, timestamp):
+        minutes = timestamp.hour * 60 + timestamp.minute
+        minutes -= minutes % self.bucket_minutes
+        return timestamp.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+    
+    def record(self, journey_id, location, timestamp=None):
+        """Buffer one ping; pings closer together than the minimum interval, or without valid coordinates, are dropped"""
+        timestamp = timestamp or datetime.now()
+        self._ensure_started()
+        
+        try:
+            lat, lng = float(location['lat']), float(location['lng'])
+        except (KeyError, TypeError, ValueError):
+            with self._lock:
+                self.metrics['pings_received'] += 1
+                self.metrics['pings_invalid'] += 1
+            return False
+        
+        flush = None
+        with self._lock:
+            self.metrics['pings_received'] += 1
+            last = self.last_ping.get(journey_id)
+            if last and (timestamp - last).total_seconds() < self.min_interval:
+                self.metrics['pings_skipped'] += 1
+                return False
+            self.last_ping[journey_id] = timestamp
+            
+            bucket_start = self._bucket_start(timestamp)
+            entry = self.pending.get(journey_id)
+            if entry and entry['bucket_start'] != bucket_start:
+                flush = self.pending.pop(journey_id)
+                entry = None
+            if entry is None:
+                entry = self.pending[journey_id] = {'bucket_start': bucket_start, 'pings': [], 'since': time.time()}
+            entry['pings'].append({'lat': lat, 'lng': lng, 't': timestamp})
+            
+            if flush is None and len(entry['pings']) >= self.flush_pings:
+                flush = self.pending.pop(journey_id)
+        
+        if flush:
+            self._hand_off(journey_id, flush)
+        return True
+    
+    def _hand_off(self, journey_id, entry):
+        """Queue a bucket for the background writer; if the queue is full (Mongo down for long) it is dropped"""
+        try:
+            self.ready.put_nowait((journey_id, entry))
+        except queue.Full:
+            self.metrics['dropped'] += len(entry['pings'])
+            print(f"Database error: location write queue full, dropped {len(entry['pings'])} pings")
+    
+    def close_journey(self, journey_id):
+        """Hand whatever is buffered for a journey that has ended to the background writer"""
+        with self._lock:
+            self.last_ping.pop(journey_id, None)
+            entry = self.pending.pop(journey_id, None)
+        if entry:
+            self._hand_off(journey_id, entry)
+    
+    def flush_journey(self, journey_id):
+        """Write everything queued or buffered for a journey on the calling thread (used before reading it back)"""
+        self.write_ready()
+        with self._lock:
+            entry = self.pending.pop(journey_id, None)
+        if entry:
+            self._write(journey_id, entry)
+    
+    def write_ready(self):
+        """Write every bucket already handed off, in order"""
+        while True:
+            try:
+                journey_id, entry = self.ready.get_nowait()
+            except queue.Empty:
+                return
+            self._write(journey_id, entry)
+    
+    def flush(self, max_age=0):
+        """Write handed-off buckets and buffered pings older than max_age seconds"""
+        self.write_ready()
+        now = time.time()
+        with self._lock:
+            due = [jid for jid, entry in self.pending.items() if now - entry['since'] >= max_age]
+            entries = [(jid, self.pending.pop(jid)) for jid in due]
+        for journey_id, entry in entries:
+            self._write(journey_id, entry)
+    
+    def _write(self, journey_id, entry):
+        try:
+            from database import db
+            db.append_location_pings(journey_id, entry['bucket_start'], entry['pings'])
+            self.metrics['write_ops'] += 1
+            self.metrics['pings_written'] += len(entry['pings'])
+        except Exception as e:
+            self.metrics['failed'] += len(entry['pings'])
+            print(f'Database error: {e}')
+    
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid is None:
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        next_sweep = time.time() + self.flush_seconds
+        while True:
+            try:
+                journey_id, entry = self.ready.get(timeout=max(next_sweep - time.time(), 0.01))
+                self._write(journey_id, entry)
+            except queue.Empty:
+                pass
+            if time.time() >= next_sweep:
+                self.flush(max_age=self.flush_seconds)
+                next_sweep = time.time() + self.flush_seconds
+    
+    def get_track(self, journey_id):
+        """Replay a journey's full persisted track in time order"""
+        self.flush_journey(journey_id)
+        from database import db
+        track = []
+        for bucket in db.get_location_buckets(journey_id):
+            track.extend(
+                {'lat': lat, 'lng': lng, 'timestamp': t.isoformat()}
+                for lat, lng, t in zip(bucket['lat'], bucket['lng'], bucket['t'])
+            )
+        return track
+    
+    def get_storage_stats(self, journey_id):
+        """Measure bucket count and BSON bytes stored for a journey"""
+        from database import db
+        buckets = list(db.get_location_buckets(journey_id))
+        total_bytes = sum(len(bson.encode(bucket)) for bucket in buckets)
+        pings = sum(bucket.get('count', 0) for bucket in buckets)
+        return {
+            'journey_id': journey_id,
+            'buckets': len(buckets),
+            'pings': pings,
+            'bytes': total_bytes,
+            'bytes_per_bucket': round(total_bytes / len(buckets), 1) if buckets else 0,
+            'bucket_minutes': self.bucket_minutes,
+            'max_pings_per_bucket': int(self.bucket_minutes * 60 / self.min_interval) if self.min_interval else None
+        }
+    
+    def get_metrics(self):
+        received = self.metrics['pings_received']
+        return {
+            **self.metrics,
+            'pending_journeys': len(self.pending),
+            'write_queue_depth': self.ready.qsize(),
+            'write_ops_per_ping': round(self.metrics['write_ops'] / received, 3) if received else 0
+        }
+
+
+location_store = LocationHistoryStore()
@@ -0,0 +1,134 @@
+"""
+Prometheus metrics for the Women Safety Map.
+
+Under gunicorn (or any preforking server) set PROMETHEUS_MULTIPROC_DIR to an
+empty, writable directory before the app is imported; /metrics then aggregates
+the samples of every worker process.
+"""
+import os
+import time
+from functools import wraps
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+)
+
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+REQUEST_LATENCY = Histogram(
+    'womap_http_request_duration_seconds', 'Request latency per Flask route',
+    ['route', 'method', 'status']
+)
+PREDICTOR_STAGE_LATENCY = Histogram(
+    'womap_predictor_stage_duration_seconds', 'AISafetyPredictor time split by stage',
+    ['stage'], buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+MONGO_LATENCY = Histogram(
+    'womap_mongo_operation_duration_seconds', 'MongoDB operation latency',
+    ['operation']
+)
+MONGO_ERRORS = Counter('womap_mongo_operation_errors_total', 'Failed MongoDB operations', ['operation'])
+NOTIFICATION_LATENCY = Histogram('womap_notification_duration_seconds', 'Notification send latency')
+NOTIFICATION_FAILURES = Counter('womap_notification_failures_total', 'Notifications that failed to send')
+ACTIVE_JOURNEYS = Gauge('womap_active_journeys', 'Journeys currently being tracked', multiprocess_mode='livesum')
+LOCATION_HISTORY_POINTS = Gauge(
+    'womap_location_history_points', 'Location points held in memory', multiprocess_mode='livesum'
+)
+PENDING_TIMERS = Gauge('womap_pending_timers', 'Scheduled check-in timers not yet fired', multiprocess_mode='livesum')
+OUTBOX_EVENTS = Counter(
+    'womap_outbox_events_total', 'Contact notifications sent immediately, folded into a digest or suppressed as duplicates',
+    ['outcome']
+)
+PREDICTIONS = Counter(
+    'womap_predictions_total', 'Predictor calls that computed a result or joined an identical in-flight call',
+    ['operation', 'outcome']
+)
+TRAJECTORY_EVENTS = Counter(
+    'womap_trajectory_events_total', 'Anomalies found in journey location streams (sudden stops, reversals, prolonged stops)',
+    ['event']
+)
+REGION_CACHE_EVENTS = Counter(
+    'womap_region_cache_events_total', 'Region partitions served from memory, loaded on demand, evicted for the memory budget or missing an artifact',
+    ['event']
+)
+
+
+def time_mongo(operation):
+    """Decorator recording latency and failures of a database method"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                MONGO_ERRORS.labels(operation).inc()
+                raise
+            finally:
+                MONGO_LATENCY.labels(operation).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def time_mongo_async(operation):
+    """time_mongo for coroutine methods of the async database layer"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                MONGO_ERRORS.labels(operation).inc()
+                raise
+            finally:
+                MONGO_LATENCY.labels(operation).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def time_notification(func):
+    """Decorator recording send latency and counting sends that return False"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        sent = False
+        try:
+            sent = func(*args, **kwargs)
+            return sent
+        finally:
+            NOTIFICATION_LATENCY.observe(time.perf_counter() - start)
+            if not sent:
+                NOTIFICATION_FAILURES.inc()
+    return wrapper
+
+
+def _registry():
+    if not MULTIPROCESS:
+        return REGISTRY
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def init_app(app):
+    """Register per-route latency hooks and the /metrics endpoint"""
+    from flask import Response, request, g
+    
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+    
+    @app.after_request
+    def _record_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.labels(route, request.method, response.status_code).observe(
+                time.perf_counter() - started
+            )
+        return response
+    
+    @app.route('/metrics')
+    def metrics():
+        return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST)
@@ -6,6 +6,40 @@ import requests
 import json
 from datetime import datetime, timedelta
 import math
+import os
+from metrics import PREDICTOR_STAGE_LATENCY
+from singleflight import SingleFlight, coalesce
+from regions import RegionManager
+
+POLICE_STATIONS = [
+    (18.5204, 73.8567), (18.4899, 73.8056),
+    (18.5640, 73.7802), (18.4574, 73.8077)
+]
+
+COMMERCIAL_ZONES = [
+    (18.5404, 73.8767), (18.5604, 73.7767)
+]
+
+FEATURES_STAGE = PREDICTOR_STAGE_LATENCY.labels('features')
+INFERENCE_STAGE = PREDICTOR_STAGE_LATENCY.labels('inference')
+REGION_STAGE = PREDICTOR_STAGE_LATENCY.labels('region')
+
+def _cell(predictor, lat, lng):
+    """Quantize a point to the coalescing grid so nearby identical requests share a key"""
+    return (round(lat / predictor.cell_degrees), round(lng / predictor.cell_degrees))
+
+def _crime_key(predictor, lat, lng, hour=None, day_of_week=None):
+    now = datetime.now()
+    return _cell(predictor, lat, lng) + (
+        now.hour if hour is None else hour, now.weekday() if day_of_week is None else day_of_week
+    )
+
+def _crowd_key(predictor, lat, lng, hour=None):
+    now = datetime.now()
+    return _cell(predictor, lat, lng) + (now.hour if hour is None else hour, now.weekday())
+
+def _forecast_key(predictor, lat, lng, hours_ahead=6):
+    return _cell(predictor, lat, lng) + (datetime.now().hour, hours_ahead)
 
 class AISafetyPredictor:
     def __init__(self):
@@ -13,19 +47,22 @@ class AISafetyPredictor:
         self.crowd_model = RandomForestRegressor(n_estimators=50, random_state=42)
         self.scaler = StandardScaler()
         self.is_trained = False
+        self.single_flight = SingleFlight()
+        self.cell_degrees = float(os.getenv('COALESCE_CELL_DEGREES', 0.001))
+        self.regions = RegionManager(build_artifact=self.export_region_artifact)
         self._train_models()
     
-    def _generate_training_data(self):
+    def _generate_training_data(self, seed=42):
         """Generate synthetic training data for crime and crowd prediction"""
-        np.random.seed(42)
+        rng = np.random.RandomState(seed)
         n_samples = 1000
         
-       
-        hours = np.random.randint(0, 24, n_samples)
-        days = np.random.randint(0, 7, n_samples)
-        weather = np.random.uniform(0, 100, n_samples)  
-        police_dist = np.random.uniform(0, 5000, n_samples)  
-        population = np.random.uniform(0, 10000, n_samples)  
+        
+        hours = rng.randint(0, 24, n_samples)
+        days = rng.randint(0, 7, n_samples)
+        weather = rng.uniform(0, 100, n_samples)  
+        police_dist = rng.uniform(0, 5000, n_samples)  
+        population = rng.uniform(0, 10000, n_samples)  
         
         #
         crime_risk = (
@@ -33,7 +70,7 @@ class AISafetyPredictor:
             (24 - hours) * 2 +  
             (100 - weather) * 0.3 +  
             police_dist * 0.01 +  
-            np.random.normal(0, 10, n_samples)  
+            rng.normal(0, 10, n_samples)  
         )
         crime_risk = np.clip(crime_risk, 0, 100)
         
@@ -44,7 +81,7 @@ class AISafetyPredictor:
             np.where(hours <= 18, (18 - hours) * 2, 0) +
             weather * 0.4 +  
             population * 0.003 +
-            np.random.normal(0, 15, n_samples)
+            rng.normal(0, 15, n_samples)
         )
         crowd_density = np.clip(crowd_density, 0, 100)
         
@@ -62,6 +99,41 @@ class AISafetyPredictor:
         self.crowd_model.fit(features_scaled, crowd_density)
         self.is_trained = True
     
+    def export_artifact(self, path):
+        """Dump the trained models and POI lists for out-of-process scoring (see scoring_worker)"""
+        import joblib
+        joblib.dump({
+            'scaler': self.scaler,
+            'crime_model': self.crime_model,
+            'crowd_model': self.crowd_model,
+            'police_stations': np.array(POLICE_STATIONS),
+            'commercial_zones': np.array(COMMERCIAL_ZONES)
+        }, path)
+        return path
+    
+    def export_region_artifact(self, region, path):
+        """Artifact for one region (see regions.RegionManager): its own POIs, and its own models when it sets a training seed"""
+        import joblib
+        scaler, crime_model, crowd_model = self.scaler, self.crime_model, self.crowd_model
+        seed = region.get('seed')
+        if seed is not None:
+            features, crime_risk, crowd_density = self._generate_training_data(seed)
+            scaler = StandardScaler()
+            crime_model = RandomForestRegressor(n_estimators=100, random_state=seed)
+            crowd_model = RandomForestRegressor(n_estimators=50, random_state=seed)
+            features_scaled = scaler.fit_transform(features)
+            crime_model.fit(features_scaled, crime_risk)
+            crowd_model.fit(features_scaled, crowd_density)
+        
+        joblib.dump({
+            'scaler': scaler,
+            'crime_model': crime_model,
+            'crowd_model': crowd_model,
+            'police_stations': np.array(region.get('police_stations', POLICE_STATIONS), dtype=float),
+            'commercial_zones': np.array(region.get('commercial_zones', COMMERCIAL_ZONES), dtype=float)
+        }, path)
+        return path
+    
     def get_weather_data(self, lat, lng):
         """Get weather data (mock implementation)"""
         try:
@@ -78,6 +150,7 @@ class AISafetyPredictor:
         except:
             return {'condition': 'clear', 'score': 75, 'temperature': 25}
     
+    @coalesce('crime', _crime_key)
     def predict_crime_pattern(self, lat, lng, hour=None, day_of_week=None):
         """Predict crime risk using ML model"""
         if not self.is_trained:
@@ -88,24 +161,24 @@ class AISafetyPredictor:
         if day_of_week is None:
             day_of_week = datetime.now().weekday()
         
+        with REGION_STAGE.time():
+            partition = self.regions.partition_for(lat, lng)
+        models = partition or self
         
-        weather = self.get_weather_data(lat, lng)
-        
-        
-        police_distance = self._get_nearest_police_distance(lat, lng)
-        
-        
-        population_density = self._estimate_population_density(lat, lng)
-        
-        
-        features = np.array([[hour, day_of_week, weather['score'], 
-                            police_distance, population_density]])
-        features_scaled = self.scaler.transform(features)
-        
+        with FEATURES_STAGE.time():
+            weather = self.get_weather_data(lat, lng)
+            
+            police_distance, population_density = self._location_features(partition, lat, lng)
+            
+            features = np.array([[hour, day_of_week, weather['score'], 
+                                police_distance, population_density]])
+            features_scaled = models.scaler.transform(features)
         
-        crime_risk = self.crime_model.predict(features_scaled)[0]
+        with INFERENCE_STAGE.time():
+            crime_risk = models.crime_model.predict(features_scaled)[0]
         return max(0, min(100, crime_risk))
     
+    @coalesce('crowd', _crowd_key)
     def predict_crowd_density(self, lat, lng, hour=None):
         """Predict crowd density using ML model"""
         if not self.is_trained:
@@ -114,17 +187,67 @@ class AISafetyPredictor:
         if hour is None:
             hour = datetime.now().hour
         
-        weather = self.get_weather_data(lat, lng)
-        police_distance = self._get_nearest_police_distance(lat, lng)
-        population_density = self._estimate_population_density(lat, lng)
+        with REGION_STAGE.time():
+            partition = self.regions.partition_for(lat, lng)
+        models = partition or self
         
-        features = np.array([[hour, datetime.now().weekday(), weather['score'],
-                            police_distance, population_density]])
-        features_scaled = self.scaler.transform(features)
+        with FEATURES_STAGE.time():
+            weather = self.get_weather_data(lat, lng)
+            police_distance, population_density = self._location_features(partition, lat, lng)
+            
+            features = np.array([[hour, datetime.now().weekday(), weather['score'],
+                                police_distance, population_density]])
+            features_scaled = models.scaler.transform(features)
         
-        crowd_density = self.crowd_model.predict(features_scaled)[0]
+        with INFERENCE_STAGE.time():
+            crowd_density = models.crowd_model.predict(features_scaled)[0]
         return max(0, min(100, crowd_density))
     
+    def predict_batch(self, locations, hour=None, day_of_week=None):
+        """Predict crime risk and crowd density for many locations in one pass"""
+        if not locations:
+            return []
+        
+        if hour is None:
+            hour = datetime.now().hour
+        if day_of_week is None:
+            day_of_week = datetime.now().weekday()
+        
+        weather = [self.get_weather_data(loc['lat'], loc['lng']) for loc in locations]
+        
+        if not self.is_trained:
+            return [{'crime_risk': 50, 'crowd_density': 50, 'weather': w} for w in weather]
+        
+        # Each region's locations are scored together with that region's models
+        with REGION_STAGE.time():
+            groups = {}
+            for i, loc in enumerate(locations):
+                groups.setdefault(self.regions.region_for(loc['lat'], loc['lng']), []).append(i)
+        
+        crime_risk = np.empty(len(locations))
+        crowd_density = np.empty(len(locations))
+        for region_id, indices in groups.items():
+            partition = self.regions.get(region_id) if region_id is not None else None
+            models = partition or self
+            
+            with FEATURES_STAGE.time():
+                features = np.array([
+                    [hour, day_of_week, weather[i]['score'],
+                     *self._location_features(partition, locations[i]['lat'], locations[i]['lng'])]
+                    for i in indices
+                ])
+                features_scaled = models.scaler.transform(features)
+            
+            with INFERENCE_STAGE.time():
+                crime_risk[indices] = np.clip(models.crime_model.predict(features_scaled), 0, 100)
+                crowd_density[indices] = np.clip(models.crowd_model.predict(features_scaled), 0, 100)
+        
+        return [
+            {'crime_risk': float(c), 'crowd_density': float(d), 'weather': w}
+            for c, d, w in zip(crime_risk, crowd_density, weather)
+        ]
+    
+    @coalesce('forecast', _forecast_key)
     def forecast_safety_trend(self, lat, lng, hours_ahead=6):
         """Forecast safety trends for next few hours"""
         current_time = datetime.now()
@@ -152,16 +275,18 @@ class AISafetyPredictor:
         
         return forecasts
     
+    def _location_features(self, partition, lat, lng):
+        """Police distance and population density from the region's grid, or the default POIs outside every region"""
+        if partition is None:
+            return self._get_nearest_police_distance(lat, lng), self._estimate_population_density(lat, lng)
+        police_distance, population_density = partition.location_features([lat], [lng])[0]
+        return float(police_distance), float(population_density)
+    
     def _get_nearest_police_distance(self, lat, lng):
         """Calculate distance to nearest police station (mock)"""
         
-        police_stations = [
-            (18.5204, 73.8567), (18.4899, 73.8056),
-            (18.5640, 73.7802), (18.4574, 73.8077)
-        ]
-        
         min_distance = float('inf')
-        for p_lat, p_lng in police_stations:
+        for p_lat, p_lng in POLICE_STATIONS:
             distance = self._haversine_distance(lat, lng, p_lat, p_lng)
             min_distance = min(min_distance, distance)
         
@@ -170,12 +295,8 @@ class AISafetyPredictor:
     def _estimate_population_density(self, lat, lng):
         """Estimate population density based on location (mock)"""
         
-        commercial_zones = [
-            (18.5404, 73.8767), (18.5604, 73.7767)  
-        ]
-        
         base_density = 2000
-        for c_lat, c_lng in commercial_zones:
+        for c_lat, c_lng in COMMERCIAL_ZONES:
             distance = self._haversine_distance(lat, lng, c_lat, c_lng)
             if distance < 1000:  
                 base_density += (1000 - distance) * 5
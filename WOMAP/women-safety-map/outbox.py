@@ -0,0 +1,101 @@
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from metrics import OUTBOX_EVENTS
+
+class NotificationOutbox:
+    """Per-contact outbox: urgent messages go out at once, the rest are folded into one digest per window"""
+    
+    def __init__(self, send, window=None, enabled=None):
+        self.send = send
+        self.window = window if window is not None else float(os.getenv('NOTIFICATION_DIGEST_SECONDS', 300))
+        if enabled is None:
+            enabled = os.getenv('NOTIFICATION_COALESCING', '1') != '0'
+        self.enabled = enabled
+        self.clock = time.time
+        self.pending = {}
+        self.metrics = {'events': 0, 'immediate': 0, 'digested': 0, 'digests_sent': 0, 'suppressed': 0}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+    
+    def send_now(self, phone_number, message):
+        """Urgent path (panic, first deviation, check-in, journey start and arrival): never delayed or merged"""
+        with self._lock:
+            self.metrics['events'] += 1
+            self.metrics['immediate'] += 1
+        OUTBOX_EVENTS.labels('immediate').inc()
+        self.send(phone_number, message)
+    
+    def enqueue(self, phone_number, key, message):
+        """Queue a non-critical message for the contact's next digest; a newer message with the same key replaces it"""
+        if not self.enabled:
+            return self.send_now(phone_number, message)
+        
+        self._ensure_started()
+        with self._lock:
+            self.metrics['events'] += 1
+            self.metrics['digested'] += 1
+            entry = self.pending.get(phone_number)
+            if entry is None:
+                entry = self.pending[phone_number] = {'since': self.clock(), 'messages': OrderedDict()}
+            entry['messages'].pop(key, None)
+            entry['messages'][key] = message
+        OUTBOX_EVENTS.labels('digested').inc()
+    
+    def suppress(self):
+        """Count a repeat alert held back because contacts were already alerted"""
+        with self._lock:
+            self.metrics['suppressed'] += 1
+        OUTBOX_EVENTS.labels('suppressed').inc()
+    
+    def flush(self, max_age=0):
+        """Send the digests of contacts whose oldest queued message is at least max_age seconds old"""
+        now = self.clock()
+        with self._lock:
+            due = [phone for phone, entry in self.pending.items() if now - entry['since'] >= max_age]
+            digests = [(phone, self.pending.pop(phone)['messages']) for phone in due]
+            self.metrics['digests_sent'] += len(digests)
+        for phone_number, messages in digests:
+            self.send(phone_number, self._format_digest(list(messages.values())))
+    
+    def _format_digest(self, messages):
+        if len(messages) == 1:
+            return messages[0]
+        header = f"🗒️ Journey Updates ({len(messages)}) - {datetime.now().strftime('%H:%M')}"
+        return header + '\n\n' + '\n\n———\n\n'.join(messages)
+    
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid is None:
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(min(self.window, 5) or 1)
+            try:
+                self.flush(max_age=self.window)
+            except Exception as e:
+                print(f'Notification error: {e}')
+    
+    def get_metrics(self):
+        events = self.metrics['events']
+        sent = self.metrics['immediate'] + self.metrics['digests_sent']
+        return {
+            **self.metrics,
+            'enabled': self.enabled,
+            'window_seconds': self.window,
+            'pending_contacts': len(self.pending),
+            'messages_sent': sent,
+            'events_per_message': round(events / sent, 2) if sent else 0
+        }
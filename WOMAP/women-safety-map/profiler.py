@@ -0,0 +1,170 @@
+"""
+On-demand sampling profiler for live requests.
+
+A sampled fraction of requests (or any request whose X-Profile header matches
+PROFILING_TOKEN) is profiled by a background thread that snapshots the handling thread's stack
+every few milliseconds. Each profile is written as a speedscope file to a
+bounded on-disk ring and can be downloaded from the admin endpoints.
+"""
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval"""
+    
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = []
+        self.frame_index = {}
+        self.samples = []
+        self.weights = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+    
+    def _run(self):
+        last = self.started
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples.append(self._stack(frame))
+                # The sampler only runs when it gets the GIL, so weight by real elapsed time
+                self.weights.append(round((now - last) * 1000, 3))
+            last = now
+    
+    def _stack(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self.frame_index.get(key)
+            if index is None:
+                index = self.frame_index[key] = len(self.frames)
+                self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+    
+    def to_speedscope(self, name):
+        return {
+            '$schema': SPEEDSCOPE_SCHEMA,
+            'name': name,
+            'exporter': 'women-safety-map',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(self.duration * 1000, 3),
+                'samples': self.samples,
+                'weights': self.weights
+            }]
+        }
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.enabled = os.getenv('PROFILING_ENABLED', '0') == '1'
+        self.sample_rate = float(os.getenv('PROFILING_SAMPLE_RATE', 0.01))
+        self.interval = float(os.getenv('PROFILING_INTERVAL_MS', 5)) / 1000
+        self.max_profiles = int(os.getenv('PROFILING_MAX_PROFILES', 50))
+        self.token = os.getenv('PROFILING_TOKEN')
+        self.profile_dir = os.getenv(
+            'PROFILING_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+        )
+        self._lock = threading.Lock()
+    
+    def should_profile(self, headers):
+        # The header is only honoured with a configured PROFILING_TOKEN, so clients cannot trigger profiles on their own
+        requested = headers.get('X-Profile')
+        if self.token and requested and hmac.compare_digest(requested, self.token):
+            return True
+        return self.enabled and random.random() < self.sample_rate
+    
+    def configure(self, enabled=None, sample_rate=None):
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if sample_rate is not None:
+            self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        return self.get_config()
+    
+    def get_config(self):
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'interval_ms': self.interval * 1000,
+            'max_profiles': self.max_profiles
+        }
+    
+    def save(self, sampler, method, path):
+        """Write a finished profile and drop the oldest ones beyond the ring size"""
+        name = f"{method} {path}"
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', path).strip('-')
+        filename = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}-{slug}.speedscope.json"
+        
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with open(os.path.join(self.profile_dir, filename), 'w') as f:
+            json.dump(sampler.to_speedscope(name), f)
+        
+        with self._lock:
+            profiles = sorted(self.list_profiles(), key=lambda p: p['name'])
+            for stale in profiles[:max(0, len(profiles) - self.max_profiles)]:
+                try:
+                    os.remove(os.path.join(self.profile_dir, stale['name']))
+                except OSError:
+                    pass
+        return filename
+    
+    def list_profiles(self):
+        if not os.path.isdir(self.profile_dir):
+            return []
+        return [
+            {'name': name, 'bytes': os.path.getsize(os.path.join(self.profile_dir, name))}
+            for name in os.listdir(self.profile_dir) if name.endswith('.speedscope.json')
+        ]
+    
+    def init_app(self, app):
+        """Hook request profiling into a Flask app"""
+        from flask import request, g
+        
+        @app.before_request
+        def _start_profile():
+            if self.should_profile(request.headers):
+                g.profile_sampler = StackSampler(threading.get_ident(), self.interval)
+                g.profile_sampler.start()
+        
+        @app.after_request
+        def _finish_profile(response):
+            sampler = g.pop('profile_sampler', None)
+            if sampler is not None:
+                sampler.stop()
+                try:
+                    response.headers['X-Profile-Id'] = self.save(sampler, request.method, request.path)
+                except Exception as e:
+                    print(f'Profiler error: {e}')
+            return response
+
+
+request_profiler = RequestProfiler()
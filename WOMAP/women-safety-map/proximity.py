@@ -0,0 +1,95 @@
+import math
+import os
+import threading
+
+METERS_PER_DEGREE = 111320
+EARTH_RADIUS = 6371000
+
+class JourneyGridIndex:
+    """Current position of every active journey bucketed in a grid of roughly square cells"""
+    
+    def __init__(self, cell_meters=None):
+        self.cell_meters = cell_meters or float(os.getenv('PROXIMITY_CELL_METERS', 250))
+        self.cell_degrees = self.cell_meters / METERS_PER_DEGREE
+        self.cells = {}
+        self.positions = {}
+        self.metrics = {'joins': 0, 'cells_touched': 0, 'candidates': 0, 'matches': 0}
+        self._lock = threading.Lock()
+    
+    def _row(self, lat):
+        return math.floor(lat / self.cell_degrees)
+    
+    def _lng_cell_degrees(self, row):
+        # Cells in a row share that row's longitude scale so they stay about cell_meters wide
+        lat = (row + 0.5) * self.cell_degrees
+        return self.cell_degrees / max(math.cos(math.radians(lat)), 0.01)
+    
+    def _cell(self, lat, lng):
+        row = self._row(lat)
+        return row, math.floor(lng / self._lng_cell_degrees(row))
+    
+    def update(self, journey_id, lat, lng):
+        """Move a journey to its latest position"""
+        cell = self._cell(lat, lng)
+        with self._lock:
+            previous = self.positions.get(journey_id)
+            if previous and previous[2] != cell:
+                self._discard(journey_id, previous[2])
+            self.positions[journey_id] = (lat, lng, cell)
+            self.cells.setdefault(cell, set()).add(journey_id)
+    
+    def remove(self, journey_id):
+        with self._lock:
+            previous = self.positions.pop(journey_id, None)
+            if previous:
+                self._discard(journey_id, previous[2])
+    
+    def _discard(self, journey_id, cell):
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(journey_id)
+            if not members:
+                del self.cells[cell]
+    
+    def nearby(self, lat, lng, radius_meters):
+        """Journeys within radius_meters of a point, closest first, looking only at the cells the circle touches"""
+        span = radius_meters / METERS_PER_DEGREE
+        found = []
+        with self._lock:
+            touched = 0
+            for row in range(self._row(lat - span), self._row(lat + span) + 1):
+                width = self._lng_cell_degrees(row)
+                lng_span = span / max(math.cos(math.radians(abs(lat) + span)), 0.01)
+                for col in range(math.floor((lng - lng_span) / width), math.floor((lng + lng_span) / width) + 1):
+                    touched += 1
+                    for journey_id in self.cells.get((row, col), ()):
+                        found.append((journey_id, self.positions[journey_id]))
+            self.metrics['joins'] += 1
+            self.metrics['cells_touched'] += touched
+            self.metrics['candidates'] += len(found)
+        
+        matches = []
+        for journey_id, (j_lat, j_lng, _) in found:
+            distance = self._haversine(lat, lng, j_lat, j_lng)
+            if distance <= radius_meters:
+                matches.append((journey_id, distance))
+        self.metrics['matches'] += len(matches)
+        matches.sort(key=lambda match: match[1])
+        return matches
+    
+    def _haversine(self, lat1, lng1, lat2, lng2):
+        delta_lat = math.radians(lat2 - lat1)
+        delta_lng = math.radians(lng2 - lng1)
+        a = (math.sin(delta_lat / 2) ** 2 +
+             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(delta_lng / 2) ** 2)
+        return EARTH_RADIUS * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    
+    def get_metrics(self):
+        joins = self.metrics['joins']
+        return {
+            **self.metrics,
+            'journeys_indexed': len(self.positions),
+            'occupied_cells': len(self.cells),
+            'cell_meters': self.cell_meters,
+            'cells_per_join': round(self.metrics['cells_touched'] / joins, 1) if joins else 0
+        }
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from geofence import GeofenceIndex
+from metrics import REGION_CACHE_EVENTS
+from scoring_worker import build_features
+from singleflight import SingleFlight
+
+DEFAULT_REGIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regions.json')
+DEFAULT_ARTIFACTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'region_artifacts')
+METERS_PER_DEGREE = 111320
+
+class RegionPartition:
+    """One region's models, POI lists and a grid of the location features precomputed over its bounds"""
+    
+    def __init__(self, region_id, artifact, bounds, grid_meters, artifact_bytes=0):
+        self.region_id = region_id
+        self.scaler = artifact['scaler']
+        self.crime_model = artifact['crime_model']
+        self.crowd_model = artifact['crowd_model']
+        self.police_stations = np.asarray(artifact['police_stations'], dtype=float)
+        self.commercial_zones = np.asarray(artifact['commercial_zones'], dtype=float).reshape(-1, 2)
+        self.min_lng, self.min_lat, self.max_lng, self.max_lat = bounds
+        self.cell_lat = grid_meters / METERS_PER_DEGREE
+        self.cell_lng = self.cell_lat / max(np.cos(np.radians((self.min_lat + self.max_lat) / 2)), 0.01)
+        self.grid = self._build_grid()
+        self.memory_bytes = artifact_bytes + self.grid.nbytes
+    
+    def _build_grid(self):
+        """Police distance and population density at every cell centre, shape (rows, cols, 2)"""
+        rows = max(int(np.ceil((self.max_lat - self.min_lat) / self.cell_lat)), 1)
+        cols = max(int(np.ceil((self.max_lng - self.min_lng) / self.cell_lng)), 1)
+        lats = self.min_lat + (np.arange(rows) + 0.5) * self.cell_lat
+        lngs = self.min_lng + (np.arange(cols) + 0.5) * self.cell_lng
+        lat_grid, lng_grid = np.meshgrid(lats, lngs, indexing='ij')
+        features = self._features(lat_grid.ravel(), lng_grid.ravel())
+        return features.astype(np.float32).reshape(rows, cols, 2)
+    
+    def _features(self, lats, lngs):
+        poi = {'police_stations': self.police_stations, 'commercial_zones': self.commercial_zones}
+        return build_features(poi, lats, lngs, 0, 0, 0)[:, 3:]
+    
+    def location_features(self, lats, lngs):
+        """(police distance, population density) per point: a grid lookup, computed exactly off the grid"""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        rows = np.floor((lats - self.min_lat) / self.cell_lat).astype(int)
+        cols = np.floor((lngs - self.min_lng) / self.cell_lng).astype(int)
+        on_grid = (rows >= 0) & (rows < self.grid.shape[0]) & (cols >= 0) & (cols < self.grid.shape[1])
+        
+        features = np.empty((len(lats), 2))
+        features[on_grid] = self.grid[rows[on_grid], cols[on_grid]]
+        if not on_grid.all():
+            features[~on_grid] = self._features(lats[~on_grid], lngs[~on_grid])
+        return features
+
+class RegionManager:
+    """City/region partitions found by point-in-region lookup and loaded on demand into a memory-bounded LRU"""
+    
+    def __init__(self, regions_file=None, artifacts_dir=None, budget_mb=None, build_artifact=None):
+        self.regions_file = regions_file or os.getenv('REGIONS_FILE', DEFAULT_REGIONS_FILE)
+        self.artifacts_dir = artifacts_dir or os.getenv('REGION_ARTIFACTS_DIR', DEFAULT_ARTIFACTS_DIR)
+        self.budget_bytes = (budget_mb or float(os.getenv('REGION_CACHE_MB', 256))) * 1024 * 1024
+        self.grid_meters = float(os.getenv('REGION_GRID_METERS', 250))
+        self.missing_recheck = float(os.getenv('REGION_MISSING_RECHECK_SECONDS', 60))
+        self.build_artifact = build_artifact
+        self.regions = {}
+        self.loaded = OrderedDict()
+        self.missing = {}
+        self.resident_bytes = 0
+        self.metrics = {'hits': 0, 'loads': 0, 'evictions': 0, 'outside': 0, 'missing_artifacts': 0, 'fallbacks': 0, 'builds': 0, 'load_seconds': 0.0}
+        self.single_flight = SingleFlight(enabled=True)
+        self._lock = threading.Lock()
+        self.index = GeofenceIndex(self._load_regions())
+        self.region_ids = [fence['id'] for fence in self.index.fences]
+    
+    def _load_regions(self):
+        """Region polygons from a GeoJSON FeatureCollection; earlier features win where regions overlap"""
+        try:
+            with open(self.regions_file) as f:
+                features = json.load(f).get('features', [])
+        except Exception as e:
+            print(f'Regions error: {e}')
+            return []
+        
+        kept = []
+        for index, feature in enumerate(features):
+            properties = feature.get('properties') or {}
+            region_id = str(feature.get('id', properties.get('id', index)))
+            coordinates = np.concatenate([
+                np.asarray(ring, dtype=float).reshape(-1, 2)
+                for polygon in self._polygons(feature.get('geometry') or {}) for ring in polygon
+            ] or [np.zeros((0, 2))])
+            if not len(coordinates):
+                continue
+            self.regions[region_id] = {
+                'id': region_id,
+                'name': properties.get('name', region_id),
+                'properties': properties,
+                'bounds': (*coordinates.min(axis=0), *coordinates.max(axis=0))
+            }
+            feature['id'] = region_id
+            kept.append(feature)
+        return kept
+    
+    def _polygons(self, geometry):
+        if geometry.get('type') == 'Polygon':
+            return [geometry['coordinates']]
+        if geometry.get('type') == 'MultiPolygon':
+            return geometry['coordinates']
+        return []
+    
+    def region_for(self, lat, lng):
+        """Id of the region containing the point, or None outside every region"""
+        inside = self.index.containing(lat, lng)
+        return self.region_ids[min(inside)] if inside else None
+    
+    def assign(self, lats, lngs):
+        """Position in region_ids of the region containing each point, -1 outside every region"""
+        return self.index.first_containing(lats, lngs)
+    
+    def partition_for(self, lat, lng):
+        region_id = self.region_for(lat, lng)
+        if region_id is None:
+            self.metrics['outside'] += 1
+            return None
+        return self.get(region_id)
+    
+    def get(self, region_id):
+        """Resident partition for a region, loading it (once, however many callers ask) if needed"""
+        with self._lock:
+            partition = self.loaded.get(region_id)
+            if partition is not None:
+                self.loaded.move_to_end(region_id)
+                self.metrics['hits'] += 1
+            elif self.missing.get(region_id, 0) > time.monotonic():
+                # Known to have no artifact: fall back without another stat until the recheck is due
+                self.metrics['fallbacks'] += 1
+                return None
+        if partition is not None:
+            REGION_CACHE_EVENTS.labels('hit').inc()
+            return partition
+        return self.single_flight.do('region', (region_id,), self._load, region_id)
+    
+    def artifact_path(self, region_id):
+        """Artifact file for a region, named after a hash of its config so editing the region invalidates it"""
+        region = self.regions[region_id]
+        if 'artifact' in region['properties']:
+            return os.path.join(self.artifacts_dir, region['properties']['artifact'])
+        digest = hashlib.sha1(json.dumps(region['properties'], sort_keys=True).encode()).hexdigest()[:12]
+        return os.path.join(self.artifacts_dir, f'{region_id}-{digest}.joblib')
+    
+    def build_missing(self):
+        """Build the artifact of every region that has none for its current config (at startup or offline, never per request)"""
+        built = []
+        for region_id, region in self.regions.items():
+            path = self.artifact_path(region_id)
+            if os.path.exists(path):
+                continue
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                partial = f'{path}.{os.getpid()}.tmp'
+                self.build_artifact(region['properties'], partial)
+                os.replace(partial, path)
+                self.metrics['builds'] += 1
+                with self._lock:
+                    self.missing.pop(region_id, None)
+                built.append(region_id)
+            except Exception as e:
+                print(f'Regions error: could not build {region_id}: {e}')
+        return built
+    
+    def _load(self, region_id):
+        import joblib
+        with self._lock:
+            if region_id in self.loaded:
+                return self.loaded[region_id]
+        
+        started = time.perf_counter()
+        region = self.regions[region_id]
+        path = self.artifact_path(region_id)
+        if not os.path.exists(path):
+            # Not built for this config yet: serve the default model rather than train on the request path,
+            # and remember that so the next requests skip the stat and the log line until the recheck
+            with self._lock:
+                first = region_id not in self.missing
+                self.missing[region_id] = time.monotonic() + self.missing_recheck
+                self.metrics['fallbacks'] += 1
+            if first:
+                self.metrics['missing_artifacts'] += 1
+                REGION_CACHE_EVENTS.labels('missing').inc()
+                print(f'Regions error: no artifact for {region_id} at {path}, using the default model')
+            return None
+        with self._lock:
+            self.missing.pop(region_id, None)
+        artifact = joblib.load(path)
+        partition = RegionPartition(region_id, artifact, region['bounds'], self.grid_meters, os.path.getsize(path))
+        
+        with self._lock:
+            self.loaded[region_id] = partition
+            self.resident_bytes += partition.memory_bytes
+            self.metrics['loads'] += 1
+            self.metrics['load_seconds'] += time.perf_counter() - started
+            # Least recently used partitions go first; the one just loaded always stays
+            while self.resident_bytes > self.budget_bytes and len(self.loaded) > 1:
+                _, evicted = self.loaded.popitem(last=False)
+                self.resident_bytes -= evicted.memory_bytes
+                self.metrics['evictions'] += 1
+                REGION_CACHE_EVENTS.labels('evict').inc()
+        REGION_CACHE_EVENTS.labels('load').inc()
+        return partition
+    
+    def get_stats(self):
+        with self._lock:
+            resident = list(self.loaded)
+            resident_bytes = self.resident_bytes
+        return {
+            **self.metrics,
+            'load_seconds': round(self.metrics['load_seconds'], 3),
+            'regions': [{'id': region['id'], 'name': region['name']} for region in self.regions.values()],
+            'resident': resident,
+            'resident_mb': round(resident_bytes / 1024 / 1024, 1),
+            'budget_mb': round(self.budget_bytes / 1024 / 1024, 1),
+            'grid_meters': self.grid_meters
+        }
+
+if __name__ == '__main__':
+    # Offline build: python regions.py
+    from model import ai_predictor
+    print(f'Built region artifacts: {ai_predictor.regions.build_missing() or "none missing"}')
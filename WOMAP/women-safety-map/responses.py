@@ -0,0 +1,139 @@
+"""
+Response layer for the Flask app: orjson serialization, compression and ETags.
+
+jsonify goes through orjson, which serializes NumPy scalars and arrays
+natively and falls back to str() for anything else, such as ObjectIds; dates
+keep Flask's RFC 1123 format (Wed, 21 Oct 2015 07:28:00 GMT) so existing
+clients of endpoints like /api/get-reports see no change. Keys are only
+sorted where the ETag is a hash of the body. Compressible responses above COMPRESSION_MIN_BYTES are sent
+brotli-encoded when the optional brotli package is installed and the client
+accepts it, gzip-encoded otherwise; streamed exports are compressed chunk by
+chunk.
+"""
+import os
+import zlib
+from datetime import date
+import orjson
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'text/')
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dumps_bytes(obj):
+    return orjson.dumps(obj, default=str, option=ORJSON_OPTIONS)
+
+
+def _flask_default(obj):
+    if isinstance(obj, date):
+        return http_date(obj)
+    return str(obj)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, formatting dates the way Flask's default provider does"""
+    
+    def dumps_bytes(self, obj, sort_keys=False):
+        option = ORJSON_OPTIONS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_flask_default, option=option)
+    
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def conditional_json(data, etag=None):
+    """JSON response with an ETag (a hash of the body unless given) answering If-None-Match with 304"""
+    from flask import current_app, request
+    # A hashed ETag must not depend on dict insertion order, so only then are keys sorted
+    body = current_app.json.dumps_bytes(data, sort_keys=not etag)
+    response = current_app.response_class(body, mimetype=current_app.json.mimetype)
+    if etag:
+        response.set_etag(etag)
+    else:
+        response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def _choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def compress_bytes(data, encoding):
+    compress, finish = _compressor(encoding)
+    return compress(data) + finish()
+
+
+def _compress_stream(chunks, encoding):
+    compress, finish = _compressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        compressed = compress(chunk)
+        if compressed:
+            yield compressed
+    yield finish()
+
+
+def init_app(app):
+    """Switch jsonify to orjson and compress large responses"""
+    from flask import request
+    app.json = OrjsonProvider(app)
+    
+    @app.after_request
+    def _compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        encoding = _choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < COMPRESSION_MIN_BYTES:
+                return response
+            response.set_data(compress_bytes(data, encoding))
+        
+        response.headers['Content-Encoding'] = encoding
+        # The encoded body is a different byte sequence; a weak ETag still validates it
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
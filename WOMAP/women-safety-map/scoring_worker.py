@@ -0,0 +1,97 @@
+"""
+Process-pool side of the batch scoring jobs.
+
+Kept free of Flask, Mongo and model.py imports so pool processes start fast:
+each process loads the exported model artifact once (its own copy: sklearn
+trees are rebuilt in process memory on load, so they are not shared) and then
+scores chunks of points read from, and written back to, memory-mapped .npy
+files, so no bulk data is pickled between processes. Points inside a region
+are scored with that region's artifact and location grid, the same way
+AISafetyPredictor scores them in process.
+"""
+import numpy as np
+
+EARTH_RADIUS = 6371000
+
+_artifact = None
+_partitions = {}
+
+
+def init_worker(artifact_path):
+    global _artifact
+    import joblib
+    _artifact = joblib.load(artifact_path)
+
+
+def _partition(route):
+    """Region partition for (artifact_path, bounds, grid_meters), loaded once per process"""
+    artifact_path, bounds, grid_meters = route
+    partition = _partitions.get(artifact_path)
+    if partition is None:
+        import joblib
+        from regions import RegionPartition
+        partition = RegionPartition(artifact_path, joblib.load(artifact_path), bounds, grid_meters)
+        _partitions[artifact_path] = partition
+    return partition
+
+
+def haversine(lats, lngs, lat2, lng2):
+    """Vectorized distance in meters from arrays of points to one point"""
+    lat1 = np.radians(lats)
+    lat2 = np.radians(lat2)
+    delta_lat = lat2 - lat1
+    delta_lng = np.radians(lng2 - lngs)
+    a = np.sin(delta_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(delta_lng / 2) ** 2
+    return EARTH_RADIUS * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def build_features(artifact, lats, lngs, hours, days, weather_score):
+    """Same features as AISafetyPredictor, computed for whole arrays at once"""
+    police_distance = np.min(
+        [haversine(lats, lngs, p_lat, p_lng) for p_lat, p_lng in artifact['police_stations']], axis=0
+    )
+    density = np.full(len(lats), 2000.0)
+    for c_lat, c_lng in artifact['commercial_zones']:
+        distance = haversine(lats, lngs, c_lat, c_lng)
+        density += np.where(distance < 1000, (1000 - distance) * 5, 0)
+    density = np.minimum(density, 10000)
+    
+    return np.column_stack([
+        np.broadcast_to(hours, lats.shape), np.broadcast_to(days, lats.shape),
+        np.full(len(lats), weather_score), police_distance, density
+    ])
+
+
+def score_chunk(task):
+    """Score rows [start, end) of the input memmap into the output memmap.
+    
+    Input columns: lat, lng, hour, day_of_week, region (-1 outside every
+    region). Output columns: crime_risk, crowd_density, safety_score. routes
+    maps a region to its (artifact_path, bounds, grid_meters); regions without
+    a route use the default artifact.
+    """
+    input_path, output_path, start, end, weather_score, routes = task
+    points = np.load(input_path, mmap_mode='r')[start:end]
+    regions = points[:, 4].astype(int)
+    scores = np.empty((len(points), 3))
+    
+    for region in np.unique(regions):
+        rows = regions == region
+        lats, lngs, hours, days = points[rows, 0], points[rows, 1], points[rows, 2], points[rows, 3]
+        route = routes.get(int(region))
+        if route is None:
+            features = build_features(_artifact, lats, lngs, hours, days, weather_score)
+            scaler, crime_model, crowd_model = _artifact['scaler'], _artifact['crime_model'], _artifact['crowd_model']
+        else:
+            partition = _partition(route)
+            features = np.column_stack([hours, days, np.full(len(lats), weather_score), partition.location_features(lats, lngs)])
+            scaler, crime_model, crowd_model = partition.scaler, partition.crime_model, partition.crowd_model
+        scaled = scaler.transform(features)
+        crime = np.clip(crime_model.predict(scaled), 0, 100)
+        crowd = np.clip(crowd_model.predict(scaled), 0, 100)
+        scores[rows] = np.column_stack([crime, crowd, np.clip(100 - (crime * 0.7 + (100 - crowd) * 0.3), 0, 100)])
+    
+    output = np.load(output_path, mmap_mode='r+')
+    output[start:end] = scores
+    output.flush()
+    return start, end
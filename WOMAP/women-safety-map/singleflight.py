@@ -0,0 +1,78 @@
+import os
+import threading
+from functools import wraps
+from metrics import PREDICTIONS
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight computation"""
+    
+    def __init__(self, enabled=None):
+        if enabled is None:
+            enabled = os.getenv('PREDICTION_COALESCING', '1') != '0'
+        self.enabled = enabled
+        self.computed = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+    
+    def do(self, operation, key, func, *args, **kwargs):
+        """Run func, or wait for the identical call already running and return its result"""
+        if not self.enabled:
+            return func(*args, **kwargs)
+        
+        key = (operation,) + key
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.computed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        
+        if not leader:
+            PREDICTIONS.labels(operation, 'coalesced').inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        PREDICTIONS.labels(operation, 'computed').inc()
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    def get_metrics(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            'enabled': self.enabled,
+            'computed': self.computed,
+            'coalesced': self.coalesced,
+            'in_flight': in_flight
+        }
+
+def coalesce(operation, key_func):
+    """Method decorator routing calls through the instance's single_flight by key_func(*args)"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = key_func(self, *args, **kwargs)
+            return self.single_flight.do(operation, key, func, self, *args, **kwargs)
+        return wrapper
+    return decorator
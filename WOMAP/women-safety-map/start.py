@@ -3,7 +3,12 @@ Simple localhost startup script for Women Safety Map
 """
 import os
 import sys
+import signal
 import subprocess
+import tempfile
+import time
+
+PIDFILE = os.getenv('PIDFILE', os.path.join(tempfile.gettempdir(), 'women-safety-map.pid'))
 
 def check_dependencies():
     """Check if required dependencies are installed"""
@@ -31,7 +36,48 @@ def check_mongodb():
         print("Start MongoDB with: brew services start mongodb-community")
         return False
 
+def start_production():
+    """Run under gunicorn with the app and model preloaded in the master"""
+    print("\n Starting production server (gunicorn)...")
+    print(f" Workers: {os.getenv('WEB_CONCURRENCY', os.cpu_count())}, threads per worker: {os.getenv('WEB_THREADS', 4)}")
+    os.execvp('gunicorn', ['gunicorn', '-c', 'gunicorn.conf.py', 'app:app'])
+
+def rolling_reload(settle_seconds=int(os.getenv('RELOAD_SETTLE_SECONDS', 10)), timeout=60):
+    """Start a new master with fresh code next to the old one, then gracefully stop the old one"""
+    with open(PIDFILE) as f:
+        old_pid = int(f.read().strip())
+    
+    os.kill(old_pid, signal.SIGUSR2)
+    print(f" Sent USR2 to master {old_pid}, waiting for the new master...")
+    
+    # Until it is promoted, the new master writes its pid to "<pidfile>.2"
+    deadline = time.time() + timeout
+    new_pid = None
+    while time.time() < deadline:
+        try:
+            with open(f'{PIDFILE}.2') as f:
+                new_pid = int(f.read().strip() or 0) or None
+            if new_pid:
+                break
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.5)
+    
+    if new_pid is None:
+        print(" New master did not come up, keeping the old one")
+        return False
+    
+    time.sleep(settle_seconds)
+    os.kill(old_pid, signal.SIGTERM)
+    print(f" New master {new_pid} is serving, old master {old_pid} is shutting down gracefully")
+    return True
+
 def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    
+    if '--reload' in sys.argv:
+        sys.exit(0 if rolling_reload() else 1)
+    
     print(" Starting Women Safety Map - Localhost Setup")
     print("=" * 50)
     
@@ -41,6 +87,10 @@ def main():
     if not check_mongodb():
         sys.exit(1)
     
+    if '--production' in sys.argv:
+        start_production()
+        return
+    
     print("\n Starting Flask application...")
     print(" Main App: http://127.0.0.1:5001")
     print(" Admin Dashboard: http://127.0.0.1:5001/admin")
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import live_tracking
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """The app's MongoDB pointed at an empty in-memory database"""
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(database.db, 'client', client)
+    monkeypatch.setattr(database.db, 'db', client['women_safety_db'])
+    return database.db
+
+
+@pytest.fixture
+def client(mongo):
+    """Flask test client on the in-memory database (importing app trains the default model once)"""
+    from app import app
+    return app.test_client()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def tracker(mongo, monkeypatch):
+    """A LiveTrackingManager on a manual clock that records notifications instead of sending them"""
+    monkeypatch.setattr(live_tracking.LiveTrackingManager, '_schedule_check_in', lambda self, journey_id: None)
+    manager = live_tracking.LiveTrackingManager()
+    manager.sent = []
+    manager._send_notification = lambda phone, message: manager.sent.append((phone, message))
+    manager.clock = Clock()
+    manager.outbox.clock = manager.clock
+    yield manager
+    # Write buffered pings while the in-memory database is still patched in, not at interpreter exit
+    live_tracking.location_store.flush()
+
+
+@pytest.fixture
+def start_journey(tracker):
+    """Start a journey at a point with one trusted contact, returning its id"""
+    def start(lat=18.5204, lng=73.8567, contacts=('+15550000001',), **kwargs):
+        location = {'lat': lat, 'lng': lng}
+        return tracker.start_journey('Asha', location, dict(location, name='Home'), [], list(contacts), **kwargs)
+    return start
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def incidents(mongo):
+    start = datetime(2024, 5, 1, 12, 0)
+    mongo.db.incidents.insert_many([{'type': f'report {i}', 'timestamp': start + timedelta(minutes=i)} for i in range(7)])
+    return mongo
+
+
+@pytest.mark.parametrize('limit, rows', [('0', 1), ('-2', 1), ('3', 3), ('100000', 7)])
+def test_limit_is_clamped(client, incidents, limit, rows):
+    response = client.get(f'/api/admin/incidents?limit={limit}')
+    
+    assert response.status_code == 200
+    assert len(response.get_json()) == rows
+
+
+@pytest.mark.parametrize('query', ['limit=ten', 'before=yesterday', 'before=2024-05-01T12:00:00,not-an-id'])
+def test_malformed_page_arguments_are_rejected(client, incidents, query):
+    assert client.get(f'/api/admin/incidents?{query}').status_code == 400
+
+
+def test_cursor_walks_every_row_once_newest_first(client, incidents):
+    seen, url = [], '/api/admin/incidents?limit=3'
+    while url:
+        response = client.get(url)
+        seen += [row['type'] for row in response.get_json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'/api/admin/incidents?limit=3&before={cursor}' if cursor else None
+    
+    assert seen == [f'report {i}' for i in range(6, -1, -1)]
+
+
+def test_empty_collection_has_no_cursor(client, mongo):
+    response = client.get('/api/admin/reviews?limit=0')
+    
+    assert response.get_json() == [] and 'X-Next-Cursor' not in response.headers
+
+
+def test_export_streams_every_row(client, incidents):
+    response = client.get('/api/admin/incidents/export?format=csv&fields=type')
+    lines = response.get_data(as_text=True).strip().splitlines()
+    
+    assert response.status_code == 200 and len(lines) == 8
+
+
+def test_asgi_page_arguments(monkeypatch):
+    from fastapi.testclient import TestClient
+    import asgi
+    
+    async def empty_page(collection, before, limit):
+        return []
+    monkeypatch.setattr(asgi.async_db, 'find_page', empty_page)
+    client = TestClient(asgi.app)
+    
+    assert client.get('/api/admin/incidents?limit=ten').status_code == 400
+    response = client.get('/api/admin/incidents?limit=0')
+    assert response.status_code == 200 and response.json() == [] and 'x-next-cursor' not in response.headers
@@ -0,0 +1,60 @@
+import asyncio
+import warnings
+
+import pytest
+from fastapi.testclient import TestClient
+
+import asgi
+from async_database import async_db
+
+
+@pytest.fixture
+def inserts(monkeypatch):
+    """Motor inserts recorded instead of sent to a server"""
+    calls = []
+    
+    async def insert(collection, data, write_concern=None):
+        calls.append((collection, data))
+        return type('Result', (), {'inserted_id': data['_id']})()
+    monkeypatch.setattr(async_db, '_insert', insert)
+    return calls
+
+
+def test_reviews_are_buffered_not_inserted(mongo, inserts, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(mongo.writer, 'try_enqueue', lambda collection, document: enqueued.append(collection) or True)
+    
+    result = asyncio.run(async_db.save_review({'rating': 4}))
+    
+    assert enqueued == ['reviews'] and inserts == [] and result.inserted_id is not None
+
+
+def test_full_buffer_falls_back_to_motor_without_a_blocking_write(mongo, inserts, monkeypatch):
+    monkeypatch.setattr(mongo.writer, 'max_size', 0)
+    monkeypatch.setattr(mongo.writer, '_write_batch', lambda *args, **kwargs: pytest.fail('blocking write on the event loop'))
+    
+    asyncio.run(async_db.save_report({'type': 'theft'}))
+    
+    assert [collection for collection, _ in inserts] == ['reports']
+    assert mongo.writer.metrics['overflow_async_writes'] >= 1
+
+
+def test_lifespan_prepares_the_database(mongo, monkeypatch):
+    monkeypatch.setattr(asgi, 'build_region_artifacts', lambda: None)
+    with TestClient(asgi.app):
+        pass
+    
+    assert 'timestamp_id_desc' in mongo.db.incidents.index_information()
+    assert mongo.db.counters.find_one({'_id': 'totals'}) is not None
+
+
+def test_unknown_admin_paths_are_not_found():
+    assert TestClient(asgi.app).get('/api/admin/write-queue').status_code == 404
+
+
+def test_responses_do_not_use_the_deprecated_orjson_class(mongo):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        response = TestClient(asgi.app).get('/api/safety-zones')
+    
+    assert response.status_code == 200
@@ -0,0 +1,179 @@
+import time
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from database import BufferedWriter
+
+
+def review():
+    return {'_id': ObjectId(), 'rating': 4, 'timestamp': datetime.now()}
+
+
+@pytest.fixture
+def writer(mongo):
+    writer = BufferedWriter(mongo, max_size=100, batch_size=100, flush_interval=0.05, max_retries=2)
+    writer.retry_backoff = 0
+    return writer
+
+
+class FlakyCollection:
+    """Fails the first insert_many calls, then delegates to the real collection"""
+    
+    def __init__(self, collection, errors):
+        self.collection = collection
+        self.errors = errors
+    
+    def insert_many(self, documents, ordered=True):
+        if self.errors:
+            error = self.errors.pop(0)
+            if isinstance(error, BulkWriteError):
+                # Like the server, insert the documents that had no write error
+                failed = {e['index'] for e in error.details['writeErrors']}
+                inserted = [d for i, d in enumerate(documents) if i not in failed]
+                if inserted:
+                    self.collection.insert_many(inserted)
+            raise error
+        return self.collection.insert_many(documents, ordered=ordered)
+
+
+def flaky(mongo, monkeypatch, collection, errors):
+    """Route one collection through FlakyCollection; errors are shared, so each is raised once"""
+    real = mongo.db
+    errors = list(errors)
+    
+    class Database:
+        def __getitem__(self, name):
+            return FlakyCollection(real[name], errors) if name == collection else real[name]
+        
+        def __getattr__(self, name):
+            return getattr(real, name)
+    monkeypatch.setattr(mongo, 'db', Database())
+    return real
+
+
+def test_failed_batch_is_retried(writer, mongo, monkeypatch):
+    mongo.ensure_counters()
+    real = flaky(mongo, monkeypatch, 'reviews', [AutoReconnect('down')])
+    
+    writer._flush_items([('reviews', review(), 0), ('reviews', review(), 0)])
+    assert writer.metrics['retried'] == 2
+    writer._flush_items(writer._due_retries(100))
+    
+    assert real.reviews.count_documents({}) == 2
+    assert writer.metrics['flushed'] == 2 and writer.metrics['failed'] == 0
+    assert real.counters.find_one({'_id': 'totals'})['reviews'] == 2
+
+
+def test_partial_bulk_failure_counts_inserted_and_retries_the_rest(writer, mongo, monkeypatch):
+    mongo.ensure_counters()
+    error = BulkWriteError({'writeErrors': [{'index': 1, 'code': 91, 'errmsg': 'shutdown'}], 'nInserted': 2})
+    real = flaky(mongo, monkeypatch, 'reviews', [error])
+    
+    writer._flush_items([('reviews', review(), 0) for _ in range(3)])
+    assert writer.metrics['flushed'] == 2 and len(writer.retries) == 1
+    assert real.counters.find_one({'_id': 'totals'})['reviews'] == 2
+    writer._flush_items(writer._due_retries(100))
+    
+    assert real.reviews.count_documents({}) == 3
+    assert real.counters.find_one({'_id': 'totals'})['reviews'] == 3
+
+
+def test_duplicate_key_on_retry_counts_as_inserted(writer, mongo, monkeypatch):
+    document = review()
+    mongo.db.reviews.insert_one(dict(document))
+    error = BulkWriteError({'writeErrors': [{'index': 0, 'code': 11000, 'errmsg': 'duplicate key'}], 'nInserted': 0})
+    flaky(mongo, monkeypatch, 'reviews', [error])
+    
+    writer._flush_items([('reviews', document, 1)])
+    
+    assert writer.metrics['flushed'] == 1 and writer.metrics['retried'] == 0
+
+
+def test_gives_up_after_max_retries(writer, mongo, monkeypatch):
+    flaky(mongo, monkeypatch, 'reviews', [AutoReconnect('down')] * 3)
+    
+    writer._flush_items([('reviews', review(), 0)])
+    for _ in range(2):
+        writer._flush_items(writer._due_retries(100))
+    
+    assert writer.metrics['retried'] == 2 and writer.metrics['failed'] == 1
+    assert writer.retries == []
+
+
+def test_retries_wait_for_their_backoff(writer, mongo, monkeypatch):
+    writer.retry_backoff = 10
+    writer.flush_interval = 0
+    real = flaky(mongo, monkeypatch, 'reviews', [AutoReconnect('down')])
+    
+    writer._flush_items([('reviews', review(), 0)])
+    
+    assert writer._due_retries(100) == [] and 9 < writer._wait() <= 10
+    writer.flush()
+    assert real.reviews.count_documents({}) == 1 and writer.retries == []
+
+
+def test_retry_buffer_is_capped(writer, mongo, monkeypatch):
+    writer.retry_size = 2
+    flaky(mongo, monkeypatch, 'reviews', [AutoReconnect('down')])
+    
+    writer._flush_items([('reviews', review(), 0) for _ in range(3)])
+    
+    assert len(writer.retries) == 2
+    assert writer.metrics['retry_dropped'] == 1 and writer.metrics['failed'] == 1
+
+
+def test_enqueues_keep_queueing_while_mongo_is_down(writer, mongo, monkeypatch):
+    writer.retry_backoff = 10
+    flaky(mongo, monkeypatch, 'reviews', [AutoReconnect('down')] * 1000)
+    
+    writer.enqueue('reviews', review())
+    deadline = time.time() + 5
+    while not writer.retries and time.time() < deadline:
+        time.sleep(0.01)
+    started = time.perf_counter()
+    for _ in range(50):
+        writer.enqueue('reviews', review())
+    
+    assert time.perf_counter() - started < 0.5
+    assert writer.metrics['overflow_sync_writes'] == 0
+    deadline = time.time() + 5
+    while len(writer.retries) < 51 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(writer.retries) == 51 and writer.metrics['failed'] == 0
+
+
+def test_full_queue_overflows_to_a_synchronous_write(mongo):
+    writer = BufferedWriter(mongo, max_size=1, batch_size=1, flush_interval=0.05)
+    writer._ensure_started = lambda: None
+    
+    writer.enqueue('reviews', review())
+    writer.enqueue('reviews', review())
+    
+    assert writer.queue.qsize() == 1 and writer.metrics['overflow_sync_writes'] == 1
+    assert mongo.db.reviews.count_documents({}) == 1
+    assert writer.try_enqueue('reviews', review()) is False
+
+
+def test_background_thread_flushes_queued_writes(writer, mongo):
+    for _ in range(5):
+        writer.enqueue('reviews', review())
+    
+    deadline = time.time() + 5
+    while mongo.db.reviews.count_documents({}) < 5 and time.time() < deadline:
+        time.sleep(0.01)
+    assert mongo.db.reviews.count_documents({}) == 5
+    assert writer.metrics['batches'] >= 1
+
+
+def test_zero_settings_are_respected(mongo, monkeypatch):
+    monkeypatch.setenv('MONGO_WRITE_QUEUE_SIZE', '0')
+    monkeypatch.setenv('MONGO_WRITE_MAX_RETRIES', '0')
+    writer = BufferedWriter(mongo)
+    
+    writer.enqueue('reviews', review())
+    
+    assert writer.max_size == 0 and writer.max_retries == 0
+    assert mongo.db.reviews.count_documents({}) == 1 and writer._thread is None
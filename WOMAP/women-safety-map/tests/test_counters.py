@@ -0,0 +1,26 @@
+from datetime import datetime
+
+
+def test_totals_are_seeded_from_existing_rows(mongo):
+    mongo.db.incidents.insert_many([{'timestamp': datetime.now()} for _ in range(5)])
+    
+    mongo.save_incident({'type': 'theft'})
+    
+    assert mongo.get_counters()['incidents'] == 6
+
+
+def test_ensure_counters_seeds_totals_once(mongo):
+    mongo.db.reviews.insert_many([{'timestamp': datetime.now()} for _ in range(3)])
+    mongo.ensure_counters()
+    mongo.db.reviews.insert_one({'timestamp': datetime.now()})
+    mongo.ensure_counters()
+    
+    assert mongo.db.counters.find_one({'_id': 'totals'})['reviews'] == 3
+
+
+def test_hourly_rollup_counts_each_write(mongo):
+    mongo.ensure_counters()
+    mongo.save_incident({'type': 'theft'})
+    mongo.save_incident({'type': 'harassment'})
+    
+    assert mongo.get_hourly_counters(hours=1)[-1]['incidents'] == 2
@@ -0,0 +1,56 @@
+import pytest
+
+from dashboard import DashboardSnapshotManager
+
+
+@pytest.fixture
+def snapshots(mongo, monkeypatch):
+    """A dashboard snapshot manager whose refresher thread is recorded instead of started"""
+    import app
+    manager = DashboardSnapshotManager()
+    manager.started = 0
+    monkeypatch.setattr(manager, 'start', lambda: setattr(manager, 'started', manager.started + 1))
+    monkeypatch.setattr(app, 'dashboard_snapshot', manager)
+    return manager
+
+
+def test_cold_start_publishes_one_snapshot_the_refresher_keeps(snapshots):
+    first = snapshots.get_city()
+    
+    assert snapshots.started == 1
+    snapshots.refresh()
+    assert snapshots.get_city()['etag'] == first['etag']
+    assert snapshots.get_city()['last_updated'] == first['last_updated']
+
+
+def test_stale_snapshot_is_recomputed(snapshots):
+    from database import db
+    snapshots.get_city()
+    stale = dict(snapshots.snapshot, refreshed_at=snapshots.snapshot['refreshed_at'] - snapshots.refresh_interval)
+    snapshots.snapshot = stale
+    db.save_dashboard_snapshot(dict(stale))
+    
+    assert snapshots.refresh() is not stale
+    assert db.get_dashboard_snapshot()['refreshed_at'] > stale['refreshed_at']
+
+
+def test_dashboard_answers_conditional_requests_with_304(client, snapshots):
+    response = client.get('/api/ai-dashboard')
+    etag = response.headers['ETag']
+    
+    assert response.status_code == 200
+    assert response.get_json()['areas']
+    
+    cached = client.get('/api/ai-dashboard', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    
+    snapshots.snapshot = None
+    snapshots.refresh_interval = 0
+    changed = client.get('/api/ai-dashboard', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_unknown_city_is_404(client, snapshots):
+    assert client.get('/api/ai-dashboard?city=atlantis').status_code == 404
@@ -0,0 +1,52 @@
+from geofence import GeofenceIndex
+
+SQUARE = [[73.0, 18.0], [73.1, 18.0], [73.1, 18.1], [73.0, 18.1], [73.0, 18.0]]
+HOLE = [[73.04, 18.04], [73.06, 18.04], [73.06, 18.06], [73.04, 18.06], [73.04, 18.04]]
+
+
+def feature(fence_id, rings, **properties):
+    return {'type': 'Feature', 'id': fence_id, 'properties': properties, 'geometry': {'type': 'Polygon', 'coordinates': rings}}
+
+
+def test_containing_honours_holes_and_overlaps():
+    index = GeofenceIndex([
+        feature('ring', [SQUARE, HOLE], kind='danger'),
+        feature('inner', [HOLE], kind='safe')
+    ])
+    
+    assert index.containing(18.02, 73.02) == {0}
+    assert index.containing(18.05, 73.05) == {1}
+    assert index.containing(18.2, 73.05) == set()
+
+
+def test_first_containing_matches_point_lookups():
+    index = GeofenceIndex([feature(f'f{i}', [[[73 + i * 0.05 + x, 18 + y] for x, y in
+                                              [(0, 0), (0.1, 0), (0.1, 0.1), (0, 0.1), (0, 0)]]]) for i in range(4)])
+    lats = [18.05, 18.05, 18.05, 18.5]
+    lngs = [73.01, 73.07, 73.24, 73.01]
+    
+    expected = [min(index.containing(lat, lng), default=-1) for lat, lng in zip(lats, lngs)]
+    assert index.first_containing(lats, lngs).tolist() == expected == [0, 0, 3, -1]
+
+
+def test_many_fences_use_the_tree():
+    features = [feature(f'f{i}', [[[73 + i * 0.01, 18.0], [73.005 + i * 0.01, 18.0], [73.005 + i * 0.01, 18.005],
+                                   [73 + i * 0.01, 18.005], [73 + i * 0.01, 18.0]]]) for i in range(200)]
+    index = GeofenceIndex(features)
+    
+    assert index.get_stats()['tree_levels'] > 1
+    assert index.containing(18.002, 73.502) == {50}
+
+
+def test_entering_a_danger_zone_alerts_once(tracker, start_journey, monkeypatch):
+    monkeypatch.setattr(tracker, 'geofences', GeofenceIndex([feature('park', [SQUARE], name='Dark park', kind='danger')]))
+    journey_id = start_journey(lat=17.9, lng=73.05)
+    
+    tracker.clock.now += 600
+    entered = tracker.update_location(journey_id, {'lat': 18.05, 'lng': 73.05})['geofence_events']
+    tracker.clock.now += 600
+    still_inside = tracker.update_location(journey_id, {'lat': 18.051, 'lng': 73.05})['geofence_events']
+    
+    assert [(event['fence_id'], event['transition']) for event in entered] == [('park', 'enter')]
+    assert still_inside == []
+    assert sum('Danger Zone Alert' in message for _, message in tracker.sent) == 1
@@ -0,0 +1,84 @@
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from jobs import JobManager
+
+
+def done(start, end):
+    future = Future()
+    future.set_result((start, end))
+    return future
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    manager = JobManager(jobs_dir=str(tmp_path), workers=1, chunk_size=100)
+    yield manager
+    if manager._pool is not None:
+        manager._pool.shutdown(cancel_futures=True)
+
+
+def running_job(manager, tmp_path, total=300):
+    (tmp_path / 'job1').mkdir()
+    job = {'id': 'job1', 'status': 'running', 'total': total, 'completed': 0, 'labels': None,
+           'dir': str(tmp_path / 'job1'), 'started': time.time(), 'status_written': time.time()}
+    manager.jobs['job1'] = job
+    manager._write_status(job)
+    return job
+
+
+def test_progress_reaches_other_workers_throttled(jobs, tmp_path):
+    job = running_job(jobs, tmp_path)
+    other_worker = JobManager(jobs_dir=str(tmp_path))
+    
+    jobs.status_interval = 60
+    jobs._chunk_done(job, done(0, 100))
+    assert other_worker.get('job1')['completed'] == 0
+    
+    jobs.status_interval = 0
+    jobs._chunk_done(job, done(100, 200))
+    assert other_worker.get('job1')['completed'] == 200
+    
+    jobs.status_interval = 60
+    jobs._chunk_done(job, done(200, 300))
+    assert other_worker.get('job1')['status'] == 'completed'
+    assert other_worker.get('job1')['progress'] == 1.0
+
+
+def test_failed_chunk_fails_the_job(jobs, tmp_path):
+    job = running_job(jobs, tmp_path)
+    future = Future()
+    future.set_exception(RuntimeError('worker crashed'))
+    
+    jobs._chunk_done(job, future)
+    jobs._chunk_done(job, done(0, 100))
+    assert jobs.get('job1')['status'] == 'failed'
+    assert jobs.get('job1')['error'] == 'worker crashed'
+    assert jobs.get('job1')['completed'] == 0
+
+
+def test_road_edge_job_completes_on_the_pool(jobs):
+    edges = [[18.5 + i * 1e-4, 73.85, 18.5 + i * 1e-4, 73.851] for i in range(250)]
+    job = jobs.submit('road_edges', {'edges': edges, 'hour': 22, 'day_of_week': 5})
+    
+    deadline = time.time() + 60
+    while jobs.get(job['id'])['status'] == 'running' and time.time() < deadline:
+        time.sleep(0.05)
+    
+    status = jobs.get(job['id'])
+    assert status['status'] == 'completed', status
+    assert status['completed'] == status['total'] == 250 and status['chunks'] == 3
+    page = jobs.get_result(job['id'], offset=240, limit=20)
+    assert len(page['results']) == 10
+    assert all(0 <= row['safety_score'] <= 100 and row['crime_risk'] > 0 for row in page['results'])
+
+
+def test_invalid_job_parameters_are_rejected(jobs):
+    with pytest.raises(ValueError):
+        jobs.submit('road_edges', {'edges': [[1, 2, 3]]})
+    with pytest.raises(ValueError):
+        jobs.submit('city_grid', {'south': 2, 'north': 1, 'west': 0, 'east': 1})
+    with pytest.raises(ValueError):
+        jobs.submit('mining', {})
@@ -0,0 +1,61 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from location_store import LocationHistoryStore
+
+
+@pytest.fixture
+def store(mongo, monkeypatch):
+    monkeypatch.setenv('LOCATION_FLUSH_PINGS', '3')
+    monkeypatch.setenv('LOCATION_MIN_INTERVAL_SECONDS', '1')
+    store = LocationHistoryStore()
+    yield store
+    store.flush()
+
+
+def pings(store, count, start=datetime(2024, 5, 1, 10, 0)):
+    for i in range(count):
+        store.record('j1', {'lat': 18.52 + i * 1e-4, 'lng': 73.85}, start + timedelta(seconds=5 * i))
+
+
+def test_full_bucket_is_written_off_the_request_thread(store, mongo, monkeypatch):
+    calls = []
+    monkeypatch.setattr(store, '_ensure_started', lambda: None)
+    monkeypatch.setattr(mongo, 'append_location_pings', lambda *args: calls.append(args))
+    
+    pings(store, 3)
+    assert calls == [] and store.ready.qsize() == 1
+    store.write_ready()
+    
+    assert len(calls) == 1 and len(calls[0][2]) == 3
+
+
+def test_background_writer_persists_buckets(store, mongo):
+    pings(store, 3)
+    
+    deadline = time.time() + 5
+    while store.metrics['pings_written'] < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert [point['lat'] for point in store.get_track('j1')] == pytest.approx([18.52, 18.5201, 18.5202])
+
+
+@pytest.mark.parametrize('location', [{}, {'lat': None, 'lng': 73.85}, {'lat': 'north', 'lng': 73.85}])
+def test_pings_without_coordinates_are_rejected(store, location):
+    assert store.record('j1', location) is False
+    assert store.metrics['pings_invalid'] == 1 and store.pending == {}
+
+
+def test_pings_closer_than_the_minimum_interval_are_skipped(store):
+    now = datetime(2024, 5, 1, 10, 0)
+    assert store.record('j1', {'lat': 18.52, 'lng': 73.85}, now)
+    assert not store.record('j1', {'lat': 18.52, 'lng': 73.85}, now + timedelta(milliseconds=200))
+    assert store.metrics['pings_skipped'] == 1
+
+
+def test_update_location_rejects_invalid_coordinates(tracker, start_journey):
+    journey_id = start_journey()
+    
+    assert tracker.update_location(journey_id, {'lat': 'x', 'lng': 73.85}) == {'error': 'Invalid location'}
+    assert tracker.active_journeys[journey_id]['current_location']['lat'] == 18.5204
@@ -0,0 +1,62 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from metrics import time_mongo, time_notification
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_request_latency_is_recorded_per_route_template(client):
+    labels = {'route': '/api/admin/profiles/<name>', 'method': 'GET', 'status': '404'}
+    before = sample('womap_http_request_duration_seconds_count', **labels)
+    
+    client.get('/api/admin/profiles/a.txt')
+    client.get('/api/admin/profiles/b.txt')
+    
+    assert sample('womap_http_request_duration_seconds_count', **labels) == before + 2
+
+
+def test_unmatched_paths_share_one_label(client):
+    labels = {'route': 'unmatched', 'method': 'GET', 'status': '404'}
+    before = sample('womap_http_request_duration_seconds_count', **labels)
+    
+    client.get('/no/such/page/1')
+    client.get('/no/such/page/2')
+    
+    assert sample('womap_http_request_duration_seconds_count', **labels) == before + 2
+
+
+def test_metrics_endpoint_exposes_the_histograms(client):
+    client.get('/api/safety-zones')
+    response = client.get('/metrics')
+    
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert b'womap_http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/safety-zones",status="200"}' in response.data
+
+
+def test_time_mongo_counts_failures_and_latency():
+    @time_mongo('test_find')
+    def find(fail):
+        if fail:
+            raise RuntimeError('down')
+        return 'ok'
+    
+    assert find(False) == 'ok'
+    with pytest.raises(RuntimeError):
+        find(True)
+    
+    assert sample('womap_mongo_operation_duration_seconds_count', operation='test_find') == 2
+    assert sample('womap_mongo_operation_errors_total', operation='test_find') == 1
+
+
+def test_time_notification_counts_unsent_messages():
+    before = sample('womap_notification_failures_total')
+    send = time_notification(lambda sent: sent)
+    
+    send(True)
+    send(False)
+    
+    assert sample('womap_notification_failures_total') == before + 1
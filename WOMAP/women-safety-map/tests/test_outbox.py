@@ -0,0 +1,66 @@
+from outbox import NotificationOutbox
+
+
+def make_outbox():
+    sent = []
+    outbox = NotificationOutbox(lambda phone, message: sent.append((phone, message)), window=300, enabled=True)
+    outbox.clock = lambda: outbox.now
+    outbox.now = 0.0
+    outbox._ensure_started = lambda: None
+    return outbox, sent
+
+
+def test_digest_merges_messages_per_contact_and_replaces_same_key():
+    outbox, sent = make_outbox()
+    outbox.enqueue('+1', 'location:j1', 'at A')
+    outbox.enqueue('+1', 'location:j1', 'at B')
+    outbox.enqueue('+1', 'deviation:j1', 'off route')
+    outbox.enqueue('+2', 'location:j2', 'at C')
+    
+    outbox.now = 100
+    outbox.flush(max_age=300)
+    assert sent == []
+    
+    outbox.now = 300
+    outbox.flush(max_age=300)
+    messages = dict(sent)
+    assert messages['+2'] == 'at C'
+    assert 'at B' in messages['+1'] and 'off route' in messages['+1'] and 'at A' not in messages['+1']
+
+
+def test_send_now_is_not_delayed():
+    outbox, sent = make_outbox()
+    outbox.send_now('+1', 'PANIC')
+    
+    assert sent == [('+1', 'PANIC')] and outbox.pending == {}
+
+
+def test_disabled_outbox_sends_everything_at_once():
+    outbox, sent = make_outbox()
+    outbox.enabled = False
+    outbox.enqueue('+1', 'location:j1', 'at A')
+    
+    assert sent == [('+1', 'at A')]
+
+
+def test_journey_start_and_arrival_are_sent_immediately(tracker, start_journey):
+    journey_id = start_journey(contacts=['+1', '+2'])
+    assert [phone for phone, message in tracker.sent if 'Journey Started' in message] == ['+1', '+2']
+    
+    tracker.end_journey(journey_id)
+    assert [phone for phone, message in tracker.sent if 'Safe Arrival' in message] == ['+1', '+2']
+    assert tracker.outbox.pending == {}
+
+
+def test_repeat_deviation_goes_into_the_digest(tracker, start_journey):
+    journey_id = start_journey()
+    journey = tracker.active_journeys[journey_id]
+    deviation = {'distance_from_route': 400, 'current_location': {'lat': 18.53, 'lng': 73.86}}
+    
+    tracker._handle_route_deviation(journey_id, deviation)
+    tracker.clock.now += 60
+    tracker._handle_route_deviation(journey_id, dict(deviation, distance_from_route=420))
+    
+    assert sum('Route Deviation Alert' in message for _, message in tracker.sent) == 1
+    assert tracker.outbox.metrics['suppressed'] == 1
+    assert f"deviation:{journey['journey_id']}" in tracker.outbox.pending['+15550000001']['messages']
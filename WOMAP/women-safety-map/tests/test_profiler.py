@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+from profiler import RequestProfiler, request_profiler
+
+
+@pytest.fixture
+def profiler(tmp_path, monkeypatch):
+    """The app's request profiler writing to a temporary ring, off unless asked with the token"""
+    monkeypatch.setattr(request_profiler, 'profile_dir', str(tmp_path))
+    monkeypatch.setattr(request_profiler, 'token', 'secret-token')
+    monkeypatch.setattr(request_profiler, 'enabled', False)
+    monkeypatch.setattr(request_profiler, 'interval', 0.001)
+    return request_profiler
+
+
+def test_profile_header_needs_the_configured_token(monkeypatch):
+    monkeypatch.delenv('PROFILING_TOKEN', raising=False)
+    profiler = RequestProfiler()
+    
+    assert not profiler.should_profile({'X-Profile': '1'})
+    profiler.token = 'secret-token'
+    assert not profiler.should_profile({'X-Profile': 'guess'})
+    assert not profiler.should_profile({})
+    assert profiler.should_profile({'X-Profile': 'secret-token'})
+
+
+def test_sampling_follows_the_toggle():
+    profiler = RequestProfiler()
+    profiler.token = None
+    
+    assert profiler.configure(enabled=True, sample_rate=5)['sample_rate'] == 1.0
+    assert profiler.should_profile({})
+    profiler.configure(enabled=False)
+    assert not profiler.should_profile({})
+    assert profiler.configure(sample_rate=-1)['sample_rate'] == 0.0
+
+
+def test_requests_with_the_token_are_profiled_to_speedscope(client, profiler):
+    plain = client.get('/api/safety-zones', headers={'X-Profile': 'wrong'})
+    profiled = client.get('/api/safety-zones', headers={'X-Profile': 'secret-token'})
+    
+    assert 'X-Profile-Id' not in plain.headers
+    name = profiled.headers['X-Profile-Id']
+    assert [p['name'] for p in client.get('/api/admin/profiles').get_json()] == [name]
+    
+    download = client.get(f'/api/admin/profiles/{name}')
+    speedscope = json.loads(download.data)
+    assert speedscope['profiles'][0]['type'] == 'sampled'
+    assert speedscope['name'] == 'GET /api/safety-zones'
+    assert len(speedscope['profiles'][0]['samples']) == len(speedscope['profiles'][0]['weights'])
+
+
+def test_profile_ring_keeps_the_newest(client, profiler, monkeypatch):
+    monkeypatch.setattr(profiler, 'max_profiles', 2)
+    
+    names = [client.get('/api/safety-zones', headers={'X-Profile': 'secret-token'}).headers['X-Profile-Id'] for _ in range(4)]
+    
+    assert sorted(os.listdir(profiler.profile_dir)) == sorted(names[-2:])
+
+
+def test_only_speedscope_files_can_be_downloaded(client, profiler):
+    with open(os.path.join(profiler.profile_dir, 'notes.txt'), 'w') as f:
+        f.write('private')
+    
+    assert client.get('/api/admin/profiles/notes.txt').status_code == 404
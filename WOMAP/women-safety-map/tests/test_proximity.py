@@ -0,0 +1,54 @@
+import random
+
+from proximity import JourneyGridIndex
+
+
+def test_nearby_matches_a_linear_scan():
+    index = JourneyGridIndex(cell_meters=250)
+    rng = random.Random(5)
+    positions = {f'j{i}': (18.5 + rng.uniform(-0.05, 0.05), 73.85 + rng.uniform(-0.05, 0.05)) for i in range(500)}
+    for journey_id, (lat, lng) in positions.items():
+        index.update(journey_id, lat, lng)
+    
+    found = {journey_id for journey_id, _ in index.nearby(18.5, 73.85, 1000)}
+    expected = {
+        journey_id for journey_id, (lat, lng) in positions.items()
+        if index._haversine(18.5, 73.85, lat, lng) <= 1000
+    }
+    assert found == expected and found
+
+
+def test_moved_and_removed_journeys_leave_their_old_cell():
+    index = JourneyGridIndex(cell_meters=250)
+    index.update('j1', 18.5, 73.85)
+    index.update('j1', 18.6, 73.95)
+    assert index.nearby(18.5, 73.85, 300) == []
+    
+    index.remove('j1')
+    assert index.nearby(18.6, 73.95, 300) == []
+
+
+def test_nearby_report_alerts_user_and_contacts_immediately(tracker, start_journey):
+    journey_id = start_journey(contacts=['+1'], user_phone='+9')
+    far_away = start_journey(lat=18.7, contacts=['+2'])
+    tracker.sent.clear()
+    
+    alerted = tracker.alert_nearby('theft', {'lat': 18.5214, 'lng': 73.8567})
+    
+    assert alerted == 1
+    assert sorted(phone for phone, _ in tracker.sent) == ['+1', '+9']
+    assert 'from you' in dict(tracker.sent)['+9']
+    assert tracker.active_journeys[journey_id]['nearby_reports'][0]['distance'] == 111
+    assert tracker.active_journeys[far_away]['nearby_reports'] == []
+
+
+def test_reports_within_the_cooldown_go_into_the_digest(tracker, start_journey):
+    start_journey(contacts=['+1'])
+    tracker.sent.clear()
+    
+    tracker.alert_nearby('theft', {'lat': 18.5214, 'lng': 73.8567})
+    tracker.clock.now += 30
+    tracker.alert_nearby('harassment', {'lat': 18.5214, 'lng': 73.8567})
+    
+    assert len(tracker.sent) == 1
+    assert len(tracker.outbox.pending['+1']['messages']) == 1
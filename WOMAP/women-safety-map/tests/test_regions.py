@@ -0,0 +1,78 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from regions import RegionManager
+
+
+def region(region_id, min_lng, min_lat, **properties):
+    ring = [[min_lng, min_lat], [min_lng + 1, min_lat], [min_lng + 1, min_lat + 1], [min_lng, min_lat + 1], [min_lng, min_lat]]
+    properties = {'police_stations': [[min_lat + 0.5, min_lng + 0.5]], 'commercial_zones': [[min_lat + 0.2, min_lng + 0.2]], **properties}
+    return {'type': 'Feature', 'id': region_id, 'properties': properties, 'geometry': {'type': 'Polygon', 'coordinates': [ring]}}
+
+
+def build_artifact(properties, path):
+    joblib.dump({'scaler': None, 'crime_model': None, 'crowd_model': None,
+                 'police_stations': properties['police_stations'],
+                 'commercial_zones': properties['commercial_zones']}, path)
+
+
+@pytest.fixture
+def regions(tmp_path):
+    regions_file = tmp_path / 'regions.json'
+    regions_file.write_text(json.dumps({'type': 'FeatureCollection', 'features': [
+        region('a', 10, 50, name='A'),
+        region('b', 10.5, 50, name='B')
+    ]}))
+    manager = RegionManager(str(regions_file), str(tmp_path / 'artifacts'), budget_mb=64, build_artifact=build_artifact)
+    manager.grid_meters = 5000
+    return manager
+
+
+def test_assign_prefers_earlier_regions_and_marks_outside(regions):
+    assert regions.assign([50.5, 50.5, 50.5, 40], [10.2, 10.7, 11.2, 10]).tolist() == [0, 0, 1, -1]
+    assert regions.region_for(50.5, 11.2) == 'b'
+    assert regions.partition_for(40, 10) is None
+    assert regions.metrics['outside'] == 1
+
+
+def test_missing_artifact_falls_back_logs_once_until_built(regions, capsys):
+    assert regions.get('a') is None
+    assert regions.get('a') is None
+    
+    assert capsys.readouterr().out.count('no artifact for a') == 1
+    assert regions.metrics['missing_artifacts'] == 1
+    assert regions.metrics['fallbacks'] == 2
+    
+    assert sorted(regions.build_missing()) == ['a', 'b']
+    partition = regions.get('a')
+    assert partition is not None and regions.get('a') is partition
+    assert regions.metrics['loads'] == 1 and regions.metrics['hits'] == 1
+
+
+def test_missing_artifact_is_rechecked_when_due(regions):
+    regions.missing_recheck = 0
+    assert regions.get('b') is None
+    os.makedirs(regions.artifacts_dir)
+    build_artifact(regions.regions['b']['properties'], regions.artifact_path('b'))
+    
+    assert regions.get('b') is not None
+
+
+def test_editing_a_region_changes_its_artifact(regions):
+    before = regions.artifact_path('a')
+    regions.regions['a']['properties']['seed'] = 3
+    
+    assert regions.artifact_path('a') != before
+
+
+def test_grid_lookup_matches_exact_features_at_cell_centres(regions):
+    regions.build_missing()
+    partition = regions.get('a')
+    lats = [partition.min_lat + 0.5 * partition.cell_lat, 40.0]
+    lngs = [partition.min_lng + 0.5 * partition.cell_lng, 10.0]
+    
+    assert partition.location_features(lats, lngs) == pytest.approx(partition._features(np.array(lats), np.array(lngs)), rel=1e-5)
@@ -0,0 +1,86 @@
+import gzip
+from datetime import datetime
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+import responses
+
+
+@pytest.fixture
+def reports(mongo):
+    def insert(count):
+        mongo.db.reports.insert_many([
+            {'type': 'harassment', 'description': f'report {i} ' * 20, 'lat': 18.52, 'lng': 73.85,
+             'timestamp': datetime(2026, 10, 19, 7, 28)}
+            for i in range(count)
+        ])
+    return insert
+
+
+def test_dumps_bytes_handles_numpy_and_object_ids():
+    object_id = ObjectId()
+    body = responses.dumps_bytes({'score': np.float64(1.5), 'grid': np.arange(3), 'id': object_id, 1: 'x'})
+    
+    assert body == f'{{"score":1.5,"grid":[0,1,2],"id":"{object_id}","1":"x"}}'.encode()
+
+
+def test_report_timestamps_keep_flask_date_format(client, reports):
+    reports(1)
+    
+    assert client.get('/api/get-reports').get_json()[0]['timestamp'] == 'Mon, 19 Oct 2026 07:28:00 GMT'
+
+
+def test_reports_answer_if_none_match_with_304(client, reports):
+    reports(2)
+    first = client.get('/api/get-reports')
+    
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert client.get('/api/get-reports').headers['ETag'] == first.headers['ETag']
+    assert client.get('/api/get-reports', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    
+    reports(1)
+    assert client.get('/api/get-reports', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+
+def test_hashed_etag_ignores_key_order(client):
+    from app import app
+    with app.test_request_context():
+        first = responses.conditional_json({'a': 1, 'b': 2})
+        second = responses.conditional_json({'b': 2, 'a': 1})
+    assert first.headers['ETag'] == second.headers['ETag']
+
+
+def test_large_responses_are_gzipped_with_a_weak_etag(client, reports, monkeypatch):
+    monkeypatch.setattr(responses, 'brotli', None)
+    reports(50)
+    plain = client.get('/api/get-reports')
+    compressed = client.get('/api/get-reports', headers={'Accept-Encoding': 'gzip'})
+    
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) < len(plain.data) / 4
+    assert compressed.headers['ETag'] == f"W/{plain.headers['ETag']}"
+    
+    revalidated = client.get('/api/get-reports', headers={'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_small_responses_are_not_compressed(client, reports):
+    reports(1)
+    
+    assert 'Content-Encoding' not in client.get('/api/get-reports', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_asgi_reports_use_the_same_date_format(monkeypatch):
+    from fastapi.testclient import TestClient
+    import asgi
+    
+    async def get_reports():
+        return [{'type': 'theft', 'timestamp': datetime(2026, 10, 19, 7, 28)}]
+    monkeypatch.setattr(asgi.async_db, 'get_reports', get_reports)
+    
+    assert TestClient(asgi.app).get('/api/get-reports').json()[0]['timestamp'] == 'Mon, 19 Oct 2026 07:28:00 GMT'
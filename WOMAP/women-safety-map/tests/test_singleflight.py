@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight, coalesce
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+    assert condition()
+
+
+def run_concurrently(flight, key, func, callers):
+    """Start one leader, wait until the others are queued behind it, then let it finish"""
+    release = threading.Event()
+    results, errors = [], []
+    
+    def blocked():
+        release.wait(5)
+        return func()
+    
+    def call():
+        try:
+            results.append(flight.do('predict', key, blocked))
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    threads[0].start()
+    wait_for(lambda: ('predict',) + key in flight._calls)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: flight._calls[('predict',) + key].waiters == callers - 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_concurrent_identical_calls_run_once():
+    flight = SingleFlight(enabled=True)
+    runs = []
+    
+    results, errors = run_concurrently(flight, (18.52, 73.85, 22), lambda: runs.append(1) or {'risk': 40}, 8)
+    
+    assert runs == [1] and errors == []
+    assert results == [{'risk': 40}] * 8 and all(result is results[0] for result in results)
+    assert flight.get_metrics() == {'enabled': True, 'computed': 1, 'coalesced': 7, 'in_flight': 0}
+
+
+def test_waiters_get_the_leaders_error():
+    flight = SingleFlight(enabled=True)
+    
+    def fail():
+        raise RuntimeError('model unavailable')
+    results, errors = run_concurrently(flight, ('k',), fail, 3)
+    
+    assert results == [] and [str(e) for e in errors] == ['model unavailable'] * 3
+    assert flight.get_metrics()['in_flight'] == 0
+
+
+def test_finished_calls_are_not_reused():
+    flight = SingleFlight(enabled=True)
+    runs = []
+    
+    for _ in range(3):
+        flight.do('predict', ('k',), runs.append, 1)
+    
+    assert len(runs) == 3 and flight.coalesced == 0
+
+
+def test_disabled_runs_every_call():
+    flight = SingleFlight(enabled=False)
+    
+    assert flight.do('predict', ('k',), lambda: 1) == 1
+    assert flight.get_metrics()['computed'] == 0
+
+
+@pytest.mark.parametrize('value, expected', [('0', False), ('1', True)])
+def test_coalescing_follows_the_environment(monkeypatch, value, expected):
+    monkeypatch.setenv('PREDICTION_COALESCING', value)
+    
+    assert SingleFlight().enabled is expected
+
+
+def test_coalesce_decorator_keys_calls_per_instance():
+    class Predictor:
+        def __init__(self):
+            self.single_flight = SingleFlight(enabled=True)
+        
+        @coalesce('score', lambda self, lat, lng: (round(lat, 3), round(lng, 3)))
+        def score(self, lat, lng):
+            return lat + lng
+    
+    predictor = Predictor()
+    
+    assert predictor.score(1.0, 2.0) == 3.0
+    assert predictor.single_flight.computed == 1
+
+
+def test_predictions_coalesce_within_a_cell_and_hour():
+    from model import _crime_key, ai_predictor
+    
+    key = _crime_key(ai_predictor, 18.52041, 73.85671, 22, 5)
+    assert _crime_key(ai_predictor, 18.52039, 73.85669, 22, 5) == key
+    assert _crime_key(ai_predictor, 18.52041, 73.85671, 23, 5) != key
+    assert _crime_key(ai_predictor, 18.53041, 73.85671, 22, 5) != key
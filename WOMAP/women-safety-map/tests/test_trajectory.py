@@ -0,0 +1,78 @@
+import math
+
+import pytest
+
+from trajectory import METERS_PER_DEGREE, TrajectoryProcessor
+
+
+@pytest.fixture
+def processor():
+    clock = {'now': 0.0}
+    processor = TrajectoryProcessor(clock=lambda: clock['now'])
+    processor.now = clock
+    return processor
+
+
+def drive(processor, steps, lat=18.52, lng=73.85, every=5.0):
+    """Feed one ping per step of (north meters, east meters) and collect the event types"""
+    processor.start('j1', lat, lng)
+    events = []
+    for north, east in steps:
+        processor.now['now'] += every
+        lat += north / METERS_PER_DEGREE
+        lng += east / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+        events += [event['type'] for event in processor.update('j1', lat, lng)]
+    return events
+
+
+def test_steady_driving_raises_nothing(processor):
+    assert drive(processor, [(50, 0)] * 100) == []
+    assert processor.snapshot('j1')['speed_mps'] == pytest.approx(10, abs=0.5)
+    assert processor.snapshot('j1')['heading_degrees'] == 0
+
+
+def test_sudden_stop(processor):
+    assert drive(processor, [(50, 0)] * 20 + [(0, 0)] * 3) == ['sudden_stop']
+
+
+def test_reversal_needs_a_confirming_ping(processor):
+    assert drive(processor, [(50, 0)] * 20 + [(-50, 0)]) == []
+    processor.now['now'] += 5
+    track = processor.tracks['j1']
+    events = processor.update('j1', track.lat - 50 / METERS_PER_DEGREE, track.lng)
+    assert [event['type'] for event in events] == ['reversal']
+
+
+def test_prolonged_stop_fires_once(processor):
+    events = drive(processor, [(50, 0)] * 5 + [(0, 0)] * 200)
+    assert events.count('prolonged_stop') == 1
+
+
+def test_gps_jump_is_ignored_unless_confirmed(processor):
+    drive(processor, [(50, 0)] * 10)
+    track = processor.tracks['j1']
+    lat, lng = track.lat, track.lng
+    
+    processor.now['now'] += 5
+    assert processor.update('j1', lat + 0.05, lng) == []
+    processor.now['now'] += 5
+    processor.update('j1', lat + 50 / METERS_PER_DEGREE, lng)
+    assert processor.tracks['j1'].lat == pytest.approx(lat + 50 / METERS_PER_DEGREE)
+    assert processor.metrics['outliers'] == 1
+
+
+def test_urgent_events_alert_contacts_at_once(tracker, start_journey):
+    journey_id = start_journey()
+    tracker.sent.clear()
+    lat = 18.5204
+    for _ in range(5):
+        tracker.clock.now += 5
+        lat += 50 / METERS_PER_DEGREE
+        tracker.update_location(journey_id, {'lat': lat, 'lng': 73.8567})
+    for _ in range(130):
+        tracker.clock.now += 5
+        tracker.update_location(journey_id, {'lat': lat, 'lng': 73.8567})
+    
+    types = [event['type'] for event in tracker.active_journeys[journey_id]['trajectory_events']]
+    assert types.count('prolonged_stop') == 1
+    assert sum('Movement Alert' in message for _, message in tracker.sent) == 1
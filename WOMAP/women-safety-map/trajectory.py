@@ -0,0 +1,178 @@
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from metrics import TRAJECTORY_EVENTS
+
+METERS_PER_DEGREE = 111320
+ALL_EVENTS = ('sudden_stop', 'reversal', 'prolonged_stop')
+
+class _Track:
+    """Running state of one journey; fixed size however many pings it has had"""
+    __slots__ = (
+        'lat', 'lng', 't', 'speed', 'heading_x', 'heading_y', 'heading_lat', 'heading_lng',
+        'anchor_lat', 'anchor_lng', 'anchor_t', 'dwell_alerted', 'moved',
+        'slow_since', 'slow_lat', 'slow_lng', 'speed_before_slow', 'slow_pings', 'pending_reversal', 'jump', 'pings'
+    )
+    
+    def __init__(self, lat, lng, t):
+        self.lat, self.lng, self.t = lat, lng, t
+        self.speed = 0.0
+        self.heading_x = self.heading_y = 0.0
+        self.heading_lat, self.heading_lng = lat, lng
+        self.anchor_lat, self.anchor_lng, self.anchor_t = lat, lng, t
+        self.dwell_alerted = False
+        self.moved = False
+        self.slow_since = None
+        self.slow_lat = self.slow_lng = None
+        self.pending_reversal = None
+        self.speed_before_slow = 0.0
+        self.slow_pings = 0
+        self.jump = None
+        self.pings = 1
+
+class TrajectoryProcessor:
+    """Incremental speed, heading and dwell estimates per journey, raising sudden stop, reversal and prolonged stop events"""
+    
+    def __init__(self, clock=None):
+        self.clock = clock or time.time
+        self.smoothing_seconds = float(os.getenv('TRAJECTORY_SMOOTHING_SECONDS', 30))
+        self.min_move_meters = float(os.getenv('TRAJECTORY_MIN_MOVE_METERS', 25))
+        self.max_speed = float(os.getenv('TRAJECTORY_MAX_SPEED_MPS', 50))
+        self.stop_from_speed = float(os.getenv('TRAJECTORY_STOP_FROM_MPS', 6))
+        self.stopped_speed = float(os.getenv('TRAJECTORY_STOPPED_MPS', 1))
+        self.stop_window_seconds = float(os.getenv('TRAJECTORY_STOP_WINDOW_SECONDS', 20))
+        self.reversal_degrees = float(os.getenv('TRAJECTORY_REVERSAL_DEGREES', 150))
+        self.dwell_radius_meters = float(os.getenv('TRAJECTORY_DWELL_RADIUS_METERS', 50))
+        self.dwell_seconds = float(os.getenv('TRAJECTORY_DWELL_SECONDS', 600))
+        self.enabled_events = set(os.getenv('TRAJECTORY_EVENTS', ','.join(ALL_EVENTS)).split(',')) - {''}
+        self.tracks = {}
+        self.metrics = {'pings': 0, 'outliers': 0, **{event: 0 for event in ALL_EVENTS}}
+        self._lock = threading.Lock()
+    
+    def start(self, journey_id, lat, lng):
+        with self._lock:
+            self.tracks[journey_id] = _Track(lat, lng, self.clock())
+    
+    def remove(self, journey_id):
+        with self._lock:
+            self.tracks.pop(journey_id, None)
+    
+    def _offset(self, lat1, lng1, lat2, lng2):
+        """East/north meters from the first point to the second (equirectangular, fine at ping distances)"""
+        north = (lat2 - lat1) * METERS_PER_DEGREE
+        east = (lng2 - lng1) * METERS_PER_DEGREE * math.cos(math.radians((lat1 + lat2) / 2))
+        return east, north
+    
+    def update(self, journey_id, lat, lng):
+        """Fold one ping into the journey's estimates and return the anomaly events it triggers"""
+        now = self.clock()
+        with self._lock:
+            track = self.tracks.get(journey_id)
+            if track is None:
+                self.tracks[journey_id] = _Track(lat, lng, now)
+                return []
+            self.metrics['pings'] += 1
+            
+            dt = now - track.t
+            east, north = self._offset(track.lat, track.lng, lat, lng)
+            distance = math.hypot(east, north)
+            if dt <= 0:
+                track.lat, track.lng = lat, lng
+                return []
+            speed = distance / dt
+            if speed > self.max_speed:
+                # A GPS jump, not movement: keep the previous fix unless the next ping confirms the new position
+                self.metrics['outliers'] += 1
+                if track.jump and math.hypot(*self._offset(track.jump[0], track.jump[1], lat, lng)) < self.dwell_radius_meters:
+                    moved, pings = track.moved, track.pings
+                    self.tracks[journey_id] = track = _Track(lat, lng, now)
+                    track.moved, track.pings = moved, pings + 1
+                else:
+                    track.jump = (lat, lng)
+                return []
+            track.jump = None
+            
+            events = []
+            if speed <= self.stopped_speed and track.slow_pings == 0:
+                track.slow_since, track.slow_lat, track.slow_lng = track.t, track.lat, track.lng
+                track.speed_before_slow = track.speed
+            alpha = 1 - math.exp(-dt / self.smoothing_seconds)
+            track.speed += alpha * (speed - track.speed)
+            track.lat, track.lng, track.t = lat, lng, now
+            track.pings += 1
+            
+            # Sudden stop: two slow pings in a row that together barely moved, shortly after moving at speed
+            if speed <= self.stopped_speed:
+                track.slow_pings += 1
+                if track.slow_pings == 2 and track.speed_before_slow >= self.stop_from_speed:
+                    elapsed = now - track.slow_since
+                    drift = math.hypot(*self._offset(track.slow_lat, track.slow_lng, lat, lng))
+                    if elapsed <= self.stop_window_seconds and drift <= self.stopped_speed * elapsed:
+                        events.append(self._event('sudden_stop', lat, lng, from_speed=round(track.speed_before_slow, 1)))
+            else:
+                track.slow_pings = 0
+            
+            # Heading from displacements of at least min_move_meters, so GPS jitter at low speed does not spin it.
+            # A reversal against a steady heading only counts once the next displacement keeps the new direction.
+            east, north = self._offset(track.heading_lat, track.heading_lng, lat, lng)
+            moved = math.hypot(east, north)
+            if moved >= self.min_move_meters:
+                direction_x, direction_y = east / moved, north / moved
+                pending = track.pending_reversal
+                track.pending_reversal = None
+                if pending is not None and direction_x * pending[0] + direction_y * pending[1] > 0.5:
+                    events.append(self._event('reversal', lat, lng, turn_degrees=pending[2]))
+                    track.heading_x, track.heading_y = direction_x, direction_y
+                else:
+                    heading_norm = math.hypot(track.heading_x, track.heading_y)
+                    if heading_norm > 0.8:
+                        cosine = (direction_x * track.heading_x + direction_y * track.heading_y) / heading_norm
+                        turn = math.degrees(math.acos(max(-1.0, min(1.0, cosine))))
+                        if turn >= self.reversal_degrees:
+                            track.pending_reversal = (direction_x, direction_y, round(turn))
+                    track.heading_x += 0.5 * (direction_x - track.heading_x)
+                    track.heading_y += 0.5 * (direction_y - track.heading_y)
+                track.heading_lat, track.heading_lng = lat, lng
+            
+            # Dwell: time spent within dwell_radius_meters of the spot the journey last settled at
+            east, north = self._offset(track.anchor_lat, track.anchor_lng, lat, lng)
+            if math.hypot(east, north) > self.dwell_radius_meters:
+                track.anchor_lat, track.anchor_lng, track.anchor_t = lat, lng, now
+                track.dwell_alerted = False
+                track.moved = True
+            elif track.moved and not track.dwell_alerted and now - track.anchor_t >= self.dwell_seconds:
+                track.dwell_alerted = True
+                events.append(self._event('prolonged_stop', lat, lng, dwell_seconds=round(now - track.anchor_t)))
+            
+            events = [event for event in events if event['type'] in self.enabled_events]
+            for event in events:
+                self.metrics[event['type']] += 1
+        
+        for event in events:
+            TRAJECTORY_EVENTS.labels(event['type']).inc()
+        return events
+    
+    def _event(self, event_type, lat, lng, **details):
+        return {'type': event_type, 'location': {'lat': lat, 'lng': lng}, 'timestamp': datetime.now().isoformat(), **details}
+    
+    def snapshot(self, journey_id):
+        """Current motion estimates for a journey, or None if it is not tracked"""
+        with self._lock:
+            track = self.tracks.get(journey_id)
+            if track is None:
+                return None
+            heading = None
+            if math.hypot(track.heading_x, track.heading_y) > 0.5:
+                heading = round(math.degrees(math.atan2(track.heading_x, track.heading_y)) % 360)
+            return {
+                'speed_mps': round(track.speed, 2),
+                'heading_degrees': heading,
+                'dwell_seconds': round(track.t - track.anchor_t),
+                'pings': track.pings
+            }
+    
+    def get_metrics(self):
+        with self._lock:
+            return {**self.metrics, 'journeys': len(self.tracks), 'events_enabled': sorted(self.enabled_events)}